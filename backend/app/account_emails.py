@@ -3,16 +3,19 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from .config import EMAIL_ENABLED
 from .emailer import email_configured, send_email
 from .repository import (
     create_outbound_email,
+    get_payment_event,
     get_user_by_email,
+    get_user_by_id,
     get_user_email_preferences,
+    get_workspace,
     update_outbound_email,
+    utcnow_iso,
 )
 
 logger = logging.getLogger("citysort.account_emails")
@@ -44,8 +47,14 @@ def _send_account_email(
     user_id: Optional[str] = None,
     preference_key: Optional[str] = None,
     workspace_id: Optional[str] = None,
+    raise_on_failure: bool = False,
 ) -> bool:
-    """Send an account-level email, respecting preferences and config."""
+    """Send an account-level email, respecting preferences and config.
+
+    Returns False when email is disabled or the user opted out. A failed
+    send is recorded and returns False too, unless ``raise_on_failure`` is
+    set so a queued job can be retried.
+    """
     if not EMAIL_ENABLED or not email_configured():
         return False
 
@@ -69,7 +78,7 @@ def _send_account_email(
         update_outbound_email(
             int(record["id"]),
             status="sent",
-            sent_at=datetime.now(timezone.utc).isoformat(),
+            sent_at=utcnow_iso(),
         )
         logger.info("Account email [%s] sent to %s", email_type, to_email)
         return True
@@ -78,6 +87,8 @@ def _send_account_email(
         logger.warning(
             "Account email [%s] failed for %s: %s", email_type, to_email, exc
         )
+        if raise_on_failure:
+            raise
         return False
 
 
@@ -118,6 +129,7 @@ def send_plan_upgrade_email(
     plan_tier: str,
     user_id: Optional[str] = None,
     workspace_id: Optional[str] = None,
+    raise_on_failure: bool = False,
 ) -> bool:
     """Send plan upgrade confirmation email."""
     tier_display = plan_tier.capitalize()
@@ -137,6 +149,7 @@ def send_plan_upgrade_email(
         user_id=user_id,
         preference_key="account_plan_change",
         workspace_id=workspace_id,
+        raise_on_failure=raise_on_failure,
     )
 
 
@@ -146,6 +159,7 @@ def send_payment_receipt_email(
     plan_tier: str,
     user_id: Optional[str] = None,
     workspace_id: Optional[str] = None,
+    raise_on_failure: bool = False,
 ) -> bool:
     """Send payment receipt email."""
     amount_display = f"${amount_cents / 100:.2f}"
@@ -166,6 +180,7 @@ def send_payment_receipt_email(
         user_id=user_id,
         preference_key="account_payment_receipt",
         workspace_id=workspace_id,
+        raise_on_failure=raise_on_failure,
     )
 
 
@@ -196,3 +211,50 @@ def send_invitation_email(
         preference_key="account_invitation",
         workspace_id=workspace_id,
     )
+
+
+# Emails that can be queued as ``account_email`` jobs, by kind. Job payloads
+# carry only the kind and the Stripe event, user and workspace ids; the
+# address, amount and plan are looked up when the job runs, because the jobs
+# API serves payloads to every workspace member.
+_QUEUED_EMAIL_SENDERS: dict[str, Callable[..., bool]] = {
+    "plan_upgrade": send_plan_upgrade_email,
+    "payment_receipt": send_payment_receipt_email,
+}
+
+
+def send_queued_account_email(
+    kind: str,
+    *,
+    event_id: str,
+    user_id: str,
+    workspace_id: Optional[str] = None,
+) -> bool:
+    """Send an account email for a Stripe event recorded in payment_events.
+
+    A failed send raises so the worker retries the job; a disabled mailer,
+    an opted-out user or a user that no longer exists returns False.
+    """
+    sender = _QUEUED_EMAIL_SENDERS.get(kind)
+    if sender is None:
+        raise ValueError(f"Unknown account email kind: {kind!r}")
+    user = get_user_by_id(user_id)
+    if not user:
+        logger.info("Skipping %s email: user %s no longer exists", kind, user_id)
+        return False
+    event = get_payment_event(event_id) or {}
+    workspace = get_workspace(workspace_id) if workspace_id else None
+    fields: dict[str, Any] = {
+        "user_email": user["email"],
+        "plan_tier": str(
+            event.get("plan_tier")
+            or (workspace or {}).get("plan_tier")
+            or user.get("plan_tier")
+            or "pro"
+        ),
+        "user_id": user_id,
+        "workspace_id": workspace_id,
+    }
+    if kind == "payment_receipt":
+        fields["amount_cents"] = int(event.get("amount_cents") or 0)
+    return sender(**fields, raise_on_failure=True)
@@ -3,11 +3,11 @@ from __future__ import annotations
 import base64
 import hashlib
 import hmac
-import json
 import re
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
+import orjson
 from fastapi import HTTPException, Request
 
 from .config import ACCESS_TOKEN_TTL_MINUTES, AUTH_SECRET, REQUIRE_AUTH
@@ -20,6 +20,7 @@ from .repository import (
     get_user_by_email,
     get_user_by_id,
     get_workspace_role as repository_get_workspace_role,
+    hash_secret,
     list_users,
     update_user_login,
     update_user_role,
@@ -50,10 +51,6 @@ def _sign(value: str) -> str:
     return _b64url_encode(digest)
 
 
-def _hash_api_key(raw_key: str) -> str:
-    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
-
-
 def hash_password(password: str) -> str:
     if len(password) < PASSWORD_MIN_LENGTH:
         raise ValueError(f"Password must be at least {PASSWORD_MIN_LENGTH} characters.")
@@ -96,9 +93,7 @@ def create_access_token(
     }
     if workspace_id:
         payload["wid"] = workspace_id
-    raw_payload = _b64url_encode(
-        json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
-    )
+    raw_payload = _b64url_encode(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS))
     signature = _sign(raw_payload)
     return f"{raw_payload}.{signature}"
 
@@ -114,7 +109,7 @@ def decode_access_token(token: str) -> dict[str, Any]:
         raise HTTPException(status_code=401, detail="Invalid token signature.")
 
     try:
-        payload = json.loads(_b64url_decode(raw_payload).decode("utf-8"))
+        payload = orjson.loads(_b64url_decode(raw_payload))
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token payload.")
 
@@ -222,7 +217,7 @@ def role_allows(user_role: str, required_role: str) -> bool:
 
 
 def _authenticate_from_api_key(raw_key: str) -> dict[str, Any]:
-    key_hash = _hash_api_key(raw_key)
+    key_hash = hash_secret(raw_key)
     key_record = get_api_key_by_hash(key_hash)
     if not key_record or key_record.get("status") != "active":
         raise HTTPException(status_code=401, detail="Invalid API key.")
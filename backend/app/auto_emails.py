@@ -21,6 +21,7 @@ from .repository import (
     get_user_by_id,
     get_user_email_preferences,
     update_outbound_email,
+    utcnow_iso,
 )
 from .templates import compose_template_email, list_templates
 
@@ -86,9 +87,7 @@ def _send_auto_email(
         update_outbound_email(
             int(record["id"]),
             status="sent",
-            sent_at=__import__("datetime")
-            .datetime.now(__import__("datetime").timezone.utc)
-            .isoformat(),
+            sent_at=utcnow_iso(),
         )
         create_audit_event(
             document_id=document_id,
@@ -210,12 +209,10 @@ def send_assignment_notification(document_id: str, assigned_user_id: str) -> boo
 
     try:
         send_email(to_email=to_email, subject=subject, body=body)
-        from datetime import datetime, timezone
-
         update_outbound_email(
             int(record["id"]),
             status="sent",
-            sent_at=datetime.now(timezone.utc).isoformat(),
+            sent_at=utcnow_iso(),
         )
         create_audit_event(
             document_id=document_id,
@@ -284,12 +281,10 @@ def send_review_complete_notification(document_id: str) -> bool:
 
     try:
         send_email(to_email=to_email, subject=subject, body=body)
-        from datetime import datetime, timezone
-
         update_outbound_email(
             int(record["id"]),
             status="sent",
-            sent_at=datetime.now(timezone.utc).isoformat(),
+            sent_at=utcnow_iso(),
         )
         create_audit_event(
             document_id=document_id,
@@ -119,6 +119,18 @@ else:
 DATABASE_CONNECT_TIMEOUT_SECONDS = _env_int(
     "CITYSORT_DATABASE_CONNECT_TIMEOUT_SECONDS", 8, min_value=1, max_value=120
 )
+# Dashboard aggregates are served from memory for this long unless a document
+# write invalidates them first. 0 disables the cache.
+ANALYTICS_CACHE_TTL_SECONDS = _env_int(
+    "CITYSORT_ANALYTICS_CACHE_TTL_SECONDS", 30, min_value=0, max_value=3600
+)
+# How long a user's default workspace id is remembered when a request does not
+# name one. Off by default: membership changes in this process invalidate it,
+# but other workers keep serving a removed member's old workspace until the
+# entry expires, so only enable it for single-process deployments.
+DEFAULT_WORKSPACE_CACHE_TTL_SECONDS = _env_int(
+    "CITYSORT_DEFAULT_WORKSPACE_CACHE_TTL_SECONDS", 0, min_value=0, max_value=3600
+)
 
 OCR_PROVIDER = os.getenv("CITYSORT_OCR_PROVIDER", "local").strip().lower()
 CLASSIFIER_PROVIDER = os.getenv("CITYSORT_CLASSIFIER_PROVIDER", "rules").strip().lower()
@@ -285,20 +297,23 @@ UPLOAD_MAX_BYTES = _env_int(
     min_value=1024,
     max_value=500 * 1024 * 1024,
 )
-UPLOAD_ALLOWED_EXTENSIONS = {
+UPLOAD_ALLOWED_EXTENSIONS = frozenset(
     ext.lower().lstrip(".")
     for ext in _env_csv_list(
         "CITYSORT_UPLOAD_ALLOWED_EXTENSIONS",
         "pdf,txt,md,csv,json,docx,docm,png,jpg,jpeg,tif,tiff",
     )
-}
-UPLOAD_ALLOWED_MIME_PREFIXES = {
-    item.strip().lower()
-    for item in _env_csv_list(
-        "CITYSORT_UPLOAD_ALLOWED_MIME_PREFIXES",
-        "application/,text/,image/",
+)
+# A tuple so str.startswith can test every prefix in one call.
+UPLOAD_ALLOWED_MIME_PREFIXES = tuple(
+    dict.fromkeys(
+        item.strip().lower()
+        for item in _env_csv_list(
+            "CITYSORT_UPLOAD_ALLOWED_MIME_PREFIXES",
+            "application/,text/,image/",
+        )
     )
-}
+)
 UPLOAD_VIRUS_SCAN_ENABLED = _env_bool("CITYSORT_UPLOAD_VIRUS_SCAN_ENABLED", False)
 UPLOAD_VIRUS_SCAN_BLOCK_ON_ERROR = _env_bool(
     "CITYSORT_UPLOAD_VIRUS_SCAN_BLOCK_ON_ERROR", True
@@ -346,6 +361,12 @@ WATCH_INTERVAL_SECONDS = _env_int(
     "CITYSORT_WATCH_INTERVAL_SECONDS", 30, min_value=5, max_value=300
 )
 WATCH_ENABLED = _env_bool("CITYSORT_WATCH_ENABLED", False)
+# "auto" wakes the watcher on filesystem events when watchdog is installed
+# and rescans on the interval only as a safety net; "polling" always scans on
+# the interval (use it for network mounts, which deliver no inotify events).
+WATCH_MODE = os.getenv("CITYSORT_WATCH_MODE", "auto").strip().lower() or "auto"
+# With events enabled the safety-net rescan runs this many intervals apart.
+WATCH_EVENT_RESCAN_FACTOR = 10
 
 # Notifications / Webhooks
 WEBHOOK_URL = os.getenv("CITYSORT_WEBHOOK_URL", "").strip()
@@ -60,18 +60,19 @@ def _update_last_sync(connector_type: str, workspace_id: Optional[str] = None) -
     from ..db import get_connection
     from ..repository import utcnow_iso
 
+    now = utcnow_iso()
     if workspace_id is not None:
         query = (
             "UPDATE connector_configs SET last_sync_at = ?, updated_at = ? "
             "WHERE connector_type = ? AND workspace_id = ?"
         )
-        params = (utcnow_iso(), utcnow_iso(), connector_type, workspace_id)
+        params = (now, now, connector_type, workspace_id)
     else:
         query = (
             "UPDATE connector_configs SET last_sync_at = ?, updated_at = ? "
             "WHERE connector_type = ?"
         )
-        params = (utcnow_iso(), utcnow_iso(), connector_type)
+        params = (now, now, connector_type)
 
     with get_connection() as conn:
         conn.execute(query, params)
@@ -96,6 +97,7 @@ def import_from_connector(
     Returns summary dict with imported_count, skipped_count, failed_count, errors.
     """
     from ..config import UPLOAD_DIR
+    from ..db import transaction
     from ..jobs import enqueue_document_processing
     from ..repository import create_audit_event, create_document
 
@@ -161,24 +163,39 @@ def import_from_connector(
             errors.append(f"{filename}: Failed to write file — {exc}")
             continue
 
-        # 5. Create document record
+        # 5-7. Document record, sync log and audit event commit together.
         try:
-            create_document(
-                document={
-                    "id": document_id,
-                    "workspace_id": workspace_id,
-                    "filename": filename,
-                    "storage_path": str(storage_path),
-                    "source_channel": source_channel,
-                    "content_type": content_type,
-                    "status": "ingested",
-                    "requires_review": False,
-                    "confidence": 0.0,
-                    "doc_type": None,
-                    "department": None,
-                    "urgency": "normal",
-                }
-            )
+            with transaction():
+                create_document(
+                    document={
+                        "id": document_id,
+                        "workspace_id": workspace_id,
+                        "filename": filename,
+                        "storage_path": str(storage_path),
+                        "source_channel": source_channel,
+                        "content_type": content_type,
+                        "status": "ingested",
+                        "requires_review": False,
+                        "confidence": 0.0,
+                        "doc_type": None,
+                        "department": None,
+                        "urgency": "normal",
+                    }
+                )
+                _record_sync(
+                    connector_type=connector_type,
+                    external_id=doc.external_id,
+                    filename=filename,
+                    document_id=document_id,
+                    metadata=doc.metadata,
+                )
+                create_audit_event(
+                    document_id=document_id,
+                    action="connector_imported",
+                    actor=actor,
+                    details=f"source={source_channel} external_id={doc.external_id}",
+                    workspace_id=workspace_id,
+                )
         except Exception as exc:
             errors.append(f"{filename}: Failed to create document — {exc}")
             # Clean up file
@@ -188,24 +205,6 @@ def import_from_connector(
                 pass
             continue
 
-        # 6. Record in sync log
-        _record_sync(
-            connector_type=connector_type,
-            external_id=doc.external_id,
-            filename=filename,
-            document_id=document_id,
-            metadata=doc.metadata,
-        )
-
-        # 7. Audit event
-        create_audit_event(
-            document_id=document_id,
-            action="connector_imported",
-            actor=actor,
-            details=f"source={source_channel} external_id={doc.external_id}",
-            workspace_id=workspace_id,
-        )
-
         # Workflow automations (never block connector import).
         try:
             from ..workflows import run_workflows_for_document
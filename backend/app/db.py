@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import os
 import sqlite3
-from contextlib import contextmanager
+import threading
+import weakref
+from contextlib import closing, contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Iterator
+from typing import Any, Callable, Iterator
 from urllib.parse import unquote
 from uuid import uuid4
 
@@ -54,6 +56,34 @@ def _sqlite_target_path() -> str:
     return str(Path(target).expanduser().resolve())
 
 
+# UPDATE ... RETURNING needs SQLite 3.35+; PostgreSQL has always supported it.
+_SQLITE_RETURNING_MIN_VERSION = (3, 35, 0)
+SUPPORTS_RETURNING = (
+    DATABASE_BACKEND == "postgresql"
+    or sqlite3.sqlite_version_info >= _SQLITE_RETURNING_MIN_VERSION
+)
+
+
+def _sqlite_has_json1() -> bool:
+    try:
+        with closing(sqlite3.connect(":memory:")) as probe:
+            probe.execute("SELECT json_valid('{}')")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+# json_extract() lets analytics read extracted_fields without a Python parse.
+SUPPORTS_JSON1 = DATABASE_BACKEND == "sqlite" and _sqlite_has_json1()
+
+
+def database_identity() -> str:
+    """Identify the active datastore so in-process caches never mix databases."""
+    if DATABASE_BACKEND == "postgresql":
+        return DATABASE_URL
+    return _sqlite_target_path()
+
+
 def _convert_placeholders(query: str) -> str:
     # App repositories use "?" placeholders everywhere. psycopg2 expects "%s".
     return query.replace("?", "%s")
@@ -74,6 +104,9 @@ class CursorAdapter:
     def fetchall(self) -> list[Any]:
         return self._cursor.fetchall()
 
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._cursor)
+
     def close(self) -> None:
         try:
             self._cursor.close()
@@ -85,6 +118,7 @@ class ConnectionAdapter:
     def __init__(self, raw_connection: Any, backend: str) -> None:
         self._raw = raw_connection
         self._backend = backend
+        self._closed = False
 
     def _cursor(self) -> Any:
         if self._backend == "postgresql":
@@ -120,52 +154,223 @@ class ConnectionAdapter:
         sql = _convert_placeholders(query) if self._backend == "postgresql" else query
         return self._execute_raw(sql, params)
 
+    def stream(
+        self, query: str, params: Any = None, *, batch_size: int = 500
+    ) -> Iterator[Any]:
+        """Yield rows one at a time instead of materialising the full result.
+
+        PostgreSQL uses a named (server-side) cursor fetching ``batch_size``
+        rows per round trip; SQLite steps its cursor lazily already.
+        """
+        if self._backend == "postgresql":
+            from psycopg2.extras import RealDictCursor
+
+            cursor = self._raw.cursor(
+                name=f"citysort_stream_{uuid4().hex}", cursor_factory=RealDictCursor
+            )
+            cursor.itersize = batch_size
+            sql = _convert_placeholders(query)
+        else:
+            cursor = self._raw.cursor()
+            sql = query
+        try:
+            if params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, tuple(params))
+            yield from cursor
+        finally:
+            cursor.close()
+
     def executemany(self, query: str, seq_of_params: Any) -> CursorAdapter:
         cursor = self._cursor()
         sql = _convert_placeholders(query) if self._backend == "postgresql" else query
         cursor.executemany(sql, list(seq_of_params))
         return CursorAdapter(cursor, lastrowid=getattr(cursor, "lastrowid", None))
 
+    @property
+    def in_transaction(self) -> bool:
+        return bool(getattr(self._raw, "in_transaction", False))
+
     def commit(self) -> None:
         self._raw.commit()
 
     def rollback(self) -> None:
         self._raw.rollback()
 
+    @property
+    def closed(self) -> bool:
+        # psycopg2 reports a non-zero int once closed; sqlite3 has no flag.
+        return self._closed or bool(getattr(self._raw, "closed", False))
+
     def close(self) -> None:
+        self._closed = True
         self._raw.close()
 
 
+# SQLite connections are cached per thread so the page cache and PRAGMA setup
+# survive across repository calls instead of being rebuilt on every query.
+_thread_state = threading.local()
+# Every cached connection, so shutdown can also close those held by pool
+# threads (request handlers, analytics) that never release their own. A
+# connection drops out of the set when its thread exits.
+_thread_connections: weakref.WeakSet[ConnectionAdapter] = weakref.WeakSet()
+_thread_connections_lock = threading.Lock()
+
+
+def _register_thread_connection(connection: ConnectionAdapter) -> None:
+    with _thread_connections_lock:
+        _thread_connections.add(connection)
+
+
+def _open_sqlite_connection(target: str) -> sqlite3.Connection:
+    # Hot repository queries are fixed strings, so a larger statement cache
+    # keeps them prepared across calls on this thread's connection.
+    raw = sqlite3.connect(target, check_same_thread=False, cached_statements=256)
+    raw.row_factory = sqlite3.Row
+    raw.execute("PRAGMA journal_mode=WAL")
+    raw.execute("PRAGMA busy_timeout=5000")
+    raw.execute("PRAGMA synchronous=NORMAL")
+    raw.execute("PRAGMA temp_store=MEMORY")
+    raw.execute("PRAGMA cache_size=-64000")
+    # Read hot pages straight from the OS page cache instead of copying them.
+    raw.execute("PRAGMA mmap_size=268435456")
+    # Per-connection setting: enable it here so every pooled thread
+    # connection enforces the schema's REFERENCES, not just init_db's.
+    raw.execute("PRAGMA foreign_keys=ON")
+    return raw
+
+
+def _thread_sqlite_connection() -> ConnectionAdapter:
+    target = _sqlite_target_path()
+    cached = getattr(_thread_state, "sqlite", None)
+    if cached is not None:
+        cached_target, cached_connection = cached
+        if cached_target == target and not cached_connection.closed:
+            return cached_connection
+        cached_connection.close()
+        _thread_state.sqlite = None
+
+    ensure_directories()
+    connection = ConnectionAdapter(_open_sqlite_connection(target), backend="sqlite")
+    _thread_state.sqlite = (target, connection)
+    _thread_state.depth = 0
+    _register_thread_connection(connection)
+    return connection
+
+
+def _thread_postgres_connection() -> ConnectionAdapter:
+    # PostgreSQL connections are cached per thread too, so repository calls
+    # skip the connect and authentication handshake; a dropped one is reopened.
+    cached = getattr(_thread_state, "postgres_cached", None)
+    if cached is not None and not cached.closed:
+        return cached
+
+    ensure_directories()
+    try:
+        import psycopg2
+    except Exception as exc:  # pragma: no cover - runtime safeguard
+        raise RuntimeError(
+            "CITYSORT_DATABASE_URL targets PostgreSQL but psycopg2 is unavailable."
+        ) from exc
+    raw = psycopg2.connect(
+        DATABASE_URL, connect_timeout=DATABASE_CONNECT_TIMEOUT_SECONDS
+    )
+    raw.autocommit = False
+    connection = ConnectionAdapter(raw, backend="postgresql")
+    _thread_state.postgres_cached = connection
+    _register_thread_connection(connection)
+    return connection
+
+
+def close_thread_connection() -> None:
+    """Close the calling thread's cached database connections, if any."""
+    cached = getattr(_thread_state, "sqlite", None)
+    _thread_state.sqlite = None
+    _thread_state.depth = 0
+    if cached is not None:
+        cached[1].close()
+    postgres = getattr(_thread_state, "postgres_cached", None)
+    _thread_state.postgres_cached = None
+    if postgres is not None and not postgres.closed:
+        postgres.close()
+
+
+def close_all_thread_connections() -> None:
+    """Close every thread's cached connection; call once the threads are idle.
+
+    A thread that queries again afterwards opens a fresh connection.
+    """
+    close_thread_connection()
+    with _thread_connections_lock:
+        connections = list(_thread_connections)
+        _thread_connections.clear()
+    for connection in connections:
+        if not connection.closed:
+            connection.close()
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """Run ``callback`` once the enclosing block commits, or now outside one.
+
+    Callbacks are dropped if the block rolls back.
+    """
+    if getattr(_thread_state, "depth", 0) == 0:
+        callback()
+        return
+    pending = getattr(_thread_state, "after_commit", None)
+    if pending is None:
+        pending = _thread_state.after_commit = []
+    pending.append(callback)
+
+
 @contextmanager
 def get_connection() -> Iterator[ConnectionAdapter]:
-    ensure_directories()
     if DATABASE_BACKEND == "postgresql":
-        try:
-            import psycopg2
-        except Exception as exc:  # pragma: no cover - runtime safeguard
-            raise RuntimeError(
-                "CITYSORT_DATABASE_URL targets PostgreSQL but psycopg2 is unavailable."
-            ) from exc
-        raw = psycopg2.connect(
-            DATABASE_URL, connect_timeout=DATABASE_CONNECT_TIMEOUT_SECONDS
-        )
-        raw.autocommit = False
-        connection = ConnectionAdapter(raw, backend="postgresql")
+        connection = _thread_postgres_connection()
     else:
-        raw = sqlite3.connect(_sqlite_target_path(), check_same_thread=False)
-        raw.row_factory = sqlite3.Row
-        raw.execute("PRAGMA journal_mode=WAL")
-        raw.execute("PRAGMA busy_timeout=5000")
-        connection = ConnectionAdapter(raw, backend="sqlite")
-
+        connection = _thread_sqlite_connection()
+    # Nested get_connection() blocks share the outer transaction; only the
+    # outermost block commits or rolls back.
+    outermost = getattr(_thread_state, "depth", 0) == 0
+    _thread_state.depth = getattr(_thread_state, "depth", 0) + 1
     try:
         yield connection
-        connection.commit()
-    except Exception:
-        connection.rollback()
+        if outermost:
+            connection.commit()
+    except BaseException:
+        # A dropped connection cannot roll back; the next call reopens it.
+        if outermost:
+            _thread_state.after_commit = None
+            if not connection.closed:
+                connection.rollback()
         raise
     finally:
-        connection.close()
+        _thread_state.depth -= 1
+    if outermost:
+        pending = getattr(_thread_state, "after_commit", None)
+        _thread_state.after_commit = None
+        for callback in pending or ():
+            callback()
+
+
+@contextmanager
+def transaction() -> Iterator[ConnectionAdapter]:
+    """Run several repository writes as one atomic commit.
+
+    Repository calls made inside the block join it through get_connection(),
+    so e.g. a document, its audit event and its watch record hit disk with a
+    single commit. On SQLite the write lock is taken up front with
+    BEGIN IMMEDIATE, so the block never fails half-way upgrading a read lock.
+    """
+    with get_connection() as connection:
+        if (
+            DATABASE_BACKEND == "sqlite"
+            and _thread_state.depth == 1
+            and not connection.in_transaction
+        ):
+            connection.execute("BEGIN IMMEDIATE")
+        yield connection
 
 
 def _table_columns(connection: ConnectionAdapter, table_name: str) -> set[str]:
@@ -191,9 +396,6 @@ def _create_tables(connection: ConnectionAdapter) -> None:
         auto_id = "BIGSERIAL PRIMARY KEY"
         boolean_default = "INTEGER NOT NULL DEFAULT 0"
 
-    if DATABASE_BACKEND == "sqlite":
-        connection.execute("PRAGMA foreign_keys = ON")
-
     connection.execute(
         f"""
         CREATE TABLE IF NOT EXISTS documents (
@@ -502,6 +704,19 @@ def _create_tables(connection: ConnectionAdapter) -> None:
         """
     )
 
+    # Verified Stripe webhook bodies waiting for the worker. Kept out of
+    # jobs.payload, which the jobs API serves, because they carry billing PII.
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stripe_webhook_events (
+            event_id TEXT PRIMARY KEY,
+            event_type TEXT NOT NULL,
+            raw_payload TEXT NOT NULL,
+            received_at TEXT NOT NULL
+        )
+        """
+    )
+
     connection.execute(
         f"""
         CREATE TABLE IF NOT EXISTS connector_sync_log (
@@ -530,9 +745,35 @@ def _create_tables(connection: ConnectionAdapter) -> None:
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_documents_assigned_to ON documents (assigned_to, status)"
     )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_assigned_updated ON documents (assigned_to, updated_at DESC)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_updated ON documents (updated_at DESC)"
+    )
+    # Queue snapshot groups by department and counts by status: covering.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_department_status ON documents (department, status)"
+    )
+    # Partial index for the manual queue; its WHERE must match the
+    # repository's unassigned predicate term-for-term to be usable.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_unassigned_status ON documents (status, due_date) "
+        "WHERE assigned_to IS NULL OR TRIM(assigned_to) = ''"
+    )
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_audit_events_document_id ON audit_events (document_id, id DESC)"
     )
+    # Retention purges delete by created_at.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_audit_events_created ON audit_events (created_at)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_notifications_created ON notifications (created_at)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbound_emails_created ON outbound_emails (created_at)"
+    )
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_deployments_created_at ON deployments (created_at DESC)"
     )
@@ -546,6 +787,11 @@ def _create_tables(connection: ConnectionAdapter) -> None:
         "CREATE INDEX IF NOT EXISTS idx_api_keys_status_created ON api_keys (status, created_at DESC)"
     )
     connection.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)")
+    # Login looks users up with lower(email) = lower(?); an expression index
+    # keeps that a seek. Not UNIQUE: legacy rows may differ only by case.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_email_lower ON users (lower(email))"
+    )
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at ASC)"
     )
@@ -756,12 +1002,30 @@ def _run_safe_migrations(connection: ConnectionAdapter) -> None:
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_documents_workspace ON documents (workspace_id, updated_at DESC)"
     )
+    # Covers the monthly plan-limit counts, so they never touch table rows.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_workspace_created ON documents (workspace_id, created_at)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at)"
+    )
+    # Stripe webhooks look workspaces up by customer id.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_workspaces_stripe_customer ON workspaces (stripe_customer_id)"
+    )
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_notifications_workspace ON notifications (workspace_id, created_at DESC)"
     )
     connection.execute(
         "CREATE INDEX IF NOT EXISTS idx_invitations_workspace ON invitations (workspace_id, created_at DESC)"
     )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_templates_ws_type_name ON templates (workspace_id, doc_type, name, id)"
+    )
+    # Unfiltered template listings walk this in (name, id) order, no sort.
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS idx_templates_name ON templates (name, id)"
+    )
     connection.execute(
         "CREATE UNIQUE INDEX IF NOT EXISTS idx_connector_configs_workspace_type ON connector_configs (workspace_id, connector_type)"
     )
@@ -831,9 +1095,25 @@ def _ensure_workspace_bootstrap(connection: ConnectionAdapter) -> None:
             )
 
 
+def _ensure_planner_statistics(connection: ConnectionAdapter) -> None:
+    """Give SQLite's query planner index statistics on first start-up.
+
+    ANALYZE only runs when sqlite_stat1 is missing; PostgreSQL keeps its own
+    statistics through autovacuum.
+    """
+    if DATABASE_BACKEND != "sqlite":
+        return
+    row = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone()
+    if row is None:
+        connection.execute("ANALYZE")
+
+
 def init_db() -> None:
     ensure_directories()
     with get_connection() as connection:
         _create_tables(connection)
         _run_safe_migrations(connection)
         _ensure_workspace_bootstrap(connection)
+        _ensure_planner_statistics(connection)
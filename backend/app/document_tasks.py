@@ -5,6 +5,7 @@ from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 from .config import CONFIDENCE_THRESHOLD, PROCESSED_DIR
+from .db import transaction
 from .pipeline import process_document
 from .repository import create_audit_event, get_document, update_document
 from .rules import get_active_rules
@@ -49,37 +50,38 @@ def process_document_by_id(
                     pass
             due_date = (created_at + timedelta(days=int(sla_days))).isoformat()
 
-        update_document(
-            document_id,
-            updates={
-                "status": final_status,
-                "doc_type": result["doc_type"],
-                "department": result["department"],
-                "urgency": result["urgency"],
-                "confidence": result["confidence"],
-                "requires_review": result["requires_review"],
-                "extracted_text": result["extracted_text"],
-                "extracted_fields": result["extracted_fields"],
-                "missing_fields": result["missing_fields"],
-                "validation_errors": result["validation_errors"],
-                "sla_days": sla_days,
-                "due_date": due_date,
-            },
-        )
-
         target_path = PROCESSED_DIR / source_path.name
         if source_path.exists():
             shutil.copy2(source_path, target_path)
 
-        create_audit_event(
-            document_id=document_id,
-            action="pipeline_processed",
-            actor=actor,
-            details=(
-                f"doc_type={result['doc_type']} confidence={result['confidence']} "
-                f"requires_review={result['requires_review']} threshold={CONFIDENCE_THRESHOLD}"
-            ),
-        )
+        # Result and its audit event land in one commit.
+        with transaction():
+            update_document(
+                document_id,
+                updates={
+                    "status": final_status,
+                    "doc_type": result["doc_type"],
+                    "department": result["department"],
+                    "urgency": result["urgency"],
+                    "confidence": result["confidence"],
+                    "requires_review": result["requires_review"],
+                    "extracted_text": result["extracted_text"],
+                    "extracted_fields": result["extracted_fields"],
+                    "missing_fields": result["missing_fields"],
+                    "validation_errors": result["validation_errors"],
+                    "sla_days": sla_days,
+                    "due_date": due_date,
+                },
+            )
+            create_audit_event(
+                document_id=document_id,
+                action="pipeline_processed",
+                actor=actor,
+                details=(
+                    f"doc_type={result['doc_type']} confidence={result['confidence']} "
+                    f"requires_review={result['requires_review']} threshold={CONFIDENCE_THRESHOLD}"
+                ),
+            )
 
         # Create notification when document needs human review.
         if result["requires_review"]:
@@ -126,12 +128,13 @@ def process_document_by_id(
             pass  # Workflow failure must not block pipeline.
 
     except Exception as exc:  # pragma: no cover - runtime safeguard
-        update_document(
-            document_id, updates={"status": "failed", "requires_review": True}
-        )
-        create_audit_event(
-            document_id=document_id,
-            action="pipeline_failed",
-            actor=actor,
-            details=str(exc),
-        )
+        with transaction():
+            update_document(
+                document_id, updates={"status": "failed", "requires_review": True}
+            )
+            create_audit_event(
+                document_id=document_id,
+                action="pipeline_failed",
+                actor=actor,
+                details=str(exc),
+            )
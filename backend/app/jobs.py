@@ -22,7 +22,8 @@ from .config import (
     WORKER_MAX_ATTEMPTS,
     WORKER_POLL_INTERVAL_SECONDS,
 )
-from .db import get_connection
+from .account_emails import send_queued_account_email
+from .db import get_connection, transaction
 from .document_tasks import process_document_by_id
 from .notifications import create_notification
 from .repository import (
@@ -31,15 +32,19 @@ from .repository import (
     complete_job,
     create_audit_event,
     create_job,
+    delete_stripe_webhook_event,
     fail_job,
     get_job,
+    get_stripe_webhook_payload,
     list_jobs,
     list_overdue_documents,
     purge_audit_events_before,
     purge_notifications_before,
     purge_outbound_emails_before,
+    store_stripe_webhook_event,
     update_document,
 )
+from .stripe_billing import process_webhook_event
 
 logger = logging.getLogger(__name__)
 
@@ -89,6 +94,15 @@ def _dequeue_redis_job(timeout_seconds: int) -> Optional[str]:
         return None
 
 
+def _publish_job(job: dict[str, Any]) -> None:
+    if QUEUE_BACKEND == "redis":
+        if not _enqueue_redis_job(str(job.get("id", ""))):
+            logger.warning(
+                "Failed to enqueue job %s to Redis; it remains queued in DB.",
+                job.get("id"),
+            )
+
+
 def _has_recent_overdue_notification(document_id: str) -> bool:
     cutoff = (
         datetime.now(timezone.utc)
@@ -161,15 +175,16 @@ def _run_overdue_sla_scan() -> None:
             and str(assigned_to or "") != ESCALATION_FALLBACK_USER
         ):
             try:
-                update_document(
-                    document_id, updates={"assigned_to": ESCALATION_FALLBACK_USER}
-                )
-                create_audit_event(
-                    document_id=document_id,
-                    action="auto_escalated",
-                    actor="system_escalation",
-                    details=f"Reassigned from {assigned_to or 'unassigned'} to {ESCALATION_FALLBACK_USER} ({days_late}d overdue)",
-                )
+                with transaction():
+                    update_document(
+                        document_id, updates={"assigned_to": ESCALATION_FALLBACK_USER}
+                    )
+                    create_audit_event(
+                        document_id=document_id,
+                        action="auto_escalated",
+                        actor="system_escalation",
+                        details=f"Reassigned from {assigned_to or 'unassigned'} to {ESCALATION_FALLBACK_USER} ({days_late}d overdue)",
+                    )
                 create_notification(
                     type="assignment",
                     title=f"Escalated: {filename}",
@@ -313,7 +328,43 @@ def _handle_process_document_job(payload: dict[str, Any]) -> dict[str, Any]:
     return {"document_id": document_id, "actor": actor, "processed": True}
 
 
+def _handle_stripe_webhook_job(payload: dict[str, Any]) -> dict[str, Any]:
+    event_id = str(payload.get("event_id", "")).strip()
+    if not event_id:
+        raise ValueError("payload.event_id is required")
+    raw_event = get_stripe_webhook_payload(event_id)
+    if not raw_event:
+        raise ValueError(f"No stored webhook body for event {event_id}")
+    process_webhook_event(raw_event)
+    # The body is only needed until the event is applied.
+    delete_stripe_webhook_event(event_id)
+    return {
+        "event_id": event_id,
+        "event_type": payload.get("event_type"),
+        "processed": True,
+    }
+
+
+def _handle_account_email_job(payload: dict[str, Any]) -> dict[str, Any]:
+    kind = str(payload.get("kind", "")).strip()
+    event_id = str(payload.get("event_id", "")).strip()
+    user_id = str(payload.get("user_id", "")).strip()
+    if not kind or not event_id or not user_id:
+        raise ValueError(
+            "payload.kind, payload.event_id and payload.user_id are required"
+        )
+    sent = send_queued_account_email(
+        kind,
+        event_id=event_id,
+        user_id=user_id,
+        workspace_id=payload.get("workspace_id"),
+    )
+    return {"kind": kind, "sent": sent}
+
+
 _worker.register_handler("process_document", _handle_process_document_job)
+_worker.register_handler("stripe_webhook", _handle_stripe_webhook_job)
+_worker.register_handler("account_email", _handle_account_email_job)
 
 
 def start_job_worker() -> None:
@@ -342,12 +393,64 @@ def enqueue_document_processing(
         workspace_id=workspace_id,
         max_attempts=max_attempts,
     )
-    if QUEUE_BACKEND == "redis":
-        if not _enqueue_redis_job(str(job.get("id", ""))):
-            logger.warning(
-                "Failed to enqueue job %s to Redis; it remains queued in DB.",
-                job.get("id"),
+    _publish_job(job)
+    return job
+
+
+def enqueue_stripe_webhook(
+    *,
+    event_id: str,
+    event_type: str,
+    raw_event: str,
+    max_attempts: int = WORKER_MAX_ATTEMPTS,
+) -> dict[str, Any]:
+    with transaction():
+        job = create_job(
+            job_type="stripe_webhook",
+            payload={"event_id": event_id, "event_type": event_type},
+            actor="stripe",
+            max_attempts=max_attempts,
+            job_id=f"stripe:{event_id}",
+        )
+        # The body stays out of the job payload, which the jobs API serves.
+        # It is stored only for a job that will run; a completed job already
+        # deleted its copy, and a running one still has it.
+        if job.get("status") == "queued":
+            store_stripe_webhook_event(
+                event_id=event_id, event_type=event_type, raw_payload=raw_event
             )
+    # A redelivered event gets its existing job back; only push it if still queued.
+    if job.get("status") == "queued":
+        _publish_job(job)
+    return job
+
+
+def enqueue_account_email(
+    *,
+    kind: str,
+    event_id: str,
+    user_id: str,
+    workspace_id: Optional[str] = None,
+    job_id: Optional[str] = None,
+    max_attempts: int = WORKER_MAX_ATTEMPTS,
+) -> dict[str, Any]:
+    # Ids only: the jobs API serves payloads, so the handler looks up the
+    # recipient and amount itself.
+    job = create_job(
+        job_type="account_email",
+        payload={
+            "kind": kind,
+            "event_id": event_id,
+            "user_id": user_id,
+            "workspace_id": workspace_id,
+        },
+        actor="system",
+        workspace_id=workspace_id,
+        max_attempts=max_attempts,
+        job_id=job_id,
+    )
+    if job.get("status") == "queued":
+        _publish_job(job)
     return job
 
 
@@ -9,11 +9,13 @@ import re
 import uuid
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
 
+import orjson
 from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 
@@ -68,7 +70,7 @@ from .db_import import (
     fetch_import_rows,
     get_row_value,
 )
-from .db import get_connection, init_db
+from .db import close_all_thread_connections, get_connection, init_db, transaction
 from .deployments import deployment_provider_health, trigger_manual_deployment
 from .emailer import email_configured, send_email
 from .jobs import (
@@ -88,14 +90,17 @@ from .observability import (
 from .document_tasks import process_document_by_id
 from .pipeline import route_document
 from .repository import (
+    DOCUMENT_LIST_COLUMNS,
     add_workspace_member,
     count_api_keys,
     count_invitations,
     count_unassigned_manual_documents,
     create_api_key,
     create_audit_event,
+    create_audit_events_bulk,
     create_deployment,
     create_document,
+    create_documents_bulk,
     create_outbound_email,
     create_invitation,
     create_workflow_rule,
@@ -104,7 +109,7 @@ from .repository import (
     get_latest_deployment,
     get_analytics_snapshot,
     get_document,
-    get_default_workspace_for_user,
+    get_default_workspace_id_for_user,
     get_queue_snapshot,
     get_workspace,
     get_workflow_rule,
@@ -114,6 +119,7 @@ from .repository import (
     list_audit_events,
     list_deployments,
     list_documents,
+    list_documents_paged,
     list_invitations,
     list_unassigned_manual_documents,
     list_overdue_documents,
@@ -124,11 +130,13 @@ from .repository import (
     remove_workspace_member,
     validate_invitation,
     update_outbound_email,
-    update_document,
+    update_documents_bulk,
+    update_document_with_audit,
     update_workspace,
     get_user_email_preferences,
     update_user_email_preferences,
     update_workflow_rule,
+    utcnow_iso,
 )
 from .notifications import (
     count_unread,
@@ -163,9 +171,11 @@ from .security import (
     client_ip,
     should_block_insecure_request,
     validate_upload,
+    validate_upload_file,
 )
 from .storage import (
-    read_document_bytes,
+    copy_upload_to_storage,
+    iter_document_bytes,
     validate_encryption_configuration,
     write_document_bytes,
 )
@@ -196,6 +206,7 @@ from .schemas import (
     ApiKeyCreateResponse,
     ApiKeyListResponse,
     ApiKeyRecord,
+    AuditEvent,
     AuditTrailResponse,
     BulkActionRequest,
     BulkActionResponse,
@@ -217,6 +228,7 @@ from .schemas import (
     InvitationCreateRequest,
     InvitationCreateResponse,
     InvitationListResponse,
+    InvitationRecord,
     ManualDeploymentRequest,
     NotificationListResponse,
     NotificationRecord,
@@ -313,6 +325,8 @@ def _startup_initialize() -> None:
 def _shutdown_cleanup() -> None:
     stop_job_worker()
     stop_watcher()
+    # Request and analytics pool threads keep their connections cached.
+    close_all_thread_connections()
 
 
 @asynccontextmanager
@@ -324,12 +338,37 @@ async def app_lifespan(_: FastAPI):
         _shutdown_cleanup()
 
 
+class _OrjsonRequest(Request):
+    """Request whose JSON body is parsed with orjson instead of stdlib json.
+
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so malformed
+    bodies still get FastAPI's usual 422.
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class _OrjsonRoute(APIRoute):
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(_OrjsonRequest(request.scope, request.receive))
+
+        return route_handler
+
+
 app = FastAPI(
     title="CitySort AI MVP",
     description="AI-powered document intake, classification, and routing for local government.",
     version="0.1.0",
     lifespan=app_lifespan,
 )
+# Set before any route is declared: JSON request bodies go through orjson.
+app.router.route_class = _OrjsonRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -462,10 +501,6 @@ def _coerce_optional_text(value: object | None) -> Optional[str]:
     return parsed or None
 
 
-def _utcnow_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
-
-
 def _status_is_approved(status: object) -> bool:
     normalized = str(status or "").strip().lower()
     return normalized in {"approved", "corrected"}
@@ -500,14 +535,16 @@ def _export_approved_snapshot(
 
     try:
         APPROVED_EXPORT_DIR.mkdir(parents=True, exist_ok=True)
-        target_path.write_bytes(read_document_bytes(source_path))
+        with target_path.open("wb") as handle:
+            for chunk in iter_document_bytes(source_path):
+                handle.write(chunk)
         metadata = {
             "document_id": document_id,
             "status": status,
             "trigger": trigger,
             "source_path": str(source_path),
             "export_path": str(target_path),
-            "exported_at": _utcnow_iso(),
+            "exported_at": utcnow_iso(),
         }
         metadata_path.write_text(
             json.dumps(metadata, separators=(",", ":"), ensure_ascii=True),
@@ -561,9 +598,7 @@ def _resolve_workspace_id(identity: dict[str, object]) -> Optional[str]:
         return workspace_id
     user = identity.get("user")
     if isinstance(user, dict):
-        default_workspace = get_default_workspace_for_user(str(user.get("id", "")))
-        if default_workspace and default_workspace.get("id"):
-            return str(default_workspace["id"])
+        return get_default_workspace_id_for_user(str(user.get("id", "")))
     return None
 
 
@@ -718,7 +753,7 @@ def _connectivity_snapshot() -> ConnectivityResponse:
         ocr_provider=_ocr_provider_health(),
         classifier_provider=_classifier_provider_health(),
         deployment_provider=deploy_health,
-        checked_at=_utcnow_iso(),
+        checked_at=utcnow_iso(),
     )
 
 
@@ -945,7 +980,7 @@ def auth_signup(payload: AuthSignupRequest) -> AuthResponse:
     except Exception:
         logger.debug("Welcome email failed (non-blocking)", exc_info=True)
 
-    return AuthResponse(access_token=token, user=UserRecord(**user))
+    return AuthResponse(access_token=token, user=UserRecord.from_row(user))
 
 
 @app.post("/api/auth/bootstrap", response_model=AuthResponse)
@@ -957,7 +992,7 @@ def auth_bootstrap(payload: AuthBootstrapRequest) -> AuthResponse:
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     return AuthResponse(
-        access_token=result["access_token"], user=UserRecord(**result["user"])
+        access_token=result["access_token"], user=UserRecord.from_row(result["user"])
     )
 
 
@@ -965,7 +1000,7 @@ def auth_bootstrap(payload: AuthBootstrapRequest) -> AuthResponse:
 def auth_login(payload: AuthLoginRequest) -> AuthResponse:
     result = authenticate_user(email=payload.email, password=payload.password)
     return AuthResponse(
-        access_token=result["access_token"], user=UserRecord(**result["user"])
+        access_token=result["access_token"], user=UserRecord.from_row(result["user"])
     )
 
 
@@ -975,7 +1010,7 @@ def auth_me(request: Request) -> UserRecord:
     user = identity.get("user")
     if not user:
         if not REQUIRE_AUTH:
-            now = _utcnow_iso()
+            now = utcnow_iso()
             return UserRecord(
                 id="local-dev-user",
                 email="dev@citysort.local",
@@ -994,7 +1029,7 @@ def auth_me(request: Request) -> UserRecord:
         payload["workspace_id"] = active_workspace_id
     if identity.get("workspace_role"):
         payload["workspace_role"] = str(identity.get("workspace_role"))
-    return UserRecord(**payload)
+    return UserRecord.from_row(payload)
 
 
 @app.get("/api/auth/me/email-preferences", response_model=EmailPreferencesResponse)
@@ -1027,8 +1062,7 @@ def auth_list_users(
     request: Request, limit: int = Query(default=200, ge=1, le=500)
 ) -> UserListResponse:
     _enforce(request, role="admin", allow_api_key=False)
-    items = [UserRecord(**item) for item in get_users(limit=limit)]
-    return UserListResponse(items=items)
+    return UserListResponse(items=UserRecord.from_rows(get_users(limit=limit)))
 
 
 @app.post("/api/auth/users", response_model=UserRecord)
@@ -1043,7 +1077,7 @@ def auth_create_user(request: Request, payload: UserCreateRequest) -> UserRecord
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
-    return UserRecord(**user)
+    return UserRecord.from_row(user)
 
 
 @app.patch("/api/auth/users/{user_id}/role", response_model=UserRecord)
@@ -1055,7 +1089,7 @@ def auth_update_user_role(
         updated = set_user_role(user_id=user_id, role=payload.role)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
-    return UserRecord(**updated)
+    return UserRecord.from_row(updated)
 
 
 @app.post("/api/workspaces", response_model=WorkspaceRecord)
@@ -1152,7 +1186,7 @@ def list_workspace_members_endpoint(
     identity = _enforce(request, role="viewer", allow_api_key=False)
     _enforce_workspace_role(identity, workspace_id, required_role="member")
     rows = list_workspace_members(workspace_id)
-    return {"items": [WorkspaceMemberRecord(**row) for row in rows]}
+    return {"items": WorkspaceMemberRecord.from_rows(rows)}
 
 
 @app.delete("/api/workspaces/{workspace_id}/members/{user_id}")
@@ -1179,7 +1213,7 @@ def update_workspace_member_role_endpoint(
     updated = add_workspace_member(
         workspace_id=workspace_id, user_id=user_id, role=payload.role
     )
-    return WorkspaceMemberRecord(**updated)
+    return WorkspaceMemberRecord.from_row(updated)
 
 
 @app.post(
@@ -1214,7 +1248,7 @@ def list_workflows(request: Request) -> WorkflowRuleListResponse:
     rows = list_workflow_rules(
         workspace_id=workspace_id, include_global=False, limit=200
     )
-    return WorkflowRuleListResponse(items=[WorkflowRuleRecord(**r) for r in rows])
+    return WorkflowRuleListResponse(items=WorkflowRuleRecord.from_rows(rows))
 
 
 @app.get("/api/workflows/presets", response_model=WorkflowPresetListResponse)
@@ -1246,8 +1280,8 @@ def apply_workflow_preset_endpoint(
         raise HTTPException(status_code=404, detail=str(exc))
     return WorkflowPresetApplyResponse(
         preset_id=str(result["preset_id"]),
-        created_rules=[WorkflowRuleRecord(**r) for r in result["created_rules"]],
-        created_templates=[TemplateRecord(**t) for t in result["created_templates"]],
+        created_rules=WorkflowRuleRecord.from_rows(result["created_rules"]),
+        created_templates=TemplateRecord.from_rows(result["created_templates"]),
         skipped_rules=int(result.get("skipped_rules") or 0),
         skipped_templates=int(result.get("skipped_templates") or 0),
     )
@@ -1261,7 +1295,7 @@ def get_workflow(rule_id: int, request: Request) -> WorkflowRuleRecord:
     row = get_workflow_rule(rule_id, workspace_id=workspace_id, include_global=False)
     if not row:
         raise HTTPException(status_code=404, detail="Workflow rule not found.")
-    return WorkflowRuleRecord(**row)
+    return WorkflowRuleRecord.from_row(row)
 
 
 @app.post("/api/workflows", response_model=WorkflowRuleRecord)
@@ -1279,7 +1313,7 @@ def create_workflow(
         filters=payload.filters,
         actions=payload.actions,
     )
-    return WorkflowRuleRecord(**created)
+    return WorkflowRuleRecord.from_row(created)
 
 
 @app.patch("/api/workflows/{rule_id}", response_model=WorkflowRuleRecord)
@@ -1300,7 +1334,7 @@ def update_workflow(
     )
     if not updated:
         raise HTTPException(status_code=404, detail="Workflow rule not found.")
-    return WorkflowRuleRecord(**updated)
+    return WorkflowRuleRecord.from_row(updated)
 
 
 @app.delete("/api/workflows/{rule_id}")
@@ -1320,10 +1354,7 @@ def delete_workflow(rule_id: int, request: Request) -> dict[str, bool]:
 @app.get("/api/billing/plans", response_model=PlansResponse)
 def billing_plans() -> PlansResponse:
     """Return available plans and pricing (public)."""
-    from .schemas import PlanInfo
-
-    plans = [PlanInfo(**p) for p in get_plan_info()]
-    return PlansResponse(plans=plans)
+    return PlansResponse(plans=get_plan_info())
 
 
 @app.get("/api/billing/subscription", response_model=SubscriptionResponse)
@@ -1445,44 +1476,43 @@ async def upload_document(
     safe_filename = f"{document_id}_{Path(file.filename).name}"
     file_path = UPLOAD_DIR / safe_filename
 
-    contents = await file.read()
     content_type = (
         file.content_type
         or mimetypes.guess_type(file.filename)[0]
         or "application/octet-stream"
     )
     try:
-        validate_upload(
-            filename=file.filename, content_type=content_type, payload=contents
+        validate_upload_file(
+            filename=file.filename, content_type=content_type, source=file.file
         )
     except UploadValidationError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
-    write_document_bytes(file_path, contents)
-
-    create_document(
-        document={
-            "id": document_id,
-            "workspace_id": workspace_id,
-            "filename": file.filename,
-            "storage_path": str(file_path),
-            "source_channel": source_channel,
-            "content_type": content_type,
-            "status": "ingested",
-            "requires_review": False,
-            "confidence": 0.0,
-            "doc_type": None,
-            "department": None,
-            "urgency": "normal",
-        }
-    )
-
-    create_audit_event(
-        document_id=document_id,
-        action="uploaded",
-        actor=actor,
-        details=f"source_channel={source_channel} file={file.filename}",
-        workspace_id=workspace_id,
-    )
+    copy_upload_to_storage(file.file, file_path)
+
+    with transaction():
+        create_document(
+            document={
+                "id": document_id,
+                "workspace_id": workspace_id,
+                "filename": file.filename,
+                "storage_path": str(file_path),
+                "source_channel": source_channel,
+                "content_type": content_type,
+                "status": "ingested",
+                "requires_review": False,
+                "confidence": 0.0,
+                "doc_type": None,
+                "department": None,
+                "urgency": "normal",
+            }
+        )
+        create_audit_event(
+            document_id=document_id,
+            action="uploaded",
+            actor=actor,
+            details=f"source_channel={source_channel} file={file.filename}",
+            workspace_id=workspace_id,
+        )
 
     # Workflow automations (never block upload).
     try:
@@ -1510,7 +1540,7 @@ async def upload_document(
     if not refreshed:
         raise HTTPException(status_code=500, detail="Unable to load processed document")
 
-    return DocumentResponse(**refreshed)
+    return DocumentResponse.from_row(refreshed)
 
 
 @app.post("/api/documents/import/database", response_model=DatabaseImportResponse)
@@ -1540,6 +1570,10 @@ def import_documents_from_database(
         except ExternalDatabaseError as exc:
             raise HTTPException(status_code=400, detail=str(exc))
 
+        # Validate and store every row's file first, then insert the document
+        # records and audit events in one transaction.
+        pending: list[tuple[int, str, str]] = []
+        new_documents: list[dict[str, object]] = []
         for index, row in enumerate(rows, start=1):
             try:
                 raw_filename = _coerce_optional_text(
@@ -1604,8 +1638,8 @@ def import_documents_from_database(
                     raise ValueError(str(exc))
                 write_document_bytes(storage_path, payload_bytes)
 
-                create_document(
-                    document={
+                new_documents.append(
+                    {
                         "id": document_id,
                         "workspace_id": workspace_id,
                         "filename": filename,
@@ -1620,15 +1654,44 @@ def import_documents_from_database(
                         "urgency": "normal",
                     }
                 )
+                pending.append((index, document_id, filename))
 
-                create_audit_event(
-                    document_id=document_id,
-                    action="database_imported",
-                    actor=actor,
-                    details=f"source_channel={payload.source_channel} row={index}",
-                    workspace_id=workspace_id,
+            except KeyError as exc:
+                missing_column = exc.args[0] if exc.args else "unknown"
+                errors.append(
+                    f"Row {index}: Missing expected column '{missing_column}'."
                 )
+            except Exception as exc:  # pragma: no cover - runtime safeguard
+                errors.append(f"Row {index}: {exc}")
+
+        if pending:
+            try:
+                with transaction():
+                    create_documents_bulk(documents=new_documents)
+                    create_audit_events_bulk(
+                        events=[
+                            {
+                                "document_id": document_id,
+                                "action": "database_imported",
+                                "actor": actor,
+                                "details": f"source_channel={payload.source_channel} row={index}",
+                                "workspace_id": workspace_id,
+                            }
+                            for index, document_id, _ in pending
+                        ]
+                    )
+            except Exception as exc:
+                # Nothing was recorded, so drop the files stored for these rows.
+                for document in new_documents:
+                    try:
+                        Path(str(document["storage_path"])).unlink(missing_ok=True)
+                    except OSError:
+                        pass
+                errors.extend(f"Row {index}: {exc}" for index, _, _ in pending)
+                pending = []
 
+        for index, document_id, filename in pending:
+            try:
                 if payload.process_async:
                     enqueue_document_processing(
                         document_id=document_id,
@@ -1653,12 +1716,6 @@ def import_documents_from_database(
                     imported_items.append(
                         {"id": document_id, "filename": filename, "status": "ingested"}
                     )
-
-            except KeyError as exc:
-                missing_column = exc.args[0] if exc.args else "unknown"
-                errors.append(
-                    f"Row {index}: Missing expected column '{missing_column}'."
-                )
             except Exception as exc:  # pragma: no cover - runtime safeguard
                 errors.append(f"Row {index}: {exc}")
     finally:
@@ -1808,7 +1865,6 @@ def save_connector_config(
     identity = _enforce(request, role="operator")
     workspace_id = _resolve_workspace_id(identity)
     import json as _json
-    from .repository import utcnow_iso
 
     now = utcnow_iso()
     config_json = _json.dumps(payload.config)
@@ -1942,22 +1998,26 @@ def get_documents(
     department: Optional[str] = Query(default=None),
     assigned_to: Optional[str] = Query(default=None),
     limit: int = Query(default=100, ge=1, le=500),
+    cursor_updated_at: Optional[str] = Query(default=None),
+    cursor_id: Optional[str] = Query(default=None),
 ) -> DocumentListResponse:
     identity = _enforce(request, role="viewer")
     workspace_id = _resolve_workspace_id(identity)
-    items: list[DocumentResponse] = []
-    for item in list_documents(
-        status=status,
-        department=department,
-        assigned_to=assigned_to,
-        workspace_id=workspace_id,
-        limit=limit,
-    ):
-        # Keep list endpoint light; full text is available from document detail endpoint.
-        item_payload = dict(item)
-        item_payload["extracted_text"] = None
-        items.append(DocumentResponse(**item_payload))
-    return DocumentListResponse(items=items)
+    # Keep list endpoint light; full text is available from document detail endpoint.
+    try:
+        rows = list_documents_paged(
+            status=status,
+            department=department,
+            assigned_to=assigned_to,
+            workspace_id=workspace_id,
+            cursor_updated_at=cursor_updated_at,
+            cursor_id=cursor_id,
+            limit=limit,
+            columns=DOCUMENT_LIST_COLUMNS,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return DocumentListResponse(items=DocumentResponse.from_rows(rows))
 
 
 @app.get("/api/documents/overdue", response_model=DocumentListResponse)
@@ -1967,12 +2027,8 @@ def get_overdue_documents(
 ) -> DocumentListResponse:
     identity = _enforce(request, role="viewer")
     workspace_id = _resolve_workspace_id(identity)
-    items: list[DocumentResponse] = []
-    for item in list_overdue_documents(workspace_id=workspace_id, limit=limit):
-        item_payload = dict(item)
-        item_payload["extracted_text"] = None
-        items.append(DocumentResponse(**item_payload))
-    return DocumentListResponse(items=items)
+    rows = list_overdue_documents(workspace_id=workspace_id, limit=limit)
+    return DocumentListResponse(items=DocumentResponse.from_rows(rows))
 
 
 @app.get("/api/documents/{document_id}", response_model=DocumentResponse)
@@ -1982,7 +2038,7 @@ def get_document_by_id(document_id: str, request: Request = None) -> DocumentRes
     record = get_document(document_id, workspace_id=workspace_id)
     if not record:
         raise HTTPException(status_code=404, detail="Document not found")
-    return DocumentResponse(**record)
+    return DocumentResponse.from_row(record)
 
 
 @app.get("/api/documents/{document_id}/download")
@@ -2000,9 +2056,8 @@ def download_document(document_id: str, request: Request = None):
     media_type = (
         mimetypes.guess_type(record["filename"])[0] or "application/octet-stream"
     )
-    file_bytes = read_document_bytes(file_path)
-    return Response(
-        content=file_bytes,
+    return StreamingResponse(
+        iter_document_bytes(file_path),
         media_type=media_type,
         headers={"Content-Disposition": f'attachment; filename="{record["filename"]}"'},
     )
@@ -2025,9 +2080,8 @@ def preview_document(document_id: str, request: Request = None):
         or mimetypes.guess_type(record["filename"])[0]
         or "application/octet-stream"
     )
-    file_bytes = read_document_bytes(file_path)
-    return Response(
-        content=file_bytes,
+    return StreamingResponse(
+        iter_document_bytes(file_path),
         media_type=media_type,
         headers={"Content-Disposition": f'inline; filename="{record["filename"]}"'},
     )
@@ -2045,15 +2099,14 @@ async def reupload_document(
     document = get_document(document_id, workspace_id=workspace_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    contents = await file.read()
     content_type = (
         file.content_type
         or mimetypes.guess_type(file.filename)[0]
         or "application/octet-stream"
     )
     try:
-        validate_upload(
-            filename=file.filename, content_type=content_type, payload=contents
+        validate_upload_file(
+            filename=file.filename, content_type=content_type, source=file.file
         )
     except UploadValidationError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
@@ -2062,18 +2115,14 @@ async def reupload_document(
     old_path = Path(document.get("storage_path", ""))
     if old_path.exists():
         old_path.unlink(missing_ok=True)
-    write_document_bytes(new_file_path, contents)
-    update_document(
+    copy_upload_to_storage(file.file, new_file_path)
+    update_document_with_audit(
         document_id,
         updates={
             "storage_path": str(new_file_path),
             "filename": file.filename,
             "content_type": content_type,
         },
-        workspace_id=workspace_id,
-    )
-    create_audit_event(
-        document_id=document_id,
         action="reuploaded",
         actor=str(identity.get("actor", "dashboard_reviewer")),
         details=f"new_file={file.filename}",
@@ -2086,7 +2135,7 @@ async def reupload_document(
     refreshed = get_document(document_id, workspace_id=workspace_id)
     if not refreshed:
         raise HTTPException(status_code=500, detail="Unable to reload document")
-    return DocumentResponse(**refreshed)
+    return DocumentResponse.from_row(refreshed)
 
 
 @app.post("/api/documents/{document_id}/review", response_model=DocumentResponse)
@@ -2135,12 +2184,9 @@ def review_document(
             else "approved"
         )
 
-    updated = update_document(document_id, updates=updates, workspace_id=workspace_id)
-    if not updated:
-        raise HTTPException(status_code=500, detail="Unable to update document")
-
-    create_audit_event(
-        document_id=document_id,
+    updated = update_document_with_audit(
+        document_id,
+        updates=updates,
         action="reviewed",
         actor=str(identity.get("actor", payload.actor)),
         details=(
@@ -2149,6 +2195,9 @@ def review_document(
         ),
         workspace_id=workspace_id,
     )
+    if not updated:
+        raise HTTPException(status_code=500, detail="Unable to update document")
+
     _export_approved_snapshot(
         updated,
         actor=str(identity.get("actor", payload.actor)),
@@ -2185,7 +2234,7 @@ def review_document(
     except Exception:
         pass
 
-    return DocumentResponse(**updated)
+    return DocumentResponse.from_row(updated)
 
 
 @app.post("/api/documents/{document_id}/reprocess", response_model=DocumentResponse)
@@ -2203,7 +2252,7 @@ def reprocess_document(document_id: str, request: Request = None) -> DocumentRes
     if not updated:
         raise HTTPException(status_code=500, detail="Unable to reload document")
 
-    return DocumentResponse(**updated)
+    return DocumentResponse.from_row(updated)
 
 
 @app.get("/api/documents/{document_id}/audit", response_model=AuditTrailResponse)
@@ -2219,7 +2268,9 @@ def get_document_audit(
         raise HTTPException(status_code=404, detail="Document not found")
 
     return AuditTrailResponse(
-        items=list_audit_events(document_id, workspace_id=workspace_id, limit=limit)
+        items=AuditEvent.from_rows(
+            list_audit_events(document_id, workspace_id=workspace_id, limit=limit)
+        )
     )
 
 
@@ -2379,7 +2430,7 @@ def run_manual_deployment(
         details=details,
         external_id=external_id,
     )
-    return DeploymentRecord(**created)
+    return DeploymentRecord.from_row(created)
 
 
 @app.get("/api/platform/deployments", response_model=DeploymentListResponse)
@@ -2387,8 +2438,9 @@ def get_platform_deployments(
     request: Request = None, limit: int = Query(default=20, ge=1, le=100)
 ) -> DeploymentListResponse:
     _enforce(request, role="viewer")
-    items = [DeploymentRecord(**item) for item in list_deployments(limit=limit)]
-    return DeploymentListResponse(items=items)
+    return DeploymentListResponse(
+        items=DeploymentRecord.from_rows(list_deployments(limit=limit))
+    )
 
 
 @app.post("/api/platform/invitations", response_model=InvitationCreateResponse)
@@ -2443,7 +2495,7 @@ def get_platform_invitations(
             limit=limit,
         )
     ]
-    return InvitationListResponse(items=items)
+    return InvitationListResponse(items=InvitationRecord.from_rows(items))
 
 
 @app.post("/api/platform/api-keys", response_model=ApiKeyCreateResponse)
@@ -2472,7 +2524,7 @@ def get_platform_api_keys(
     items = [
         item for item in list_api_keys(include_revoked=include_revoked, limit=limit)
     ]
-    return ApiKeyListResponse(items=items)
+    return ApiKeyListResponse(items=ApiKeyRecord.from_rows(items))
 
 
 @app.post("/api/platform/api-keys/{key_id}/revoke", response_model=ApiKeyRecord)
@@ -2481,7 +2533,7 @@ def revoke_platform_api_key(key_id: int, request: Request = None) -> ApiKeyRecor
     updated = revoke_api_key(key_id=key_id)
     if not updated:
         raise HTTPException(status_code=404, detail="API key not found.")
-    return ApiKeyRecord(**updated)
+    return ApiKeyRecord.from_row(updated)
 
 
 @app.get("/api/platform/summary", response_model=PlatformSummaryResponse)
@@ -2496,7 +2548,9 @@ def get_platform_summary(request: Request = None) -> PlatformSummaryResponse:
     )
     latest_deployment_raw = get_latest_deployment()
     latest_deployment = (
-        DeploymentRecord(**latest_deployment_raw) if latest_deployment_raw else None
+        DeploymentRecord.from_row(latest_deployment_raw)
+        if latest_deployment_raw
+        else None
     )
 
     return PlatformSummaryResponse(
@@ -2668,7 +2722,7 @@ def get_admin_system_health(request: Request = None) -> dict:
                 "path": str(UPLOAD_DIR),
             },
         },
-        "checked_at": datetime.now(timezone.utc).isoformat(),
+        "checked_at": utcnow_iso(),
     }
 
 
@@ -2729,11 +2783,11 @@ def list_worker_jobs(
 ) -> JobListResponse:
     identity = _enforce(request, role="viewer")
     workspace_id = _resolve_workspace_id(identity)
-    items = [
-        JobRecord(**item)
-        for item in get_jobs(status=status, workspace_id=workspace_id, limit=limit)
-    ]
-    return JobListResponse(items=items)
+    return JobListResponse(
+        items=JobRecord.from_rows(
+            get_jobs(status=status, workspace_id=workspace_id, limit=limit)
+        )
+    )
 
 
 @app.get("/api/jobs/{job_id}", response_model=JobRecord)
@@ -2743,7 +2797,7 @@ def get_worker_job(job_id: str, request: Request = None) -> JobRecord:
     record = get_job_by_id(job_id, workspace_id=workspace_id)
     if not record:
         raise HTTPException(status_code=404, detail="Job not found.")
-    return JobRecord(**record)
+    return JobRecord.from_row(record)
 
 
 # =====================================================================
@@ -2773,14 +2827,16 @@ def transition_document(
     if payload.notes:
         updates["reviewer_notes"] = payload.notes
 
-    updated = update_document(document_id, updates=updates, workspace_id=workspace_id)
-    create_audit_event(
-        document_id=document_id,
+    updated = update_document_with_audit(
+        document_id,
+        updates=updates,
         action="status_transition",
         actor=str(identity.get("actor", payload.actor)),
         details=f"from={current} to={payload.status}",
         workspace_id=workspace_id,
     )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Document not found")
     create_notification(
         type="status_change",
         title=f"{document['filename']}: {current} → {payload.status}",
@@ -2820,7 +2876,7 @@ def transition_document(
     except Exception:
         pass
 
-    return DocumentResponse(**updated)
+    return DocumentResponse.from_row(updated)
 
 
 # =====================================================================
@@ -2842,14 +2898,16 @@ def assign_document(
     if document["status"] in ("needs_review", "acknowledged"):
         updates["status"] = "assigned"
 
-    updated = update_document(document_id, updates=updates, workspace_id=workspace_id)
-    create_audit_event(
-        document_id=document_id,
+    updated = update_document_with_audit(
+        document_id,
+        updates=updates,
         action="assigned",
         actor=str(identity.get("actor", payload.actor)),
         details=f"assigned_to={payload.user_id}",
         workspace_id=workspace_id,
     )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Document not found")
     create_notification(
         type="assignment",
         title=f"Document assigned to you: {document['filename']}",
@@ -2880,7 +2938,7 @@ def assign_document(
     except Exception:
         pass
 
-    return DocumentResponse(**updated)
+    return DocumentResponse.from_row(updated)
 
 
 # =====================================================================
@@ -2915,22 +2973,18 @@ def auto_assign_manual_documents(
         updates: dict[str, object] = {"assigned_to": assignee}
         if document.get("status") in ("needs_review", "acknowledged"):
             updates["status"] = "assigned"
-        updated = update_document(
+        updated = update_document_with_audit(
             document_id,
             updates=updates,
+            action="auto_assigned",
+            actor=actor,
+            details=f"assigned_to={assignee}",
             workspace_id=workspace_id,
         )
         if not updated:
             continue
         assigned_count += 1
         processed_document_ids.append(document_id)
-        create_audit_event(
-            document_id=document_id,
-            action="auto_assigned",
-            actor=actor,
-            details=f"assigned_to={assignee}",
-            workspace_id=workspace_id,
-        )
         create_notification(
             type="assignment",
             title=f"Document assigned: {document.get('filename', 'document')}",
@@ -3056,7 +3110,7 @@ def get_notifications(
     )
     unread = count_unread(user_id=user_id, workspace_id=workspace_id)
     return NotificationListResponse(
-        items=[NotificationRecord(**n) for n in items],
+        items=NotificationRecord.from_rows(items),
         unread_count=unread,
     )
 
@@ -3114,18 +3168,22 @@ def get_templates(
     request: Request = None,
     doc_type: Optional[str] = Query(default=None),
     limit: int = Query(default=50, ge=1, le=200),
+    cursor_name: Optional[str] = Query(default=None),
+    cursor_id: Optional[int] = Query(default=None),
 ) -> TemplateListResponse:
     identity = _enforce(request, role="viewer")
     workspace_id = _resolve_workspace_id(identity)
-    items = [
-        TemplateRecord(**t)
-        for t in list_templates(
+    try:
+        rows = list_templates(
             workspace_id=workspace_id,
             doc_type=doc_type,
             limit=limit,
+            cursor_name=cursor_name,
+            cursor_id=cursor_id,
         )
-    ]
-    return TemplateListResponse(items=items)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return TemplateListResponse(items=TemplateRecord.from_rows(rows))
 
 
 @app.post("/api/templates", response_model=TemplateRecord)
@@ -3140,7 +3198,7 @@ def create_new_template(
         doc_type=payload.doc_type,
         template_body=payload.template_body,
     )
-    return TemplateRecord(**record)
+    return TemplateRecord.from_row(record)
 
 
 @app.get("/api/templates/{template_id}", response_model=TemplateRecord)
@@ -3150,7 +3208,7 @@ def get_template_by_id(template_id: int, request: Request = None) -> TemplateRec
     record = get_template(template_id, workspace_id=workspace_id)
     if not record:
         raise HTTPException(status_code=404, detail="Template not found")
-    return TemplateRecord(**record)
+    return TemplateRecord.from_row(record)
 
 
 @app.put("/api/templates/{template_id}", response_model=TemplateRecord)
@@ -3168,7 +3226,7 @@ def update_template_by_id(
     )
     if not record:
         raise HTTPException(status_code=404, detail="Template not found")
-    return TemplateRecord(**record)
+    return TemplateRecord.from_row(record)
 
 
 @app.delete("/api/templates/{template_id}")
@@ -3289,7 +3347,7 @@ def send_document_response(
         updated = update_outbound_email(
             int(email_record["id"]),
             status="sent",
-            sent_at=_utcnow_iso(),
+            sent_at=utcnow_iso(),
             error=None,
         )
         create_audit_event(
@@ -3338,6 +3396,10 @@ def bulk_document_action(
     success_count = 0
     errors: list[str] = []
 
+    # Validate each document first, then apply every update and audit event
+    # in one transaction with a statement per column set.
+    planned: list[tuple[str, dict[str, object]]] = []
+    events: list[dict[str, object]] = []
     for doc_id in payload.document_ids:
         try:
             doc = get_document(doc_id, workspace_id=workspace_id)
@@ -3346,43 +3408,23 @@ def bulk_document_action(
                 continue
 
             if payload.action == "approve":
-                updated_doc = update_document(
-                    doc_id,
-                    updates={
-                        "status": "approved",
-                        "requires_review": False,
-                        "missing_fields": [],
-                        "validation_errors": [],
-                    },
-                    workspace_id=workspace_id,
-                )
-                create_audit_event(
-                    document_id=doc_id,
-                    action="bulk_approved",
-                    actor=actor,
-                    workspace_id=workspace_id,
-                )
-                if updated_doc:
-                    _export_approved_snapshot(
-                        updated_doc, actor=actor, trigger="bulk_approve"
-                    )
+                updates_map: dict[str, object] = {
+                    "status": "approved",
+                    "requires_review": False,
+                    "missing_fields": [],
+                    "validation_errors": [],
+                }
+                event: dict[str, object] = {"action": "bulk_approved"}
 
             elif payload.action == "assign":
                 user_id = payload.params.get("user_id")
                 if not user_id:
                     errors.append(f"{doc_id}: user_id required for assign")
                     continue
-                updates_map: dict[str, object] = {"assigned_to": user_id}
+                updates_map = {"assigned_to": user_id}
                 if doc["status"] in ("needs_review", "acknowledged"):
                     updates_map["status"] = "assigned"
-                update_document(doc_id, updates=updates_map, workspace_id=workspace_id)
-                create_audit_event(
-                    document_id=doc_id,
-                    action="bulk_assigned",
-                    actor=actor,
-                    details=f"assigned_to={user_id}",
-                    workspace_id=workspace_id,
-                )
+                event = {"action": "bulk_assigned", "details": f"assigned_to={user_id}"}
 
             elif payload.action == "transition":
                 target_status = payload.params.get("status")
@@ -3395,31 +3437,44 @@ def bulk_document_action(
                         f"{doc_id}: invalid transition {doc['status']} → {target_status}"
                     )
                     continue
-                updated_doc = update_document(
-                    doc_id,
-                    updates={"status": target_status},
-                    workspace_id=workspace_id,
-                )
-                create_audit_event(
-                    document_id=doc_id,
-                    action="bulk_transition",
-                    actor=actor,
-                    details=f"to={target_status}",
-                    workspace_id=workspace_id,
-                )
-                if updated_doc:
-                    _export_approved_snapshot(
-                        updated_doc, actor=actor, trigger="bulk_transition"
-                    )
+                updates_map = {"status": target_status}
+                event = {"action": "bulk_transition", "details": f"to={target_status}"}
 
             else:
                 errors.append(f"{doc_id}: unknown action '{payload.action}'")
                 continue
 
-            success_count += 1
+            planned.append((doc_id, updates_map))
+            events.append(
+                {
+                    **event,
+                    "document_id": doc_id,
+                    "actor": actor,
+                    "workspace_id": workspace_id,
+                }
+            )
         except Exception as exc:
             errors.append(f"{doc_id}: {exc}")
 
+    if planned:
+        try:
+            with transaction():
+                updated_docs = update_documents_bulk(
+                    updates=planned, workspace_id=workspace_id
+                )
+                create_audit_events_bulk(events=events)
+        except Exception as exc:
+            errors.extend(f"{doc_id}: {exc}" for doc_id, _ in planned)
+        else:
+            success_count = len(planned)
+            if payload.action in ("approve", "transition"):
+                trigger = f"bulk_{payload.action}"
+                for doc_id in dict.fromkeys(doc_id for doc_id, _ in planned):
+                    if doc_id in updated_docs:
+                        _export_approved_snapshot(
+                            updated_docs[doc_id], actor=actor, trigger=trigger
+                        )
+
     return BulkActionResponse(
         success_count=success_count,
         error_count=len(errors),
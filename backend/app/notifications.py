@@ -55,6 +55,12 @@ def create_notification(
     return notification
 
 
+def _notification_from_row(row: Any) -> dict[str, Any]:
+    record = dict(row)
+    record["is_read"] = bool(record.get("is_read"))
+    return record
+
+
 def list_notifications(
     *,
     user_id: Optional[str] = None,
@@ -79,7 +85,7 @@ def list_notifications(
     params.append(limit)
     with get_connection() as connection:
         rows = connection.execute(query, params).fetchall()
-    return [dict(row) for row in rows]
+    return [_notification_from_row(row) for row in rows]
 
 
 def count_unread(
@@ -122,7 +128,7 @@ def mark_read(
     with get_connection() as connection:
         connection.execute(query, params)
         row = connection.execute(select_query, select_params).fetchone()
-    return dict(row) if row else None
+    return _notification_from_row(row) if row else None
 
 
 def mark_all_read(
@@ -13,7 +13,7 @@ from .providers import (
     try_external_classification,
     try_external_ocr,
 )
-from .rules import get_active_rules
+from .rules import get_active_rules, get_rule_keywords
 
 try:
     from pypdf import PdfReader
@@ -144,16 +144,24 @@ def classify_document(
 ) -> tuple[str, float, dict[str, Any]]:
     rules = active_rules or get_active_rules()[0]
     normalized_text = text.lower()
+    # Each distinct keyword is searched for once; doc types then score
+    # against the set of hits.
+    found = {
+        keyword for keyword in get_rule_keywords(rules) if keyword in normalized_text
+    }
     best_doc_type = "other"
     best_hits = 0
     best_keyword_count = 1
 
+    if not found:
+        return "other", 0.45, {"matched_keywords": []}
+
     for doc_type, rule in rules.items():
         keywords: list[str] = rule.get("keywords", [])
         if not keywords:
             continue
 
-        hits = sum(1 for keyword in keywords if keyword in normalized_text)
+        hits = sum(1 for keyword in keywords if keyword in found)
         if hits > best_hits:
             best_doc_type = doc_type
             best_hits = hits
@@ -172,9 +180,7 @@ def classify_document(
 
     confidence = min(confidence, 0.99)
     matched_keywords = [
-        keyword
-        for keyword in rules[best_doc_type]["keywords"]
-        if keyword in normalized_text
+        keyword for keyword in rules[best_doc_type]["keywords"] if keyword in found
     ]
 
     return best_doc_type, round(confidence, 4), {"matched_keywords": matched_keywords}
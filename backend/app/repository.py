@@ -1,45 +1,137 @@
 from __future__ import annotations
 
 import hashlib
-import json
 import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from datetime import timedelta
-from typing import Any, Optional
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, Callable, Optional
 from uuid import uuid4
 
-from .db import get_connection
-
+import orjson
+
+from .config import (
+    ANALYTICS_CACHE_TTL_SECONDS,
+    DATABASE_BACKEND,
+    DEFAULT_WORKSPACE_CACHE_TTL_SECONDS,
+)
+from .db import (
+    SUPPORTS_JSON1,
+    SUPPORTS_RETURNING,
+    after_commit,
+    database_identity,
+    get_connection,
+    transaction,
+)
+
+# Stored as compact JSON text, not a binary encoding: analytics reads
+# extracted_fields in SQL with json_extract(), and the Postgres migration
+# copies these columns verbatim.
 JSON_OBJECT_FIELDS = {"extracted_fields"}
 JSON_LIST_FIELDS = {"missing_fields", "validation_errors"}
 
 
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") for the most recent utcnow_iso() call;
+# swapped as one tuple so concurrent callers never see a torn pair.
+_utc_second_prefix: tuple[int, str] = (-1, "")
+
+
 def utcnow_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    """Current UTC time as ISO-8601 with microseconds, e.g. ``...T12:00:00.000001+00:00``.
 
+    Same shape as ``datetime.now(timezone.utc).isoformat()`` (microseconds are
+    always present), but the date/time prefix is formatted once per second
+    instead of building a datetime on every call.
+    """
+    global _utc_second_prefix
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    cached_second, prefix = _utc_second_prefix
+    if cached_second != seconds:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _utc_second_prefix = (seconds, prefix)
+    return f"{prefix}.{nanos // 1000:06d}+00:00"
 
-def _serialize_value(key: str, value: Any) -> Any:
+
+def _serialize_json(value: Any) -> Optional[str]:
     if value is None:
         return None
-    if key in JSON_OBJECT_FIELDS or key in JSON_LIST_FIELDS:
-        return json.dumps(value)
-    if key == "requires_review":
-        return int(bool(value))
-    return value
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def _serialize_flag(value: Any) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+# Columns needing conversion on the way into the database; every other column
+# is stored as-is, so the common case is one dict miss.
+_COLUMN_SERIALIZERS: dict[str, Callable[[Any], Any]] = {
+    **dict.fromkeys(JSON_OBJECT_FIELDS | JSON_LIST_FIELDS, _serialize_json),
+    "requires_review": _serialize_flag,
+}
+
+
+def _serialize_value(key: str, value: Any) -> Any:
+    serializer = _COLUMN_SERIALIZERS.get(key)
+    return value if serializer is None else serializer(value)
 
 
 def _deserialize_row(row: Any) -> dict[str, Any]:
+    # Unrolled over the three JSON columns (JSON_OBJECT_FIELDS and
+    # JSON_LIST_FIELDS); this runs once per row of every document listing.
     record = dict(row)
-    for key in JSON_OBJECT_FIELDS:
-        raw = record.get(key)
-        record[key] = json.loads(raw) if raw else {}
-    for key in JSON_LIST_FIELDS:
-        raw = record.get(key)
-        record[key] = json.loads(raw) if raw else []
+    raw = record.get("extracted_fields")
+    record["extracted_fields"] = orjson.loads(raw) if raw else {}
+    raw = record.get("missing_fields")
+    record["missing_fields"] = orjson.loads(raw) if raw else []
+    raw = record.get("validation_errors")
+    record["validation_errors"] = orjson.loads(raw) if raw else []
     record["requires_review"] = bool(record.get("requires_review", 0))
     return record
 
 
+def _rows_to_dicts(rows: list[Any]) -> list[dict[str, Any]]:
+    """Turn a fetched result set into plain dicts.
+
+    SQLite rows are zipped against the column names, read once per result
+    set; dict(sqlite3.Row) looks each name up again for every row. The
+    map/zip pipeline keeps the per-row loop in C builtins.
+    """
+    if not rows:
+        return []
+    if isinstance(rows[0], dict):
+        return list(map(dict, rows))
+    return list(map(dict, map(zip, repeat(rows[0].keys()), rows)))
+
+
+def _deserialize_rows(rows: list[Any]) -> list[dict[str, Any]]:
+    """Batch form of _deserialize_row for document listings."""
+    records = _rows_to_dicts(rows)
+    loads = orjson.loads
+    for record in records:
+        raw = record.get("extracted_fields")
+        record["extracted_fields"] = loads(raw) if raw else {}
+        raw = record.get("missing_fields")
+        record["missing_fields"] = loads(raw) if raw else []
+        raw = record.get("validation_errors")
+        record["validation_errors"] = loads(raw) if raw else []
+        record["requires_review"] = bool(record.get("requires_review", 0))
+    return records
+
+
+def _workspace_variants(template: str) -> tuple[str, str]:
+    """Render a query once as (unscoped, workspace-scoped) variants.
+
+    ``template`` marks the start of its WHERE clause with ``{scope}``; the
+    scoped variant expects workspace_id as its first parameter. Index the
+    result with ``workspace_id is not None``.
+    """
+    return template.format(scope=""), template.format(scope="workspace_id = ? AND ")
+
+
 def _apply_workspace_scope(
     *,
     conditions: list[str],
@@ -52,9 +144,46 @@ def _apply_workspace_scope(
         params.append(workspace_id)
 
 
-def create_document(*, document: dict[str, Any]) -> dict[str, Any]:
-    now = utcnow_iso()
-    payload = {
+_DOCUMENT_INSERT_COLUMNS = (
+    "id",
+    "workspace_id",
+    "filename",
+    "storage_path",
+    "source_channel",
+    "content_type",
+    "status",
+    "doc_type",
+    "department",
+    "urgency",
+    "confidence",
+    "requires_review",
+    "extracted_text",
+    "extracted_fields",
+    "missing_fields",
+    "validation_errors",
+    "reviewer_notes",
+    "created_at",
+    "updated_at",
+)
+_INSERT_DOCUMENT_SQL = (
+    f"INSERT INTO documents ({', '.join(_DOCUMENT_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in _DOCUMENT_INSERT_COLUMNS)})"
+)
+# (column, serializer or None) in insert order, resolved once at import.
+_DOCUMENT_INSERT_PLAN = tuple(
+    (column, _COLUMN_SERIALIZERS.get(column)) for column in _DOCUMENT_INSERT_COLUMNS
+)
+
+
+def _document_insert_values(payload: dict[str, Any]) -> list[Any]:
+    return [
+        payload[column] if serializer is None else serializer(payload[column])
+        for column, serializer in _DOCUMENT_INSERT_PLAN
+    ]
+
+
+def _build_document_payload(document: dict[str, Any], *, now: str) -> dict[str, Any]:
+    return {
         "id": document["id"],
         "workspace_id": document.get("workspace_id"),
         "filename": document["filename"],
@@ -76,89 +205,290 @@ def create_document(*, document: dict[str, Any]) -> dict[str, Any]:
         "updated_at": now,
     }
 
-    columns = list(payload.keys())
-    serialized_values = [
-        _serialize_value(column, payload[column]) for column in columns
-    ]
-    placeholders = ", ".join("?" for _ in columns)
+
+def _document_from_payload(payload: dict[str, Any]) -> dict[str, Any]:
+    """Build the stored-row shape of a freshly inserted document without re-reading it."""
+    record = dict(payload)
+    record["extracted_fields"] = payload.get("extracted_fields") or {}
+    record["missing_fields"] = payload.get("missing_fields") or []
+    record["validation_errors"] = payload.get("validation_errors") or []
+    record["requires_review"] = bool(payload.get("requires_review"))
+    record.setdefault("due_date", None)
+    record.setdefault("sla_days", None)
+    record.setdefault("assigned_to", None)
+    return record
+
+
+def _update_returning(
+    connection: Any,
+    query: str,
+    params: Any,
+    *,
+    table: str,
+    row_id: Any,
+    columns: str = "*",
+) -> Any:
+    """Run an UPDATE and return the touched row, in one statement where supported."""
+    if SUPPORTS_RETURNING:
+        rows = connection.execute(f"{query} RETURNING {columns}", params).fetchall()
+        return rows[0] if rows else None
+    cursor = connection.execute(query, params)
+    if cursor.rowcount < 1:
+        return None
+    return connection.execute(
+        f"SELECT {columns} FROM {table} WHERE id = ?", (row_id,)
+    ).fetchone()
+
+
+def create_document(*, document: dict[str, Any]) -> dict[str, Any]:
+    payload = _build_document_payload(document, now=utcnow_iso())
+    serialized_values = _document_insert_values(payload)
 
     with get_connection() as connection:
-        connection.execute(
-            f"INSERT INTO documents ({', '.join(columns)}) VALUES ({placeholders})",
-            serialized_values,
-        )
-        row = connection.execute(
-            "SELECT * FROM documents WHERE id = ?", (payload["id"],)
-        ).fetchone()
+        connection.execute(_INSERT_DOCUMENT_SQL, serialized_values)
+    invalidate_snapshot_cache()
+
+    return _document_from_payload(payload)
 
-    return _deserialize_row(row)
+
+def create_documents_bulk(*, documents: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Insert many documents in one transaction with a single executemany call."""
+    if not documents:
+        return []
+    now = utcnow_iso()
+    payloads = [_build_document_payload(document, now=now) for document in documents]
+    rows = [_document_insert_values(payload) for payload in payloads]
+
+    with get_connection() as connection:
+        connection.executemany(_INSERT_DOCUMENT_SQL, rows)
+    invalidate_snapshot_cache()
+
+    return [_document_from_payload(payload) for payload in payloads]
+
+
+_GET_DOCUMENT_SQL = "SELECT * FROM documents WHERE id = ?"
+_GET_WORKSPACE_DOCUMENT_SQL = (
+    "SELECT * FROM documents WHERE id = ? AND workspace_id = ?"
+)
 
 
 def get_document(
     document_id: str, workspace_id: Optional[str] = None
 ) -> Optional[dict[str, Any]]:
-    conditions = ["id = ?"]
-    params: list[Any] = [document_id]
-    _apply_workspace_scope(
-        conditions=conditions,
-        params=params,
-        workspace_id=workspace_id,
-        column="workspace_id",
-    )
-    query = f"SELECT * FROM documents WHERE {' AND '.join(conditions)}"
+    if workspace_id is None:
+        query, params = _GET_DOCUMENT_SQL, (document_id,)
+    else:
+        query, params = _GET_WORKSPACE_DOCUMENT_SQL, (document_id, workspace_id)
     with get_connection() as connection:
         row = connection.execute(query, params).fetchone()
 
     return _deserialize_row(row) if row else None
 
 
-def list_documents(
-    *,
-    status: Optional[str] = None,
-    department: Optional[str] = None,
-    assigned_to: Optional[str] = None,
-    workspace_id: Optional[str] = None,
-    limit: int = 100,
-) -> list[dict[str, Any]]:
+@lru_cache(maxsize=None)
+def _list_documents_sql(
+    status_filter: str, by_department: bool, by_assignee: bool, by_workspace: bool
+) -> str:
+    """Build (once per filter combination) the list_documents query text.
+
+    ``status_filter`` is ``""``, ``"status"`` or ``"overdue"``. Placeholders
+    appear in the order list_documents appends its params.
+    """
+    conditions = _document_filter_conditions(
+        status_filter, by_department, by_assignee, by_workspace
+    )
     query = "SELECT * FROM documents"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + " ORDER BY updated_at DESC LIMIT ?"
+
+
+def _document_filter_conditions(
+    status_filter: str, by_department: bool, by_assignee: bool, by_workspace: bool
+) -> list[str]:
     conditions: list[str] = []
-    params: list[Any] = []
+    if status_filter == "overdue":
+        conditions.append("due_date IS NOT NULL AND due_date < ?")
+        conditions.append(
+            "status NOT IN ('approved', 'corrected', 'completed', 'archived')"
+        )
+    elif status_filter == "status":
+        conditions.append("status = ?")
+    if by_department:
+        conditions.append("department = ?")
+    if by_assignee:
+        conditions.append("assigned_to = ?")
+    if by_workspace:
+        conditions.append("workspace_id = ?")
+    return conditions
+
 
+def _document_filter_params(
+    *,
+    status: Optional[str],
+    department: Optional[str],
+    assigned_to: Optional[str],
+    workspace_id: Optional[str],
+) -> tuple[str, list[Any]]:
+    """Return (status_filter, params) matching _document_filter_conditions."""
+    params: list[Any] = []
+    status_filter = ""
     if status:
         if status == "overdue":
-            conditions.append("due_date IS NOT NULL AND due_date < ?")
-            conditions.append(
-                "status NOT IN ('approved', 'corrected', 'completed', 'archived')"
-            )
+            status_filter = "overdue"
             params.append(utcnow_iso())
         else:
-            conditions.append("status = ?")
+            status_filter = "status"
             params.append(status)
-
     if department:
-        conditions.append("department = ?")
         params.append(department)
-
     if assigned_to:
-        conditions.append("assigned_to = ?")
         params.append(assigned_to)
-    _apply_workspace_scope(
-        conditions=conditions,
-        params=params,
+    if workspace_id is not None:
+        params.append(workspace_id)
+    return status_filter, params
+
+
+def list_documents(
+    *,
+    status: Optional[str] = None,
+    department: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    workspace_id: Optional[str] = None,
+    limit: int = 100,
+) -> list[dict[str, Any]]:
+    status_filter, params = _document_filter_params(
+        status=status,
+        department=department,
+        assigned_to=assigned_to,
         workspace_id=workspace_id,
-        column="workspace_id",
     )
+    params.append(limit)
 
+    query = _list_documents_sql(
+        status_filter, bool(department), bool(assigned_to), workspace_id is not None
+    )
+    with get_connection() as connection:
+        rows = connection.execute(query, params).fetchall()
+
+    return _deserialize_rows(rows)
+
+
+DOCUMENT_COLUMNS = (
+    *_DOCUMENT_INSERT_COLUMNS,
+    "due_date",
+    "sla_days",
+    "assigned_to",
+)
+# Enough to render a queue row.
+DOCUMENT_SUMMARY_COLUMNS = (
+    "id",
+    "filename",
+    "status",
+    "doc_type",
+    "department",
+    "urgency",
+    "confidence",
+    "requires_review",
+    "updated_at",
+)
+# Everything a list response carries: all but the storage path and full text.
+DOCUMENT_LIST_COLUMNS = tuple(
+    column
+    for column in DOCUMENT_COLUMNS
+    if column not in {"storage_path", "extracted_text"}
+)
+# Queue listings read OCR text only through get_document(); leaving the
+# column out keeps its overflow pages off the scan.
+_SELECT_DOCUMENT_LIST = f"SELECT {', '.join(DOCUMENT_LIST_COLUMNS)} FROM documents"
+
+
+@lru_cache(maxsize=128)
+def _list_documents_paged_sql(
+    columns: tuple[str, ...],
+    status_filter: str,
+    by_department: bool,
+    by_assignee: bool,
+    by_workspace: bool,
+    after_cursor: bool,
+) -> str:
+    conditions = _document_filter_conditions(
+        status_filter, by_department, by_assignee, by_workspace
+    )
+    if after_cursor:
+        conditions.append("(updated_at, id) < (?, ?)")
+    query = f"SELECT {', '.join(columns)} FROM documents"
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
+    return query + " ORDER BY updated_at DESC, id DESC LIMIT ?"
 
-    query += " ORDER BY updated_at DESC LIMIT ?"
+
+def list_documents_paged(
+    *,
+    status: Optional[str] = None,
+    department: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    workspace_id: Optional[str] = None,
+    cursor_updated_at: Optional[str] = None,
+    cursor_id: Optional[str] = None,
+    limit: int = 100,
+    columns: tuple[str, ...] = DOCUMENT_SUMMARY_COLUMNS,
+) -> list[dict[str, Any]]:
+    """List documents newest first, one keyset page at a time.
+
+    Only ``columns`` are read, so listings skip the extracted text. Pass the
+    ``updated_at`` and ``id`` of the last row seen to fetch the next page.
+    """
+    unknown = set(columns) - set(DOCUMENT_COLUMNS)
+    if not columns or unknown:
+        raise ValueError(f"Unknown document columns: {sorted(unknown)}")
+    if (cursor_updated_at is None) != (cursor_id is None):
+        raise ValueError("cursor_updated_at and cursor_id must be given together.")
+
+    status_filter, params = _document_filter_params(
+        status=status,
+        department=department,
+        assigned_to=assigned_to,
+        workspace_id=workspace_id,
+    )
+    after_cursor = cursor_id is not None
+    if after_cursor:
+        params.extend([cursor_updated_at, cursor_id])
     params.append(limit)
 
+    query = _list_documents_paged_sql(
+        tuple(columns),
+        status_filter,
+        bool(department),
+        bool(assigned_to),
+        workspace_id is not None,
+        after_cursor,
+    )
     with get_connection() as connection:
         rows = connection.execute(query, params).fetchall()
 
-    return [_deserialize_row(row) for row in rows]
+    records = _rows_to_dicts(rows)
+    loads = orjson.loads
+    for column in JSON_OBJECT_FIELDS.intersection(columns):
+        for record in records:
+            raw = record[column]
+            record[column] = loads(raw) if raw else {}
+    for column in JSON_LIST_FIELDS.intersection(columns):
+        for record in records:
+            raw = record[column]
+            record[column] = loads(raw) if raw else []
+    if "requires_review" in columns:
+        for record in records:
+            record["requires_review"] = bool(record["requires_review"] or 0)
+    return records
+
+
+@lru_cache(maxsize=256)
+def _update_document_sql(columns: tuple[str, ...], by_workspace: bool) -> str:
+    """UPDATE text per touched-column tuple; callers use a handful of shapes."""
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    where_sql = "id = ? AND workspace_id = ?" if by_workspace else "id = ?"
+    return f"UPDATE documents SET {assignments} WHERE {where_sql}"
 
 
 def update_document(
@@ -173,34 +503,104 @@ def update_document(
     payload = dict(updates)
     payload["updated_at"] = utcnow_iso()
 
-    assignments = ", ".join(f"{key} = ?" for key in payload)
     values = [_serialize_value(key, value) for key, value in payload.items()]
     values.append(document_id)
-    where_clause = "id = ?"
     if workspace_id is not None:
-        where_clause += " AND workspace_id = ?"
         values.append(workspace_id)
 
     with get_connection() as connection:
-        connection.execute(
-            f"UPDATE documents SET {assignments} WHERE {where_clause}", values
-        )
-        select_conditions = ["id = ?"]
-        select_params: list[Any] = [document_id]
-        _apply_workspace_scope(
-            conditions=select_conditions,
-            params=select_params,
-            workspace_id=workspace_id,
-            column="workspace_id",
+        row = _update_returning(
+            connection,
+            _update_document_sql(tuple(payload), workspace_id is not None),
+            values,
+            table="documents",
+            row_id=document_id,
         )
-        row = connection.execute(
-            f"SELECT * FROM documents WHERE {' AND '.join(select_conditions)}",
-            select_params,
-        ).fetchone()
+    invalidate_snapshot_cache()
 
     return _deserialize_row(row) if row else None
 
 
+# Ids per bulk UPDATE or IN lookup; keeps CASE arms and IN lists well
+# under the SQLite bound-parameter limit.
+_BULK_UPDATE_CHUNK = 400
+
+
+def update_documents_bulk(
+    *,
+    updates: list[tuple[str, dict[str, Any]]],
+    workspace_id: Optional[str] = None,
+) -> dict[str, dict[str, Any]]:
+    """Apply per-document updates with one UPDATE per set of touched columns.
+
+    A column set to the same value for every document in a group becomes a
+    plain assignment; otherwise it becomes ``CASE id WHEN ? THEN ? ... END``.
+    Returns the updated documents keyed by id; ids that don't exist (or
+    fall outside ``workspace_id``) are absent.
+    """
+    merged: dict[str, dict[str, Any]] = {}
+    for document_id, changes in updates:
+        merged.setdefault(document_id, {}).update(changes)
+    groups: dict[tuple[str, ...], list[tuple[str, dict[str, Any]]]] = {}
+    for document_id, changes in merged.items():
+        columns = tuple(sorted(key for key in changes if key != "updated_at"))
+        groups.setdefault(columns, []).append((document_id, changes))
+
+    now = utcnow_iso()
+    rows: list[Any] = []
+    with get_connection() as connection:
+        for columns, members in groups.items():
+            for start in range(0, len(members), _BULK_UPDATE_CHUNK):
+                chunk = members[start : start + _BULK_UPDATE_CHUNK]
+                assignments: list[str] = []
+                params: list[Any] = []
+                for column in columns:
+                    values = [
+                        _serialize_value(column, changes[column])
+                        for _, changes in chunk
+                    ]
+                    if all(value == values[0] for value in values):
+                        assignments.append(f"{column} = ?")
+                        params.append(values[0])
+                        continue
+                    arms = " ".join("WHEN ? THEN ?" for _ in chunk)
+                    assignments.append(f"{column} = CASE id {arms} ELSE {column} END")
+                    for (document_id, _), value in zip(chunk, values):
+                        params.extend((document_id, value))
+                assignments.append("updated_at = ?")
+                params.append(now)
+
+                ids = [document_id for document_id, _ in chunk]
+                where_sql = f"id IN ({', '.join('?' for _ in ids)})"
+                params.extend(ids)
+                if workspace_id is not None:
+                    where_sql += " AND workspace_id = ?"
+                    params.append(workspace_id)
+                query = (
+                    f"UPDATE documents SET {', '.join(assignments)} WHERE {where_sql}"
+                )
+                if SUPPORTS_RETURNING:
+                    rows.extend(
+                        connection.execute(f"{query} RETURNING *", params).fetchall()
+                    )
+                    continue
+                connection.execute(query, params)
+                rows.extend(
+                    connection.execute(
+                        f"SELECT * FROM documents WHERE {where_sql}",
+                        params[-(len(ids) + (workspace_id is not None)) :],
+                    ).fetchall()
+                )
+    invalidate_snapshot_cache()
+    return {record["id"]: record for record in _deserialize_rows(rows)}
+
+
+_INSERT_AUDIT_EVENT_SQL = """
+    INSERT INTO audit_events (workspace_id, document_id, action, actor, details, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
 def create_audit_event(
     *,
     document_id: str,
@@ -216,45 +616,190 @@ def create_audit_event(
             resolved_workspace_id = document.get("workspace_id")
     with get_connection() as connection:
         connection.execute(
-            """
-            INSERT INTO audit_events (workspace_id, document_id, action, actor, details, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
+            _INSERT_AUDIT_EVENT_SQL,
             (resolved_workspace_id, document_id, action, actor, details, utcnow_iso()),
         )
 
 
+def update_document_with_audit(
+    document_id: str,
+    *,
+    updates: dict[str, Any],
+    action: str,
+    actor: str,
+    details: Optional[str] = None,
+    workspace_id: Optional[str] = None,
+) -> Optional[dict[str, Any]]:
+    """Update a document and record its audit event in one commit.
+
+    The event takes its workspace from the updated row, so no extra lookup is
+    needed; nothing is audited when the document does not match.
+    """
+    with transaction() as connection:
+        updated = update_document(
+            document_id, updates=updates, workspace_id=workspace_id
+        )
+        if updated is None:
+            return None
+        connection.execute(
+            _INSERT_AUDIT_EVENT_SQL,
+            (
+                updated.get("workspace_id"),
+                document_id,
+                action,
+                actor,
+                details,
+                updated["updated_at"],
+            ),
+        )
+    return updated
+
+
+def create_audit_events_bulk(*, events: list[dict[str, Any]]) -> None:
+    """Insert many audit events in one transaction.
+
+    Each event accepts the same keys as ``create_audit_event``. Missing
+    workspace ids are resolved with a single lookup against ``documents``.
+    """
+    if not events:
+        return
+    created_at = utcnow_iso()
+    unresolved = sorted(
+        {
+            str(event["document_id"])
+            for event in events
+            if event.get("workspace_id") is None
+        }
+    )
+    with get_connection() as connection:
+        workspace_by_document: dict[str, Any] = {}
+        for start in range(0, len(unresolved), _BULK_UPDATE_CHUNK):
+            chunk = unresolved[start : start + _BULK_UPDATE_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = connection.execute(
+                f"SELECT id, workspace_id FROM documents WHERE id IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            workspace_by_document.update(
+                (row["id"], row["workspace_id"]) for row in rows
+            )
+        connection.executemany(
+            _INSERT_AUDIT_EVENT_SQL,
+            [
+                (
+                    event.get("workspace_id")
+                    if event.get("workspace_id") is not None
+                    else workspace_by_document.get(str(event["document_id"])),
+                    event["document_id"],
+                    event["action"],
+                    event["actor"],
+                    event.get("details"),
+                    created_at,
+                )
+                for event in events
+            ],
+        )
+
+
+_LIST_AUDIT_EVENTS_SQL = _workspace_variants(
+    """
+    SELECT id, workspace_id, document_id, action, actor, details, created_at
+    FROM audit_events
+    WHERE {scope}document_id = ?
+    ORDER BY id DESC
+    LIMIT ?
+    """
+)
+
+
 def list_audit_events(
     document_id: str,
     *,
     workspace_id: Optional[str] = None,
     limit: int = 50,
 ) -> list[dict[str, Any]]:
-    conditions = ["document_id = ?"]
-    params: list[Any] = [document_id]
-    _apply_workspace_scope(
-        conditions=conditions,
-        params=params,
-        workspace_id=workspace_id,
-        column="workspace_id",
-    )
-    params.append(limit)
+    params: list[Any] = [document_id, limit]
+    if workspace_id is not None:
+        params.insert(0, workspace_id)
     with get_connection() as connection:
         rows = connection.execute(
-            f"""
-            SELECT id, workspace_id, document_id, action, actor, details, created_at
-            FROM audit_events
-            WHERE {" AND ".join(conditions)}
-            ORDER BY id DESC
-            LIMIT ?
-            """,
-            params,
+            _LIST_AUDIT_EVENTS_SQL[workspace_id is not None], params
         ).fetchall()
 
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
+
+
+# Dashboard aggregates, keyed by (snapshot, database, workspace). Entries carry
+# the write generation they were computed under and a monotonic expiry.
+_snapshot_cache: dict[tuple[str, str, Optional[str]], tuple[int, float, Any]] = {}
+_snapshot_lock = threading.Lock()
+_snapshot_generation = 0
+
+
+def invalidate_snapshot_cache() -> None:
+    """Drop cached dashboard aggregates after a write that changes them.
+
+    Inside a transaction this waits for the commit, so a dashboard read in
+    between cannot cache the pre-commit aggregates under the new generation.
+    """
+    after_commit(_drop_snapshot_cache)
+
+
+def _drop_snapshot_cache() -> None:
+    global _snapshot_generation
+    with _snapshot_lock:
+        _snapshot_generation += 1
+        _snapshot_cache.clear()
+
+
+def _copy_snapshot(value: Any) -> Any:
+    """Copy a snapshot for the caller without deepcopy's generic traversal.
+
+    Snapshots are a list of flat row dicts (queues) or a flat dict whose
+    list values are flat row dicts (analytics); rebuilding those two levels
+    is all a caller's mutation can reach.
+    """
+    if isinstance(value, list):
+        return [dict(row) for row in value]
+    return {
+        key: [dict(row) for row in item] if isinstance(item, list) else item
+        for key, item in value.items()
+    }
+
+
+def _cached_snapshot(
+    name: str, workspace_id: Optional[str], compute: Callable[[], Any]
+) -> Any:
+    if ANALYTICS_CACHE_TTL_SECONDS <= 0:
+        return compute()
+
+    key = (name, database_identity(), workspace_id)
+    now = time.monotonic()
+    with _snapshot_lock:
+        generation = _snapshot_generation
+        cached = _snapshot_cache.get(key)
+    if cached is not None and cached[0] == generation and cached[1] > now:
+        return _copy_snapshot(cached[2])
+
+    value = compute()
+    with _snapshot_lock:
+        # Skip storing if a write landed while we were computing.
+        if generation == _snapshot_generation:
+            _snapshot_cache[key] = (
+                generation,
+                now + ANALYTICS_CACHE_TTL_SECONDS,
+                value,
+            )
+    return _copy_snapshot(value)
 
 
 def get_queue_snapshot(workspace_id: Optional[str] = None) -> list[dict[str, Any]]:
+    return _cached_snapshot(
+        "queues", workspace_id, lambda: _compute_queue_snapshot(workspace_id)
+    )
+
+
+def _compute_queue_snapshot(workspace_id: Optional[str]) -> list[dict[str, Any]]:
     where_sql = ""
     params: list[Any] = []
     if workspace_id is not None:
@@ -276,133 +821,179 @@ def get_queue_snapshot(workspace_id: Optional[str] = None) -> list[dict[str, Any
             params,
         ).fetchall()
 
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
-def get_analytics_snapshot(workspace_id: Optional[str] = None) -> dict[str, Any]:
-    analytics: dict[str, Any] = {
-        "total_documents": 0,
-        "needs_review": 0,
-        "routed_or_approved": 0,
-        "average_confidence": 0.0,
-        "automated_documents": 0,
-        "manual_documents": 0,
-        "automation_rate": 0.0,
-        "manual_rate": 0.0,
-        "manual_unassigned": 0,
-        "missing_contact_email": 0,
-        "by_type": [],
-        "by_status": [],
-    }
+_CONTACT_EMAIL_KEYS = ("applicant_email", "contact_email", "sender_email", "email")
+_OPEN_STATUSES_SQL = (
+    "'ingested', 'needs_review', 'acknowledged', 'assigned', 'in_progress', 'failed'"
+)
+# A document is missing a contact when none of the email keys holds a
+# non-blank value. CASE guards json_extract() against malformed JSON.
+_MISSING_CONTACT_SQL = (
+    "CASE WHEN json_valid(extracted_fields) THEN COALESCE("
+    + ", ".join(
+        f"NULLIF(TRIM(json_extract(extracted_fields, '$.{key}'), char(32, 9, 10, 13)), '')"
+        for key in _CONTACT_EMAIL_KEYS
+    )
+    + ") END IS NULL"
+)
 
-    where_sql = ""
-    where_params: list[Any] = []
-    if workspace_id is not None:
-        where_sql = "WHERE workspace_id = ?"
-        where_params.append(workspace_id)
 
-    with get_connection() as connection:
-        totals = connection.execute(
-            f"""
-            SELECT
-                COUNT(*) AS total_documents,
-                SUM(CASE WHEN requires_review = 1 THEN 1 ELSE 0 END) AS needs_review,
-                SUM(CASE WHEN status IN ('routed', 'approved', 'corrected') THEN 1 ELSE 0 END) AS routed_or_approved,
-                SUM(CASE WHEN status IN ('routed', 'approved', 'corrected', 'completed', 'archived') THEN 1 ELSE 0 END) AS automated_documents,
-                AVG(COALESCE(confidence, 0)) AS average_confidence
-            FROM documents
-            {where_sql}
-            """,
-            where_params,
-        ).fetchone()
+def _has_contact_email(fields: Any) -> bool:
+    """True when any contact email key holds a non-blank value.
 
-        if totals:
-            analytics.update(
-                {
-                    "total_documents": totals["total_documents"] or 0,
-                    "needs_review": totals["needs_review"] or 0,
-                    "routed_or_approved": totals["routed_or_approved"] or 0,
-                    "automated_documents": totals["automated_documents"] or 0,
-                    "average_confidence": round(
-                        float(totals["average_confidence"] or 0.0), 4
-                    ),
-                }
-            )
+    Stops at the first hit and only stringifies non-str values; this runs
+    once per open document when analytics can't use json_extract.
+    """
+    if not isinstance(fields, dict):
+        return False
+    for key in _CONTACT_EMAIL_KEYS:
+        value = fields.get(key)
+        if value is None:
+            continue
+        if isinstance(value, str):
+            if value and not value.isspace():
+                return True
+        elif str(value).strip():
+            return True
+    return False
 
-        manual_unassigned_row = connection.execute(
-            f"""
-            SELECT COUNT(*) AS total
-            FROM documents
-            {"WHERE workspace_id = ? AND" if workspace_id is not None else "WHERE"} status IN ('ingested', 'needs_review', 'acknowledged', 'assigned', 'in_progress', 'failed')
-              AND (assigned_to IS NULL OR TRIM(assigned_to) = '')
-            """,
-            where_params,
-        ).fetchone()
 
-        by_type_rows = connection.execute(
-            f"""
-            SELECT COALESCE(doc_type, 'unclassified') AS label, COUNT(*) AS count
-            FROM documents
-            {where_sql}
-            GROUP BY COALESCE(doc_type, 'unclassified')
-            ORDER BY count DESC, label ASC
-            """,
-            where_params,
-        ).fetchall()
+def get_analytics_snapshot(workspace_id: Optional[str] = None) -> dict[str, Any]:
+    return _cached_snapshot(
+        "analytics", workspace_id, lambda: _compute_analytics_snapshot(workspace_id)
+    )
 
-        by_status_rows = connection.execute(
-            f"""
-            SELECT status AS label, COUNT(*) AS count
-            FROM documents
-            {where_sql}
-            GROUP BY status
-            ORDER BY count DESC, label ASC
-            """,
-            where_params,
-        ).fetchall()
 
-        overdue_row = connection.execute(
-            f"""
-            SELECT COUNT(*) AS total FROM documents
-            {"WHERE workspace_id = ? AND" if workspace_id is not None else "WHERE"} due_date IS NOT NULL AND due_date < ?
-            AND status NOT IN ('approved', 'corrected', 'completed', 'archived')
-            """,
-            [*where_params, utcnow_iso()],
-        ).fetchone()
+# Scalar aggregates of the analytics overview, in output column order.
+_ANALYTICS_TOTAL_COLUMNS = (
+    ("needs_review", "SUM(CASE WHEN requires_review = 1 THEN 1 ELSE 0 END)"),
+    (
+        "routed_or_approved",
+        "SUM(CASE WHEN status IN ('routed', 'approved', 'corrected') THEN 1 ELSE 0 END)",
+    ),
+    (
+        "automated_documents",
+        "SUM(CASE WHEN status IN ('routed', 'approved', 'corrected', 'completed', 'archived') THEN 1 ELSE 0 END)",
+    ),
+    ("average_confidence", "AVG(COALESCE(confidence, 0))"),
+    (
+        "manual_unassigned",
+        f"SUM(CASE WHEN status IN ({_OPEN_STATUSES_SQL}) "
+        "AND (assigned_to IS NULL OR TRIM(assigned_to) = '') THEN 1 ELSE 0 END)",
+    ),
+    (
+        "overdue",
+        "SUM(CASE WHEN due_date IS NOT NULL AND due_date < ? "
+        "AND status NOT IN ('approved', 'corrected', 'completed', 'archived') "
+        "THEN 1 ELSE 0 END)",
+    ),
+)
+
+
+@lru_cache(maxsize=None)
+def _analytics_overview_sql(by_workspace: bool, with_json1: bool) -> str:
+    """Totals plus the doc_type and status breakdowns in one statement.
+
+    The CTE is referenced three times, so it is materialized and documents
+    is scanned once; rows are tagged by ``kind`` ('total', 'type',
+    'status'). The missing contact count joins the totals when SQLite can
+    read the JSON natively.
+    """
+    columns = list(_ANALYTICS_TOTAL_COLUMNS)
+    if with_json1:
+        columns.append(
+            (
+                "missing_contact_email",
+                f"SUM(CASE WHEN status IN ({_OPEN_STATUSES_SQL}) THEN "
+                f"CASE WHEN {_MISSING_CONTACT_SQL} THEN 1 ELSE 0 END ELSE 0 END)",
+            )
+        )
+    totals = ", ".join(f"{expr} AS {name}" for name, expr in columns)
+    blanks = ", ".join("NULL" for _ in columns)
+    # Only the columns the aggregates read, so the materialized CTE stays
+    # small (no extracted_text).
+    fields = "doc_type, status, requires_review, confidence, assigned_to, due_date"
+    if with_json1:
+        fields += ", extracted_fields"
+    where_sql = "WHERE workspace_id = ?" if by_workspace else ""
+    return f"""
+        WITH d AS (SELECT {fields} FROM documents {where_sql})
+        SELECT 'total' AS kind, NULL AS label, COUNT(*) AS count, {totals} FROM d
+        UNION ALL
+        SELECT 'type', COALESCE(doc_type, 'unclassified'), COUNT(*), {blanks}
+        FROM d GROUP BY COALESCE(doc_type, 'unclassified')
+        UNION ALL
+        SELECT 'status', status, COUNT(*), {blanks}
+        FROM d GROUP BY status
+    """
 
-        missing_contact_total = 0
-        contact_rows = connection.execute(
+
+def _analytics_overview(workspace_id: Optional[str]) -> dict[str, Any]:
+    params: list[Any] = [] if workspace_id is None else [workspace_id]
+    params.append(utcnow_iso())
+    with get_connection() as connection:
+        rows = connection.execute(
+            _analytics_overview_sql(workspace_id is not None, SUPPORTS_JSON1), params
+        ).fetchall()
+
+    overview: dict[str, Any] = {}
+    breakdowns: dict[str, list[dict[str, Any]]] = {"type": [], "status": []}
+    for row in rows:
+        kind = row["kind"]
+        if kind != "total":
+            breakdowns[kind].append({"label": row["label"], "count": row["count"]})
+            continue
+        overview = {
+            "total_documents": row["count"] or 0,
+            "needs_review": row["needs_review"] or 0,
+            "routed_or_approved": row["routed_or_approved"] or 0,
+            "automated_documents": row["automated_documents"] or 0,
+            "average_confidence": round(float(row["average_confidence"] or 0.0), 4),
+            "manual_unassigned": int(row["manual_unassigned"] or 0),
+            "overdue": int(row["overdue"] or 0),
+        }
+        if SUPPORTS_JSON1:
+            overview["missing_contact_email"] = int(row["missing_contact_email"] or 0)
+    for name, entries in breakdowns.items():
+        entries.sort(key=lambda entry: (-entry["count"], entry["label"]))
+        overview[f"by_{name}"] = entries
+    return overview
+
+
+def _analytics_missing_contacts(workspace_id: Optional[str]) -> int:
+    """Python fallback for the missing-contact count when JSON1 is unavailable."""
+    where_params: list[Any] = [] if workspace_id is None else [workspace_id]
+    missing_contact_total = 0
+    with get_connection() as connection:
+        # Stream the JSON blobs rather than holding every row at once.
+        contact_rows = connection.stream(
             f"""
             SELECT extracted_fields
             FROM documents
-            {"WHERE workspace_id = ? AND" if workspace_id is not None else "WHERE"} status IN ('ingested', 'needs_review', 'acknowledged', 'assigned', 'in_progress', 'failed')
+            {"WHERE workspace_id = ? AND" if workspace_id is not None else "WHERE"} status IN ({_OPEN_STATUSES_SQL})
             """,
             where_params,
-        ).fetchall()
+        )
         for row in contact_rows:
-            raw = (
-                row["extracted_fields"]
-                if isinstance(row, dict) or hasattr(row, "__getitem__")
-                else None
-            )
-            fields: dict[str, Any]
+            raw = row["extracted_fields"]
+            if not raw:
+                missing_contact_total += 1
+                continue
             try:
-                fields = json.loads(raw) if raw else {}
-            except Exception:
+                fields = orjson.loads(raw)
+            except orjson.JSONDecodeError:
                 fields = {}
-            contact = (
-                str(fields.get("applicant_email", "")).strip()
-                or str(fields.get("contact_email", "")).strip()
-                or str(fields.get("sender_email", "")).strip()
-                or str(fields.get("email", "")).strip()
-            )
-            if not contact:
+            if not _has_contact_email(fields):
                 missing_contact_total += 1
-        analytics["missing_contact_email"] = missing_contact_total
+    return missing_contact_total
 
-        # Emails sent today.
-        try:
-            today_start = utcnow_iso()[:10] + "T00:00:00"
+
+def _analytics_emails_sent_today(workspace_id: Optional[str]) -> int:
+    try:
+        today_start = utcnow_iso()[:10] + "T00:00:00"
+        with get_connection() as connection:
             if workspace_id is None:
                 emails_today_row = connection.execute(
                     "SELECT COUNT(*) AS total FROM outbound_emails WHERE status = 'sent' AND sent_at >= ?",
@@ -413,18 +1004,68 @@ def get_analytics_snapshot(workspace_id: Optional[str] = None) -> dict[str, Any]
                     "SELECT COUNT(*) AS total FROM outbound_emails WHERE workspace_id = ? AND status = 'sent' AND sent_at >= ?",
                     (workspace_id, today_start),
                 ).fetchone()
-            analytics["emails_sent_today"] = (
-                int(emails_today_row["total"]) if emails_today_row else 0
+        return int(emails_today_row["total"]) if emails_today_row else 0
+    except Exception:
+        return 0
+
+
+_analytics_executor: Optional[ThreadPoolExecutor] = None
+_analytics_executor_lock = threading.Lock()
+
+
+def _run_analytics_queries(
+    queries: dict[str, Callable[[], Any]],
+) -> dict[str, Any]:
+    """Run independent analytics reads, concurrently on file-backed SQLite.
+
+    Each pool thread reads through its own cached WAL connection, and
+    sqlite3 releases the GIL while a statement runs, so wall time tracks the
+    slowest query rather than the sum. PostgreSQL runs serially so the pool
+    does not hold extra server connections, as does in-memory SQLite (one
+    database per connection).
+    """
+    global _analytics_executor
+    if DATABASE_BACKEND != "sqlite" or database_identity() == ":memory:":
+        return {name: query() for name, query in queries.items()}
+    with _analytics_executor_lock:
+        if _analytics_executor is None:
+            _analytics_executor = ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix="citysort-analytics"
             )
-        except Exception:
-            analytics["emails_sent_today"] = 0
-
-    analytics["by_type"] = [dict(row) for row in by_type_rows]
-    analytics["by_status"] = [dict(row) for row in by_status_rows]
-    analytics["overdue"] = int(overdue_row["total"]) if overdue_row else 0
-    analytics["manual_unassigned"] = (
-        int(manual_unassigned_row["total"]) if manual_unassigned_row else 0
-    )
+        executor = _analytics_executor
+    futures = {name: executor.submit(query) for name, query in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _compute_analytics_snapshot(workspace_id: Optional[str]) -> dict[str, Any]:
+    analytics: dict[str, Any] = {
+        "total_documents": 0,
+        "needs_review": 0,
+        "routed_or_approved": 0,
+        "average_confidence": 0.0,
+        "automated_documents": 0,
+        "manual_documents": 0,
+        "automation_rate": 0.0,
+        "manual_rate": 0.0,
+        "manual_unassigned": 0,
+        "missing_contact_email": 0,
+        "overdue": 0,
+        "by_type": [],
+        "by_status": [],
+    }
+
+    queries: dict[str, Callable[[], Any]] = {
+        "overview": lambda: _analytics_overview(workspace_id),
+        "emails_sent_today": lambda: _analytics_emails_sent_today(workspace_id),
+    }
+    if not SUPPORTS_JSON1:
+        queries["missing_contact_email"] = lambda: _analytics_missing_contacts(
+            workspace_id
+        )
+    results = _run_analytics_queries(queries)
+
+    analytics.update(results.pop("overview"))
+    analytics.update(results)
     total_documents = int(analytics["total_documents"] or 0)
     automated_documents = int(analytics["automated_documents"] or 0)
     manual_documents = max(total_documents - automated_documents, 0)
@@ -465,7 +1106,7 @@ def list_deployments(*, limit: int = 20) -> list[dict[str, Any]]:
             (limit,),
         ).fetchall()
 
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
 def create_deployment(
@@ -499,16 +1140,19 @@ def create_deployment(
                 finished_at,
             ),
         )
-        row = connection.execute(
-            """
-            SELECT id, environment, provider, status, actor, notes, details, external_id, created_at, finished_at
-            FROM deployments
-            WHERE id = ?
-            """,
-            (cursor.lastrowid,),
-        ).fetchone()
 
-    return dict(row)
+    return {
+        "id": cursor.lastrowid,
+        "environment": environment,
+        "provider": provider,
+        "status": status,
+        "actor": actor,
+        "notes": notes,
+        "details": details,
+        "external_id": external_id,
+        "created_at": created_at,
+        "finished_at": finished_at,
+    }
 
 
 def update_deployment(
@@ -545,20 +1189,24 @@ def update_deployment(
     values = list(updates.values())
     values.append(deployment_id)
     with get_connection() as connection:
-        connection.execute(f"UPDATE deployments SET {assignments} WHERE id = ?", values)
-        row = connection.execute(
-            """
-            SELECT id, environment, provider, status, actor, notes, details, external_id, created_at, finished_at
-            FROM deployments
-            WHERE id = ?
-            """,
-            (deployment_id,),
-        ).fetchone()
+        row = _update_returning(
+            connection,
+            f"UPDATE deployments SET {assignments} WHERE id = ?",
+            values,
+            table="deployments",
+            row_id=deployment_id,
+            columns="id, environment, provider, status, actor, notes, details, external_id, created_at, finished_at",
+        )
 
     return dict(row) if row else None
 
 
-def _hash_secret(secret_value: str) -> str:
+def hash_secret(secret_value: str) -> str:
+    """Hash an API key or invitation token for storage and lookup.
+
+    Stays SHA-256: stored key_hash/token_hash values depend on it, and
+    hashlib's OpenSSL backend already uses the CPU's SHA extensions.
+    """
     return hashlib.sha256(secret_value.encode("utf-8")).hexdigest()
 
 
@@ -566,7 +1214,7 @@ def create_api_key(*, name: str, actor: str) -> tuple[dict[str, Any], str]:
     random_part = secrets.token_urlsafe(26)
     plain_key = f"cs_{random_part}"
     key_prefix = plain_key[:10]
-    key_hash = _hash_secret(plain_key)
+    key_hash = hash_secret(plain_key)
     created_at = utcnow_iso()
 
     with get_connection() as connection:
@@ -577,16 +1225,17 @@ def create_api_key(*, name: str, actor: str) -> tuple[dict[str, Any], str]:
             """,
             (name, key_prefix, key_hash, actor, created_at),
         )
-        row = connection.execute(
-            """
-            SELECT id, name, key_prefix, status, actor, created_at, revoked_at
-            FROM api_keys
-            WHERE id = ?
-            """,
-            (cursor.lastrowid,),
-        ).fetchone()
 
-    return dict(row), plain_key
+    record = {
+        "id": cursor.lastrowid,
+        "name": name,
+        "key_prefix": key_prefix,
+        "status": "active",
+        "actor": actor,
+        "created_at": created_at,
+        "revoked_at": None,
+    }
+    return record, plain_key
 
 
 def list_api_keys(
@@ -606,7 +1255,7 @@ def list_api_keys(
     with get_connection() as connection:
         rows = connection.execute(query, params).fetchall()
 
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
 def count_api_keys(*, status: Optional[str] = None) -> int:
@@ -622,25 +1271,29 @@ def count_api_keys(*, status: Optional[str] = None) -> int:
     return int(row["total"]) if row else 0
 
 
+_API_KEY_COLUMNS = "id, name, key_prefix, status, actor, created_at, revoked_at"
+
+
 def revoke_api_key(*, key_id: int) -> Optional[dict[str, Any]]:
     revoked_at = utcnow_iso()
     with get_connection() as connection:
-        connection.execute(
+        row = _update_returning(
+            connection,
             """
             UPDATE api_keys
             SET status = 'revoked', revoked_at = ?
             WHERE id = ? AND status = 'active'
             """,
             (revoked_at, key_id),
+            table="api_keys",
+            row_id=key_id,
+            columns=_API_KEY_COLUMNS,
         )
-        row = connection.execute(
-            """
-            SELECT id, name, key_prefix, status, actor, created_at, revoked_at
-            FROM api_keys
-            WHERE id = ?
-            """,
-            (key_id,),
-        ).fetchone()
+        if row is None:
+            # Already revoked (or unknown): report the stored row unchanged.
+            row = connection.execute(
+                f"SELECT {_API_KEY_COLUMNS} FROM api_keys WHERE id = ?", (key_id,)
+            ).fetchone()
 
     return dict(row) if row else None
 
@@ -654,7 +1307,7 @@ def create_invitation(
     expires_in_days: int = 7,
 ) -> tuple[dict[str, Any], str]:
     token = secrets.token_urlsafe(24)
-    token_hash = _hash_secret(token)
+    token_hash = hash_secret(token)
     created_at = utcnow_iso()
     expires_at = (
         datetime.now(timezone.utc) + timedelta(days=expires_in_days)
@@ -668,16 +1321,19 @@ def create_invitation(
             """,
             (workspace_id, email, role, token_hash, actor, created_at, expires_at),
         )
-        row = connection.execute(
-            """
-            SELECT id, workspace_id, email, role, status, actor, created_at, expires_at, accepted_at
-            FROM invitations
-            WHERE id = ?
-            """,
-            (cursor.lastrowid,),
-        ).fetchone()
 
-    return dict(row), token
+    record = {
+        "id": cursor.lastrowid,
+        "workspace_id": workspace_id,
+        "email": email,
+        "role": role,
+        "status": "pending",
+        "actor": actor,
+        "created_at": created_at,
+        "expires_at": expires_at,
+        "accepted_at": None,
+    }
+    return record, token
 
 
 def list_invitations(
@@ -706,7 +1362,7 @@ def list_invitations(
     with get_connection() as connection:
         rows = connection.execute(query, params).fetchall()
 
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
 def count_invitations(
@@ -762,15 +1418,17 @@ def create_user(
                 now,
             ),
         )
-        row = connection.execute(
-            """
-            SELECT id, email, full_name, role, status, plan_tier, last_login_at, created_at, updated_at
-            FROM users
-            WHERE id = ?
-            """,
-            (user_id,),
-        ).fetchone()
-    return dict(row)
+    return {
+        "id": user_id,
+        "email": email,
+        "full_name": full_name,
+        "role": role,
+        "status": status,
+        "plan_tier": plan_tier,
+        "last_login_at": None,
+        "created_at": now,
+        "updated_at": now,
+    }
 
 
 def get_user_by_email(
@@ -813,7 +1471,7 @@ def list_users(*, limit: int = 200) -> list[dict[str, Any]]:
             """,
             (limit,),
         ).fetchall()
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
 def update_user_login(user_id: str) -> None:
@@ -828,18 +1486,14 @@ def update_user_login(user_id: str) -> None:
 def update_user_role(user_id: str, *, role: str) -> Optional[dict[str, Any]]:
     now = utcnow_iso()
     with get_connection() as connection:
-        connection.execute(
+        row = _update_returning(
+            connection,
             "UPDATE users SET role = ?, updated_at = ? WHERE id = ?",
             (role, now, user_id),
+            table="users",
+            row_id=user_id,
+            columns="id, email, full_name, role, status, plan_tier, last_login_at, created_at, updated_at",
         )
-        row = connection.execute(
-            """
-            SELECT id, email, full_name, role, status, plan_tier, last_login_at, created_at, updated_at
-            FROM users
-            WHERE id = ?
-            """,
-            (user_id,),
-        ).fetchone()
     return dict(row) if row else None
 
 
@@ -863,51 +1517,96 @@ def create_job(
     actor: str,
     workspace_id: Optional[str] = None,
     max_attempts: int = 3,
+    job_id: Optional[str] = None,
 ) -> dict[str, Any]:
-    job_id = str(uuid4())
+    """Queue a job.
+
+    A caller-chosen ``job_id`` makes this idempotent: an existing job with
+    that id is returned as is, except a failed one, which is requeued with
+    fresh attempts so a redelivered request gets another chance.
+    """
+    job_id = job_id or str(uuid4())
     created_at = utcnow_iso()
     with get_connection() as connection:
-        connection.execute(
+        inserted = connection.execute(
             """
             INSERT INTO jobs (id, workspace_id, job_type, payload, status, result, error, actor, attempts, max_attempts, worker_id, created_at, started_at, finished_at)
             VALUES (?, ?, ?, ?, 'queued', NULL, NULL, ?, 0, ?, NULL, ?, NULL, NULL)
+            ON CONFLICT(id) DO NOTHING
             """,
             (
                 job_id,
                 workspace_id,
                 job_type,
-                json.dumps(payload),
+                _serialize_json(payload),
                 actor,
                 max_attempts,
                 created_at,
             ),
-        )
-        row = connection.execute(
-            """
-            SELECT *
-            FROM jobs
-            WHERE id = ?
-            """,
-            (job_id,),
-        ).fetchone()
-    return _deserialize_job(row) if row else {}
+        ).rowcount
+    if not inserted:
+        with get_connection() as connection:
+            revived = _update_returning(
+                connection,
+                """
+                UPDATE jobs
+                SET status = 'queued', attempts = 0, error = NULL, worker_id = NULL,
+                    started_at = NULL, finished_at = NULL
+                WHERE id = ? AND status = 'failed'
+                """,
+                (job_id,),
+                table="jobs",
+                row_id=job_id,
+            )
+        if revived:
+            return _deserialize_job(revived)
+        existing = get_job(job_id)
+        if existing:
+            return existing
+    return {
+        "id": job_id,
+        "workspace_id": workspace_id,
+        "job_type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "result": {},
+        "error": None,
+        "actor": actor,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "worker_id": None,
+        "created_at": created_at,
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+_GET_JOB_SQL = "SELECT * FROM jobs WHERE id = ?"
+_GET_WORKSPACE_JOB_SQL = "SELECT * FROM jobs WHERE id = ? AND workspace_id = ?"
+_LIST_JOBS_SQL = {
+    (False, False): "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?",
+    (True, False): (
+        "SELECT * FROM jobs WHERE workspace_id = ? ORDER BY created_at DESC LIMIT ?"
+    ),
+    (False, True): (
+        "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?"
+    ),
+    (True, True): (
+        "SELECT * FROM jobs WHERE workspace_id = ? AND status = ? "
+        "ORDER BY created_at DESC LIMIT ?"
+    ),
+}
 
 
 def get_job(
     job_id: str, workspace_id: Optional[str] = None
 ) -> Optional[dict[str, Any]]:
-    conditions = ["id = ?"]
-    params: list[Any] = [job_id]
-    _apply_workspace_scope(
-        conditions=conditions,
-        params=params,
-        workspace_id=workspace_id,
-        column="workspace_id",
-    )
+    if workspace_id is None:
+        query, params = _GET_JOB_SQL, (job_id,)
+    else:
+        query, params = _GET_WORKSPACE_JOB_SQL, (job_id, workspace_id)
     with get_connection() as connection:
-        row = connection.execute(
-            f"SELECT * FROM jobs WHERE {' AND '.join(conditions)}", params
-        ).fetchone()
+        row = connection.execute(query, params).fetchone()
     return _deserialize_job(row) if row else None
 
 
@@ -917,92 +1616,85 @@ def list_jobs(
     workspace_id: Optional[str] = None,
     limit: int = 100,
 ) -> list[dict[str, Any]]:
-    query = "SELECT * FROM jobs"
     params: list[Any] = []
-    conditions: list[str] = []
-    _apply_workspace_scope(
-        conditions=conditions,
-        params=params,
-        workspace_id=workspace_id,
-        column="workspace_id",
-    )
+    if workspace_id is not None:
+        params.append(workspace_id)
     if status:
-        conditions.append("status = ?")
         params.append(status)
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-    query += " ORDER BY created_at DESC LIMIT ?"
     params.append(limit)
+    query = _LIST_JOBS_SQL[(workspace_id is not None, bool(status))]
 
     with get_connection() as connection:
         rows = connection.execute(query, params).fetchall()
-    return [_deserialize_job(row) for row in rows]
+    return [_decode_job_record(record) for record in _rows_to_dicts(rows)]
+
+
+_CLAIM_JOB_SQL = """
+    UPDATE jobs
+    SET status = 'running',
+        started_at = ?,
+        worker_id = ?,
+        attempts = attempts + 1,
+        error = NULL
+    WHERE id = {target} AND status = 'queued'
+"""
+
+_NEXT_QUEUED_JOB_SQL = """
+    SELECT id
+    FROM jobs
+    WHERE status = 'queued'
+    ORDER BY created_at ASC
+    LIMIT 1
+"""
+if DATABASE_BACKEND == "postgresql":
+    # Concurrent workers skip a row another worker has already locked instead
+    # of queueing behind it and then finding it no longer 'queued'.
+    _NEXT_QUEUED_JOB_SQL += "    FOR UPDATE SKIP LOCKED\n"
 
 
 def claim_next_job(*, worker_id: str) -> Optional[dict[str, Any]]:
     started_at = utcnow_iso()
     with get_connection() as connection:
-        row = connection.execute(
-            """
-            SELECT id
-            FROM jobs
-            WHERE status = 'queued'
-            ORDER BY created_at ASC
-            LIMIT 1
-            """
-        ).fetchone()
-        if not row:
-            return None
-
-        job_id = row["id"]
-        updated = connection.execute(
-            """
-            UPDATE jobs
-            SET status = 'running',
-                started_at = ?,
-                worker_id = ?,
-                attempts = attempts + 1,
-                error = NULL
-            WHERE id = ? AND status = 'queued'
-            """,
-            (started_at, worker_id, job_id),
-        )
-        if updated.rowcount != 1:
-            return None
-
-        claimed = connection.execute(
-            "SELECT * FROM jobs WHERE id = ?", (job_id,)
-        ).fetchone()
+        if SUPPORTS_RETURNING:
+            # Pick and claim the oldest queued job in a single statement.
+            rows = connection.execute(
+                _CLAIM_JOB_SQL.format(target=f"({_NEXT_QUEUED_JOB_SQL})")
+                + " RETURNING *",
+                (started_at, worker_id),
+            ).fetchall()
+            claimed = rows[0] if rows else None
+        else:
+            row = connection.execute(_NEXT_QUEUED_JOB_SQL).fetchone()
+            if not row:
+                return None
+            claimed = _update_returning(
+                connection,
+                _CLAIM_JOB_SQL.format(target="?"),
+                (started_at, worker_id, row["id"]),
+                table="jobs",
+                row_id=row["id"],
+            )
     return _deserialize_job(claimed) if claimed else None
 
 
 def claim_job_by_id(*, job_id: str, worker_id: str) -> Optional[dict[str, Any]]:
     started_at = utcnow_iso()
     with get_connection() as connection:
-        updated = connection.execute(
-            """
-            UPDATE jobs
-            SET status = 'running',
-                started_at = ?,
-                worker_id = ?,
-                attempts = attempts + 1,
-                error = NULL
-            WHERE id = ? AND status = 'queued'
-            """,
+        row = _update_returning(
+            connection,
+            _CLAIM_JOB_SQL.format(target="?"),
             (started_at, worker_id, job_id),
+            table="jobs",
+            row_id=job_id,
         )
-        if updated.rowcount != 1:
-            return None
-        row = connection.execute(
-            "SELECT * FROM jobs WHERE id = ?", (job_id,)
-        ).fetchone()
     return _deserialize_job(row) if row else None
 
 
 def complete_job(*, job_id: str, result: dict[str, Any]) -> Optional[dict[str, Any]]:
     finished_at = utcnow_iso()
     with get_connection() as connection:
-        connection.execute(
+        row = _update_returning(
+            connection,
             """
             UPDATE jobs
             SET status = 'completed',
@@ -1011,68 +1703,54 @@ def complete_job(*, job_id: str, result: dict[str, Any]) -> Optional[dict[str, A
                 worker_id = worker_id
             WHERE id = ?
             """,
-            (json.dumps(result), finished_at, job_id),
+            (_serialize_json(result), finished_at, job_id),
+            table="jobs",
+            row_id=job_id,
         )
-        row = connection.execute(
-            "SELECT * FROM jobs WHERE id = ?", (job_id,)
-        ).fetchone()
     return _deserialize_job(row) if row else None
 
 
 def fail_job(*, job_id: str, error: str) -> Optional[dict[str, Any]]:
     finished_at = utcnow_iso()
     with get_connection() as connection:
-        row = connection.execute(
-            """
-            SELECT id, attempts, max_attempts
-            FROM jobs
-            WHERE id = ?
-            """,
-            (job_id,),
-        ).fetchone()
-        if not row:
-            return None
-
-        should_retry = int(row["attempts"]) < int(row["max_attempts"])
-        status = "queued" if should_retry else "failed"
-        connection.execute(
+        # Jobs with attempts left go back to the queue; the retry decision is
+        # made against the row's current values inside the UPDATE itself.
+        row = _update_returning(
+            connection,
             """
             UPDATE jobs
-            SET status = ?,
+            SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
                 error = ?,
-                finished_at = ?,
-                started_at = CASE WHEN ? THEN NULL ELSE started_at END
+                finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END,
+                started_at = CASE WHEN attempts < max_attempts THEN NULL ELSE started_at END
             WHERE id = ?
             """,
-            (
-                status,
-                error,
-                finished_at if not should_retry else None,
-                1 if should_retry else 0,
-                job_id,
-            ),
+            (error, finished_at, job_id),
+            table="jobs",
+            row_id=job_id,
         )
-        updated = connection.execute(
-            "SELECT * FROM jobs WHERE id = ?", (job_id,)
-        ).fetchone()
-    return _deserialize_job(updated) if updated else None
+    return _deserialize_job(row) if row else None
+
+
+_OVERDUE_WHERE = """
+    WHERE {scope}due_date IS NOT NULL AND due_date < ?
+    AND status NOT IN ('approved', 'corrected', 'completed', 'archived')
+"""
+_COUNT_OVERDUE_SQL = _workspace_variants(
+    "SELECT COUNT(*) AS total FROM documents" + _OVERDUE_WHERE
+)
+_LIST_OVERDUE_SQL = _workspace_variants(
+    _SELECT_DOCUMENT_LIST + _OVERDUE_WHERE + "ORDER BY due_date ASC LIMIT ?"
+)
 
 
 def count_overdue_documents(workspace_id: Optional[str] = None) -> int:
-    now = utcnow_iso()
-    params: list[Any] = [now]
-    where_sql = "due_date IS NOT NULL AND due_date < ?"
+    params: list[Any] = [utcnow_iso()]
     if workspace_id is not None:
-        where_sql = "workspace_id = ? AND " + where_sql
         params.insert(0, workspace_id)
     with get_connection() as connection:
         row = connection.execute(
-            f"""
-            SELECT COUNT(*) AS total FROM documents
-            WHERE {where_sql}
-            AND status NOT IN ('approved', 'corrected', 'completed', 'archived')
-            """,
-            params,
+            _COUNT_OVERDUE_SQL[workspace_id is not None], params
         ).fetchone()
     return int(row["total"]) if row else 0
 
@@ -1080,79 +1758,71 @@ def count_overdue_documents(workspace_id: Optional[str] = None) -> int:
 def list_overdue_documents(
     *, workspace_id: Optional[str] = None, limit: int = 100
 ) -> list[dict[str, Any]]:
-    now = utcnow_iso()
-    params: list[Any] = [now, limit]
-    where_sql = "due_date IS NOT NULL AND due_date < ?"
+    params: list[Any] = [utcnow_iso(), limit]
     if workspace_id is not None:
-        where_sql = "workspace_id = ? AND " + where_sql
-        params = [workspace_id, now, limit]
+        params.insert(0, workspace_id)
     with get_connection() as connection:
         rows = connection.execute(
-            f"""
-            SELECT * FROM documents
-            WHERE {where_sql}
-            AND status NOT IN ('approved', 'corrected', 'completed', 'archived')
-            ORDER BY due_date ASC LIMIT ?
-            """,
-            params,
+            _LIST_OVERDUE_SQL[workspace_id is not None], params
         ).fetchall()
-    return [_deserialize_row(row) for row in rows]
+    return _deserialize_rows(rows)
+
+
+_LIST_ASSIGNED_TO_SQL = _workspace_variants(
+    _SELECT_DOCUMENT_LIST + " WHERE {scope}assigned_to = ? "
+    "ORDER BY updated_at DESC LIMIT ?"
+)
 
 
 def list_assigned_to(
     user_id: str, *, workspace_id: Optional[str] = None, limit: int = 100
 ) -> list[dict[str, Any]]:
-    conditions = ["assigned_to = ?"]
-    params: list[Any] = [user_id]
-    _apply_workspace_scope(
-        conditions=conditions,
-        params=params,
-        workspace_id=workspace_id,
-        column="workspace_id",
-    )
-    params.append(limit)
+    params: list[Any] = [user_id, limit]
+    if workspace_id is not None:
+        params.insert(0, workspace_id)
     with get_connection() as connection:
         rows = connection.execute(
-            f"SELECT * FROM documents WHERE {' AND '.join(conditions)} ORDER BY updated_at DESC LIMIT ?",
-            params,
+            _LIST_ASSIGNED_TO_SQL[workspace_id is not None], params
         ).fetchall()
-    return [_deserialize_row(row) for row in rows]
+    return _deserialize_rows(rows)
+
+
+_UNASSIGNED_MANUAL_WHERE = """
+    WHERE {scope}status IN ('needs_review', 'acknowledged')
+      AND (assigned_to IS NULL OR TRIM(assigned_to) = '')
+"""
+_LIST_UNASSIGNED_MANUAL_SQL = _workspace_variants(
+    _SELECT_DOCUMENT_LIST
+    + _UNASSIGNED_MANUAL_WHERE
+    + """
+    ORDER BY
+      CASE WHEN due_date IS NULL THEN 1 ELSE 0 END,
+      due_date ASC,
+      updated_at DESC
+    LIMIT ?
+    """
+)
+_COUNT_UNASSIGNED_MANUAL_SQL = _workspace_variants(
+    "SELECT COUNT(*) AS total FROM documents" + _UNASSIGNED_MANUAL_WHERE
+)
 
 
 def list_unassigned_manual_documents(
     *, workspace_id: Optional[str] = None, limit: int = 200
 ) -> list[dict[str, Any]]:
-    workspace_condition = "workspace_id = ? AND" if workspace_id is not None else ""
     params: list[Any] = [limit] if workspace_id is None else [workspace_id, limit]
     with get_connection() as connection:
         rows = connection.execute(
-            f"""
-            SELECT * FROM documents
-            WHERE {workspace_condition} status IN ('needs_review', 'acknowledged')
-              AND (assigned_to IS NULL OR TRIM(assigned_to) = '')
-            ORDER BY
-              CASE WHEN due_date IS NULL THEN 1 ELSE 0 END,
-              due_date ASC,
-              updated_at DESC
-            LIMIT ?
-            """,
-            params,
+            _LIST_UNASSIGNED_MANUAL_SQL[workspace_id is not None], params
         ).fetchall()
-    return [_deserialize_row(row) for row in rows]
+    return _deserialize_rows(rows)
 
 
 def count_unassigned_manual_documents(workspace_id: Optional[str] = None) -> int:
-    workspace_condition = "workspace_id = ? AND" if workspace_id is not None else ""
     params: list[Any] = [] if workspace_id is None else [workspace_id]
     with get_connection() as connection:
         row = connection.execute(
-            f"""
-            SELECT COUNT(*) AS total
-            FROM documents
-            WHERE {workspace_condition} status IN ('needs_review', 'acknowledged')
-              AND (assigned_to IS NULL OR TRIM(assigned_to) = '')
-            """,
-            params,
+            _COUNT_UNASSIGNED_MANUAL_SQL[workspace_id is not None], params
         ).fetchone()
     return int(row["total"]) if row else 0
 
@@ -1194,11 +1864,21 @@ def create_outbound_email(
                 sent_at,
             ),
         )
-        row = connection.execute(
-            "SELECT * FROM outbound_emails WHERE id = ?",
-            (cursor.lastrowid,),
-        ).fetchone()
-    return dict(row)
+    if status == "sent":
+        invalidate_snapshot_cache()
+    return {
+        "id": cursor.lastrowid,
+        "workspace_id": resolved_workspace_id,
+        "document_id": document_id,
+        "to_email": to_email,
+        "subject": subject,
+        "body": body,
+        "status": status,
+        "provider": provider,
+        "error": error,
+        "created_at": created_at,
+        "sent_at": sent_at,
+    }
 
 
 def update_outbound_email(
@@ -1227,58 +1907,67 @@ def update_outbound_email(
     assignments = ", ".join(f"{key} = ?" for key in updates)
     values = list(updates.values()) + [email_id]
     with get_connection() as connection:
-        connection.execute(
+        row = _update_returning(
+            connection,
             f"UPDATE outbound_emails SET {assignments} WHERE id = ?",
             values,
+            table="outbound_emails",
+            row_id=email_id,
         )
-        row = connection.execute(
-            "SELECT * FROM outbound_emails WHERE id = ?",
-            (email_id,),
-        ).fetchone()
+    if status == "sent":
+        invalidate_snapshot_cache()
     return dict(row) if row else None
 
 
 def _deserialize_job(row: Any) -> dict[str, Any]:
     if row is None:
         return {}
-    record = dict(row)
+    return _decode_job_record(dict(row))
+
+
+def _decode_job_record(record: dict[str, Any]) -> dict[str, Any]:
     for key in ("payload", "result"):
         raw = record.get(key)
         if raw:
             try:
-                record[key] = json.loads(raw)
-            except Exception:
+                record[key] = orjson.loads(raw)
+            except orjson.JSONDecodeError:
                 record[key] = {}
         else:
             record[key] = {}
     return record
 
 
+# Rows per retention DELETE. Each chunk commits on its own so a large purge
+# never holds the write lock (or grows the WAL) for the whole backlog.
+_PURGE_CHUNK_ROWS = 5000
+
+
+def _purge_before(table: str, older_than_iso: str) -> int:
+    query = (
+        f"DELETE FROM {table} WHERE id IN "
+        f"(SELECT id FROM {table} WHERE created_at < ? LIMIT ?)"
+    )
+    removed = 0
+    while True:
+        with get_connection() as connection:
+            cursor = connection.execute(query, (older_than_iso, _PURGE_CHUNK_ROWS))
+        deleted = max(int(cursor.rowcount), 0)
+        removed += deleted
+        if deleted < _PURGE_CHUNK_ROWS:
+            return removed
+
+
 def purge_audit_events_before(older_than_iso: str) -> int:
-    with get_connection() as connection:
-        cursor = connection.execute(
-            "DELETE FROM audit_events WHERE created_at < ?",
-            (older_than_iso,),
-        )
-    return max(int(cursor.rowcount), 0)
+    return _purge_before("audit_events", older_than_iso)
 
 
 def purge_notifications_before(older_than_iso: str) -> int:
-    with get_connection() as connection:
-        cursor = connection.execute(
-            "DELETE FROM notifications WHERE created_at < ?",
-            (older_than_iso,),
-        )
-    return max(int(cursor.rowcount), 0)
+    return _purge_before("notifications", older_than_iso)
 
 
 def purge_outbound_emails_before(older_than_iso: str) -> int:
-    with get_connection() as connection:
-        cursor = connection.execute(
-            "DELETE FROM outbound_emails WHERE created_at < ?",
-            (older_than_iso,),
-        )
-    return max(int(cursor.rowcount), 0)
+    return _purge_before("outbound_emails", older_than_iso)
 
 
 # --- Invitation acceptance ---
@@ -1287,7 +1976,7 @@ def purge_outbound_emails_before(older_than_iso: str) -> int:
 def get_invitation_by_token(
     token: str, workspace_id: Optional[str] = None
 ) -> Optional[dict[str, Any]]:
-    token_hash = _hash_secret(token)
+    token_hash = hash_secret(token)
     conditions = ["token_hash = ?"]
     params: list[Any] = [token_hash]
     _apply_workspace_scope(
@@ -1312,7 +2001,7 @@ def validate_invitation(
     token: str, workspace_id: Optional[str] = None
 ) -> dict[str, Any]:
     """Validate invitation token and return invitation details."""
-    token_hash = _hash_secret(token)
+    token_hash = hash_secret(token)
     now = utcnow_iso()
     conditions = ["token_hash = ?"]
     params: list[Any] = [token_hash]
@@ -1422,16 +2111,18 @@ def update_user_plan(
     return dict(row) if row else None
 
 
+_USER_BY_STRIPE_CUSTOMER_SQL = """
+    SELECT id, email, full_name, role, status, plan_tier, stripe_customer_id,
+           last_login_at, created_at, updated_at
+    FROM users
+    WHERE stripe_customer_id = ?
+"""
+
+
 def get_user_by_stripe_customer(stripe_customer_id: str) -> Optional[dict[str, Any]]:
     with get_connection() as connection:
         row = connection.execute(
-            """
-            SELECT id, email, full_name, role, status, plan_tier, stripe_customer_id,
-                   last_login_at, created_at, updated_at
-            FROM users
-            WHERE stripe_customer_id = ?
-            """,
-            (stripe_customer_id,),
+            _USER_BY_STRIPE_CUSTOMER_SQL, (stripe_customer_id,)
         ).fetchone()
     return dict(row) if row else None
 
@@ -1526,6 +2217,42 @@ def update_subscription_status(
     return dict(row) if row else None
 
 
+def store_stripe_webhook_event(
+    *, event_id: str, event_type: str, raw_payload: str
+) -> None:
+    """Keep a verified webhook body until the worker applies it."""
+    with get_connection() as connection:
+        connection.execute(
+            """
+            INSERT INTO stripe_webhook_events (event_id, event_type, raw_payload, received_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(event_id) DO NOTHING
+            """,
+            (event_id, event_type, raw_payload, utcnow_iso()),
+        )
+
+
+def get_stripe_webhook_payload(event_id: str) -> Optional[str]:
+    with get_connection() as connection:
+        row = connection.execute(
+            "SELECT raw_payload FROM stripe_webhook_events WHERE event_id = ?",
+            (event_id,),
+        ).fetchone()
+    return str(row["raw_payload"]) if row else None
+
+
+def delete_stripe_webhook_event(event_id: str) -> None:
+    with get_connection() as connection:
+        connection.execute(
+            "DELETE FROM stripe_webhook_events WHERE event_id = ?", (event_id,)
+        )
+
+
+_PAYMENT_EVENT_BY_STRIPE_ID_SQL = (
+    "SELECT * FROM payment_events WHERE stripe_event_id = ?"
+)
+
+
 def create_payment_event(
     *,
     user_id: Optional[str],
@@ -1538,14 +2265,20 @@ def create_payment_event(
     billing_type: Optional[str] = None,
     raw_payload: Optional[str] = None,
 ) -> dict[str, Any]:
+    """Record a Stripe event once; a repeated event id returns the stored row.
+
+    The conflict is skipped rather than raised, so a redelivery does not
+    abort the webhook handler's surrounding transaction.
+    """
     now = utcnow_iso()
     with get_connection() as connection:
-        cursor = connection.execute(
+        connection.execute(
             """
             INSERT INTO payment_events
                 (workspace_id, user_id, stripe_event_id, event_type, amount_cents, currency,
                  plan_tier, billing_type, raw_payload, created_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(stripe_event_id) DO NOTHING
             """,
             (
                 workspace_id,
@@ -1561,12 +2294,19 @@ def create_payment_event(
             ),
         )
         row = connection.execute(
-            "SELECT * FROM payment_events WHERE id = ?",
-            (cursor.lastrowid,),
+            _PAYMENT_EVENT_BY_STRIPE_ID_SQL, (stripe_event_id,)
         ).fetchone()
     return dict(row)
 
 
+def get_payment_event(stripe_event_id: str) -> Optional[dict[str, Any]]:
+    with get_connection() as connection:
+        row = connection.execute(
+            _PAYMENT_EVENT_BY_STRIPE_ID_SQL, (stripe_event_id,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
 def count_user_documents_this_month(user_id: Optional[str] = None) -> int:
     """Count documents created in the current calendar month (for plan limits)."""
     now = datetime.now(timezone.utc)
@@ -1642,7 +2382,7 @@ def create_workspace(
                 slug,
                 owner_id,
                 plan_tier,
-                json.dumps(settings or {}),
+                _serialize_json(settings or {}),
                 now,
                 now,
             ),
@@ -1659,6 +2399,7 @@ def create_workspace(
             "SELECT * FROM workspaces WHERE id = ?",
             (workspace_id,),
         ).fetchone()
+    invalidate_default_workspace(owner_id)
     return dict(row)
 
 
@@ -1671,17 +2412,39 @@ def get_workspace(workspace_id: str) -> Optional[dict[str, Any]]:
     return dict(row) if row else None
 
 
+_WORKSPACE_BY_STRIPE_CUSTOMER_SQL = (
+    "SELECT * FROM workspaces WHERE stripe_customer_id = ?"
+)
+
+
 def get_workspace_by_stripe_customer(
     stripe_customer_id: str,
 ) -> Optional[dict[str, Any]]:
     with get_connection() as connection:
         row = connection.execute(
-            "SELECT * FROM workspaces WHERE stripe_customer_id = ?",
-            (stripe_customer_id,),
+            _WORKSPACE_BY_STRIPE_CUSTOMER_SQL, (stripe_customer_id,)
         ).fetchone()
     return dict(row) if row else None
 
 
+def get_billing_principals_by_customer(
+    stripe_customer_id: str,
+) -> tuple[Optional[dict[str, Any]], Optional[dict[str, Any]]]:
+    """Return the (workspace, user) billed to a Stripe customer.
+
+    Both lookups share one connection, so a webhook pays for a single
+    checkout instead of two.
+    """
+    with get_connection() as connection:
+        workspace = connection.execute(
+            _WORKSPACE_BY_STRIPE_CUSTOMER_SQL, (stripe_customer_id,)
+        ).fetchone()
+        user = connection.execute(
+            _USER_BY_STRIPE_CUSTOMER_SQL, (stripe_customer_id,)
+        ).fetchone()
+    return (dict(workspace) if workspace else None, dict(user) if user else None)
+
+
 def get_workspace_by_slug(slug: str) -> Optional[dict[str, Any]]:
     with get_connection() as connection:
         row = connection.execute(
@@ -1703,7 +2466,7 @@ def list_user_workspaces(user_id: str) -> list[dict[str, Any]]:
             """,
             (user_id,),
         ).fetchall()
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
 def get_workspace_role(user_id: str, workspace_id: str) -> Optional[str]:
@@ -1742,6 +2505,7 @@ def add_workspace_member(
             """,
             (workspace_id, user_id),
         ).fetchone()
+    invalidate_default_workspace(user_id)
     return dict(row)
 
 
@@ -1751,6 +2515,7 @@ def remove_workspace_member(*, workspace_id: str, user_id: str) -> bool:
             "DELETE FROM workspace_members WHERE workspace_id = ? AND user_id = ?",
             (workspace_id, user_id),
         )
+    invalidate_default_workspace(user_id)
     return int(cursor.rowcount) > 0
 
 
@@ -1767,7 +2532,7 @@ def list_workspace_members(workspace_id: str) -> list[dict[str, Any]]:
             """,
             (workspace_id,),
         ).fetchall()
-    return [dict(row) for row in rows]
+    return _rows_to_dicts(rows)
 
 
 def update_workspace(
@@ -1780,7 +2545,7 @@ def update_workspace(
     if name is not None:
         updates["name"] = str(name).strip() or "Workspace"
     if settings is not None:
-        updates["settings"] = json.dumps(settings)
+        updates["settings"] = _serialize_json(settings)
     if not updates:
         return get_workspace(workspace_id)
     updates["updated_at"] = utcnow_iso()
@@ -1840,6 +2605,66 @@ def get_default_workspace_for_user(user_id: str) -> Optional[dict[str, Any]]:
     return dict(row) if row else None
 
 
+# Default workspace ids, keyed by (database, user). Entries carry a monotonic
+# expiry; membership writes in this process drop them once they commit.
+_default_workspace_cache: dict[tuple[str, str], tuple[float, Optional[str]]] = {}
+_default_workspace_lock = threading.Lock()
+_default_workspace_generation = 0
+
+
+def invalidate_default_workspace(user_id: Optional[str] = None) -> None:
+    """Forget the cached default workspace of one user, or of everyone.
+
+    Inside a transaction this waits for the commit, so a concurrent read
+    cannot cache the membership as it was before the write.
+    """
+    after_commit(lambda: _drop_default_workspace(user_id))
+
+
+def _drop_default_workspace(user_id: Optional[str]) -> None:
+    global _default_workspace_generation
+    with _default_workspace_lock:
+        _default_workspace_generation += 1
+        if user_id is None:
+            _default_workspace_cache.clear()
+            return
+        for key in [k for k in _default_workspace_cache if k[1] == user_id]:
+            del _default_workspace_cache[key]
+
+
+def get_default_workspace_id_for_user(user_id: str) -> Optional[str]:
+    """Return the id of the user's default workspace, cached for a short TTL.
+
+    Only the id is cached; callers that need the workspace row (plan tier,
+    billing ids) should keep using get_default_workspace_for_user.
+    """
+    if DEFAULT_WORKSPACE_CACHE_TTL_SECONDS <= 0:
+        workspace = get_default_workspace_for_user(user_id)
+        return str(workspace["id"]) if workspace and workspace.get("id") else None
+
+    key = (database_identity(), user_id)
+    now = time.monotonic()
+    with _default_workspace_lock:
+        generation = _default_workspace_generation
+        cached = _default_workspace_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    workspace = get_default_workspace_for_user(user_id)
+    workspace_id = str(workspace["id"]) if workspace and workspace.get("id") else None
+    with _default_workspace_lock:
+        # Skip storing if a membership write landed while we were reading.
+        if generation != _default_workspace_generation:
+            return workspace_id
+        if len(_default_workspace_cache) >= 10_000:
+            _default_workspace_cache.clear()
+        _default_workspace_cache[key] = (
+            now + DEFAULT_WORKSPACE_CACHE_TTL_SECONDS,
+            workspace_id,
+        )
+    return workspace_id
+
+
 # ── Email Preferences ────────────────────────────────────────────────
 
 _DEFAULT_EMAIL_PREFS: dict[str, bool] = {
@@ -1862,8 +2687,8 @@ def get_user_email_preferences(user_id: str) -> dict[str, bool]:
     if not row or not row["email_preferences"]:
         return dict(_DEFAULT_EMAIL_PREFS)
     try:
-        stored = json.loads(row["email_preferences"])
-    except (json.JSONDecodeError, TypeError):
+        stored = orjson.loads(row["email_preferences"])
+    except (orjson.JSONDecodeError, TypeError):
         stored = {}
     return {**_DEFAULT_EMAIL_PREFS, **stored}
 
@@ -1881,7 +2706,7 @@ def update_user_email_preferences(
     with get_connection() as connection:
         connection.execute(
             "UPDATE users SET email_preferences = ?, updated_at = ? WHERE id = ?",
-            (json.dumps(merged), now, user_id),
+            (_serialize_json(merged), now, user_id),
         )
     return merged
 
@@ -1890,16 +2715,19 @@ def update_user_email_preferences(
 
 
 def _deserialize_workflow_rule(row: Any) -> dict[str, Any]:
-    record = dict(row)
+    return _decode_workflow_rule_record(dict(row))
+
+
+def _decode_workflow_rule_record(record: dict[str, Any]) -> dict[str, Any]:
     record["enabled"] = bool(record.get("enabled", 1))
     filters_raw = record.pop("filters_json", "") if "filters_json" in record else ""
     actions_raw = record.pop("actions_json", "") if "actions_json" in record else ""
     try:
-        filters = json.loads(filters_raw) if filters_raw else {}
+        filters = orjson.loads(filters_raw) if filters_raw else {}
     except Exception:
         filters = {}
     try:
-        actions = json.loads(actions_raw) if actions_raw else []
+        actions = orjson.loads(actions_raw) if actions_raw else []
     except Exception:
         actions = []
     record["filters"] = filters if isinstance(filters, dict) else {}
@@ -1937,7 +2765,7 @@ def list_workflow_rules(
     params.append(limit)
     with get_connection() as connection:
         rows = connection.execute(query, params).fetchall()
-    return [_deserialize_workflow_rule(row) for row in rows]
+    return [_decode_workflow_rule_record(record) for record in _rows_to_dicts(rows)]
 
 
 def get_workflow_rule(
@@ -1971,8 +2799,8 @@ def create_workflow_rule(
     enabled: bool = True,
 ) -> dict[str, Any]:
     now = utcnow_iso()
-    filters_json = json.dumps(filters or {}, separators=(",", ":"), ensure_ascii=True)
-    actions_json = json.dumps(actions or [], separators=(",", ":"), ensure_ascii=True)
+    filters_json = _serialize_json(filters or {})
+    actions_json = _serialize_json(actions or [])
     with get_connection() as connection:
         cursor = connection.execute(
             """
@@ -2017,13 +2845,9 @@ def update_workflow_rule(
     if trigger_event is not None:
         updates["trigger_event"] = trigger_event
     if filters is not None:
-        updates["filters_json"] = json.dumps(
-            filters, separators=(",", ":"), ensure_ascii=True
-        )
+        updates["filters_json"] = _serialize_json(filters)
     if actions is not None:
-        updates["actions_json"] = json.dumps(
-            actions, separators=(",", ":"), ensure_ascii=True
-        )
+        updates["actions_json"] = _serialize_json(actions)
     if not updates:
         return get_workflow_rule(
             rule_id, workspace_id=workspace_id, include_global=False
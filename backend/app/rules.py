@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import json
-from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Tuple
+from typing import Any, Iterable, Optional, Tuple
 
 from .config import DATA_DIR, DOCUMENT_TYPE_RULES, RULES_CONFIG_PATH
 
 RuleDefinition = dict[str, Any]
 RuleMap = dict[str, RuleDefinition]
 
+# (path, mtime_ns, size) of the rules file -> its normalized rules.
+_RULES_CACHE: Optional[tuple[tuple[str, int, int], RuleMap]] = None
+# Last rules map passed to get_rule_keywords() and its distinct keywords.
+_KEYWORDS_CACHE: Optional[tuple[RuleMap, tuple[str, ...]]] = None
+
 
 def _default_other_rule() -> RuleDefinition:
     return {
@@ -29,15 +34,17 @@ def _ensure_rules_dir() -> None:
     get_rules_path().parent.mkdir(parents=True, exist_ok=True)
 
 
-def _dedupe(items: list[str]) -> list[str]:
-    seen: set[str] = set()
-    result: list[str] = []
-    for item in items:
-        if item in seen:
-            continue
-        seen.add(item)
-        result.append(item)
-    return result
+def _dedupe(items: Iterable[str]) -> list[str]:
+    # dict preserves first-seen order; fromkeys runs the loop in C.
+    return list(dict.fromkeys(items))
+
+
+def _clean_items(raw_items: list[Any], *, lower: bool = False) -> list[str]:
+    """Stripped, non-empty, first-seen-unique string values of a rule list."""
+    stripped = (str(item).strip() for item in raw_items)
+    if lower:
+        stripped = (item.lower() for item in stripped)
+    return _dedupe(item for item in stripped if item)
 
 
 def normalize_rules(candidate: dict[str, Any]) -> RuleMap:
@@ -57,9 +64,7 @@ def normalize_rules(candidate: dict[str, Any]) -> RuleMap:
         keywords_raw = raw_rule.get("keywords", [])
         if not isinstance(keywords_raw, list):
             raise ValueError(f"rule '{doc_type}.keywords' must be a list")
-        keywords = _dedupe(
-            [str(item).strip().lower() for item in keywords_raw if str(item).strip()]
-        )
+        keywords = _clean_items(keywords_raw, lower=True)
 
         department = str(raw_rule.get("department", "General Intake")).strip()
         if not department:
@@ -68,9 +73,7 @@ def normalize_rules(candidate: dict[str, Any]) -> RuleMap:
         required_fields_raw = raw_rule.get("required_fields", [])
         if not isinstance(required_fields_raw, list):
             raise ValueError(f"rule '{doc_type}.required_fields' must be a list")
-        required_fields = _dedupe(
-            [str(item).strip() for item in required_fields_raw if str(item).strip()]
-        )
+        required_fields = _clean_items(required_fields_raw)
 
         sla_days_raw = raw_rule.get("sla_days")
         if sla_days_raw in (None, ""):
@@ -91,16 +94,56 @@ def normalize_rules(candidate: dict[str, Any]) -> RuleMap:
     return normalized
 
 
+@lru_cache(maxsize=1)
 def get_default_rules() -> RuleMap:
-    defaults = deepcopy(DOCUMENT_TYPE_RULES)
-    return normalize_rules(defaults)
+    """Normalized built-in rules. Shared between callers: treat as read-only."""
+    return normalize_rules(DOCUMENT_TYPE_RULES)
+
+
+def get_rule_keywords(rules: RuleMap) -> tuple[str, ...]:
+    """Distinct keywords across all doc types, computed once per rules map.
+
+    Active rules are cached objects, so classification reuses this instead
+    of re-walking every rule; keywords shared by several doc types are
+    searched for once.
+    """
+    global _KEYWORDS_CACHE
+    cached = _KEYWORDS_CACHE
+    if cached is not None and cached[0] is rules:
+        return cached[1]
+    keywords = tuple(
+        dict.fromkeys(
+            keyword for rule in rules.values() for keyword in rule.get("keywords", [])
+        )
+    )
+    _KEYWORDS_CACHE = (rules, keywords)
+    return keywords
+
+
+def _clear_rules_cache() -> None:
+    global _RULES_CACHE
+    _RULES_CACHE = None
 
 
 def get_active_rules() -> Tuple[RuleMap, str]:
+    """Return the active rules and their source ("custom" or "default").
+
+    Custom rules are re-read only when the file's mtime or size changes, so
+    the per-classification call is a single stat(). The returned map is
+    shared between callers and must not be mutated.
+    """
+    global _RULES_CACHE
     path = get_rules_path()
-    if not path.exists():
+    try:
+        stat = path.stat()
+    except OSError:
         return get_default_rules(), "default"
 
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    cached = _RULES_CACHE
+    if cached is not None and cached[0] == key:
+        return cached[1], "custom"
+
     try:
         payload = json.loads(path.read_text(encoding="utf-8"))
         if (
@@ -110,9 +153,10 @@ def get_active_rules() -> Tuple[RuleMap, str]:
         ):
             payload = payload["rules"]
         rules = normalize_rules(payload)
-        return rules, "custom"
     except Exception:
         return get_default_rules(), "default"
+    _RULES_CACHE = (key, rules)
+    return rules, "custom"
 
 
 def save_rules(rules: dict[str, Any]) -> RuleMap:
@@ -121,6 +165,7 @@ def save_rules(rules: dict[str, Any]) -> RuleMap:
     get_rules_path().write_text(
         json.dumps(normalized, indent=2, sort_keys=True), encoding="utf-8"
     )
+    _clear_rules_cache()
     return normalized
 
 
@@ -129,4 +174,5 @@ def reset_rules_to_default() -> RuleMap:
     path = get_rules_path()
     if path.exists():
         path.unlink()
+    _clear_rules_cache()
     return get_default_rules()
@@ -1,12 +1,63 @@
 from __future__ import annotations
 
+from collections.abc import Mapping
 from typing import Any
 from typing import Optional
+from typing import Self
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
-class DocumentResponse(BaseModel):
+class Schema(BaseModel):
+    """Base for API models.
+
+    Validators are built on first use rather than at import. FastAPI builds
+    its own per-route adapters, and row records use model_construct, so
+    many models never need one of their own. Small models nested in several
+    responses opt back into an eager build: parents then reference that one
+    prebuilt validator instead of embedding a copy.
+    """
+
+    model_config = ConfigDict(defer_build=True)
+
+
+class RowRecord(Schema):
+    """Response record filled from a stored repository row."""
+
+    model_config = ConfigDict(frozen=True)
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> Self:
+        """Build without validation.
+
+        Endpoints declare these as ``response_model``; FastAPI dumps and
+        validates the payload on the way out, so checking the row here as
+        well is redundant. Keep plain construction for external input.
+        """
+        return cls.model_construct(**row)
+
+    @classmethod
+    def from_rows(cls, rows: list[Mapping[str, Any]]) -> list[Self]:
+        """Build many records that share one set of provided field names.
+
+        Rows from one query have the same keys, so the set is computed once
+        per distinct key set instead of held by every instance. Records are
+        frozen, so nothing adds to a shared set after construction.
+        """
+        construct = cls.model_construct
+        fields = cls.model_fields.keys()
+        records: list[Self] = []
+        keys: Any = None
+        fields_set: set[str] = set()
+        for row in rows:
+            if row.keys() != keys:
+                keys = row.keys()
+                fields_set = set(fields & keys)
+            records.append(construct(fields_set, **row))
+        return records
+
+
+class DocumentResponse(RowRecord):
     id: str
     workspace_id: Optional[str] = None
     filename: str
@@ -30,27 +81,31 @@ class DocumentResponse(BaseModel):
     updated_at: str
 
 
-class DocumentListResponse(BaseModel):
+class DocumentListResponse(Schema):
     items: list[DocumentResponse]
 
 
-class QueueItem(BaseModel):
+class QueueItem(Schema):
+    model_config = ConfigDict(defer_build=False)
+
     department: str
     total: int
     needs_review: int
     ready: int
 
 
-class QueueResponse(BaseModel):
+class QueueResponse(Schema):
     queues: list[QueueItem]
 
 
-class MetricBucket(BaseModel):
+class MetricBucket(Schema):
+    model_config = ConfigDict(defer_build=False)
+
     label: str
     count: int
 
 
-class AnalyticsResponse(BaseModel):
+class AnalyticsResponse(Schema):
     total_documents: int
     needs_review: int
     routed_or_approved: int
@@ -66,7 +121,7 @@ class AnalyticsResponse(BaseModel):
     by_status: list[MetricBucket] = Field(default_factory=list)
 
 
-class ReviewRequest(BaseModel):
+class ReviewRequest(Schema):
     approve: bool = True
     corrected_doc_type: Optional[str] = None
     corrected_department: Optional[str] = None
@@ -75,7 +130,7 @@ class ReviewRequest(BaseModel):
     actor: str = "reviewer"
 
 
-class AuditEvent(BaseModel):
+class AuditEvent(RowRecord):
     id: int
     workspace_id: Optional[str] = None
     document_id: str
@@ -85,29 +140,31 @@ class AuditEvent(BaseModel):
     created_at: str
 
 
-class AuditTrailResponse(BaseModel):
+class AuditTrailResponse(Schema):
     items: list[AuditEvent]
 
 
-class RuleDefinition(BaseModel):
+class RuleDefinition(Schema):
+    model_config = ConfigDict(defer_build=False)
+
     keywords: list[str] = Field(default_factory=list)
     department: str
     required_fields: list[str] = Field(default_factory=list)
     sla_days: Optional[int] = None
 
 
-class RulesConfigResponse(BaseModel):
+class RulesConfigResponse(Schema):
     source: str
     path: str
     rules: dict[str, RuleDefinition]
 
 
-class RulesConfigUpdate(BaseModel):
+class RulesConfigUpdate(Schema):
     rules: dict[str, RuleDefinition]
     actor: str = "dashboard_admin"
 
 
-class DatabaseImportRequest(BaseModel):
+class DatabaseImportRequest(Schema):
     database_url: str = Field(
         ...,
         description="Database URL (sqlite/postgresql/mysql) or sqlite filesystem path",
@@ -129,13 +186,13 @@ class DatabaseImportRequest(BaseModel):
         return self
 
 
-class DatabaseImportDocument(BaseModel):
+class DatabaseImportDocument(Schema):
     id: str
     filename: str
     status: str
 
 
-class DatabaseImportResponse(BaseModel):
+class DatabaseImportResponse(Schema):
     imported_count: int
     processed_sync_count: int
     scheduled_async_count: int
@@ -144,27 +201,29 @@ class DatabaseImportResponse(BaseModel):
     errors: list[str] = Field(default_factory=list)
 
 
-class ConnectorTestRequest(BaseModel):
+class ConnectorTestRequest(Schema):
     connector_type: str
     config: dict[str, Any] = Field(default_factory=dict)
     database_url: Optional[str] = None
 
 
-class ConnectorTestResponse(BaseModel):
+class ConnectorTestResponse(Schema):
     success: bool
     message: str
     connector_type: str
     details: Optional[str] = None
 
 
-class ServiceHealth(BaseModel):
+class ServiceHealth(Schema):
+    model_config = ConfigDict(defer_build=False)
+
     name: str
     status: str
     configured: bool
     details: str
 
 
-class ConnectivityResponse(BaseModel):
+class ConnectivityResponse(Schema):
     database: ServiceHealth
     ocr_provider: ServiceHealth
     classifier_provider: ServiceHealth
@@ -172,13 +231,13 @@ class ConnectivityResponse(BaseModel):
     checked_at: str
 
 
-class ManualDeploymentRequest(BaseModel):
+class ManualDeploymentRequest(Schema):
     environment: str = "production"
     actor: str = "dashboard_admin"
     notes: Optional[str] = None
 
 
-class DeploymentRecord(BaseModel):
+class DeploymentRecord(RowRecord):
     id: int
     environment: str
     provider: str
@@ -191,18 +250,18 @@ class DeploymentRecord(BaseModel):
     finished_at: Optional[str] = None
 
 
-class DeploymentListResponse(BaseModel):
+class DeploymentListResponse(Schema):
     items: list[DeploymentRecord] = Field(default_factory=list)
 
 
-class InvitationCreateRequest(BaseModel):
+class InvitationCreateRequest(Schema):
     email: str
     role: str = "member"
     actor: str = "dashboard_admin"
     expires_in_days: int = Field(default=7, ge=1, le=90)
 
 
-class InvitationRecord(BaseModel):
+class InvitationRecord(RowRecord):
     id: int
     email: str
     role: str
@@ -213,22 +272,22 @@ class InvitationRecord(BaseModel):
     accepted_at: Optional[str] = None
 
 
-class InvitationCreateResponse(BaseModel):
+class InvitationCreateResponse(Schema):
     invitation: InvitationRecord
     invite_token: str
     invite_link: str
 
 
-class InvitationListResponse(BaseModel):
+class InvitationListResponse(Schema):
     items: list[InvitationRecord] = Field(default_factory=list)
 
 
-class ApiKeyCreateRequest(BaseModel):
+class ApiKeyCreateRequest(Schema):
     name: str = Field(min_length=2, max_length=64)
     actor: str = "dashboard_admin"
 
 
-class ApiKeyRecord(BaseModel):
+class ApiKeyRecord(RowRecord):
     id: int
     name: str
     key_prefix: str
@@ -238,34 +297,34 @@ class ApiKeyRecord(BaseModel):
     revoked_at: Optional[str] = None
 
 
-class ApiKeyCreateResponse(BaseModel):
+class ApiKeyCreateResponse(Schema):
     api_key: ApiKeyRecord
     raw_key: str
 
 
-class ApiKeyListResponse(BaseModel):
+class ApiKeyListResponse(Schema):
     items: list[ApiKeyRecord] = Field(default_factory=list)
 
 
-class PlatformSummaryResponse(BaseModel):
+class PlatformSummaryResponse(Schema):
     connectivity: ConnectivityResponse
     active_api_keys: int
     pending_invitations: int
     latest_deployment: Optional[DeploymentRecord] = None
 
 
-class AuthBootstrapRequest(BaseModel):
+class AuthBootstrapRequest(Schema):
     email: str
     password: str = Field(..., min_length=8, max_length=128)
     full_name: Optional[str] = None
 
 
-class AuthLoginRequest(BaseModel):
+class AuthLoginRequest(Schema):
     email: str
     password: str = Field(..., min_length=1, max_length=128)
 
 
-class UserRecord(BaseModel):
+class UserRecord(RowRecord):
     id: str
     workspace_id: Optional[str] = None
     workspace_role: Optional[str] = None
@@ -279,31 +338,31 @@ class UserRecord(BaseModel):
     updated_at: str
 
 
-class AuthResponse(BaseModel):
+class AuthResponse(Schema):
     access_token: str
     token_type: str = "bearer"
     user: UserRecord
 
 
-class UserCreateRequest(BaseModel):
+class UserCreateRequest(Schema):
     email: str
     password: str = Field(..., min_length=8, max_length=128)
     role: str = "viewer"
     full_name: Optional[str] = None
 
 
-class UserRoleUpdateRequest(BaseModel):
+class UserRoleUpdateRequest(Schema):
     role: str
 
 
-class UserListResponse(BaseModel):
+class UserListResponse(Schema):
     items: list[UserRecord] = Field(default_factory=list)
 
 
 # --- Workspaces ---
 
 
-class WorkspaceRecord(BaseModel):
+class WorkspaceRecord(Schema):
     id: str
     name: str
     slug: str
@@ -316,20 +375,20 @@ class WorkspaceRecord(BaseModel):
     member_role: Optional[str] = None
 
 
-class WorkspaceCreateRequest(BaseModel):
+class WorkspaceCreateRequest(Schema):
     name: str
 
 
-class WorkspaceUpdateRequest(BaseModel):
+class WorkspaceUpdateRequest(Schema):
     name: Optional[str] = None
     settings: Optional[dict[str, Any]] = None
 
 
-class WorkspaceListResponse(BaseModel):
+class WorkspaceListResponse(Schema):
     items: list[WorkspaceRecord] = Field(default_factory=list)
 
 
-class WorkspaceMemberRecord(BaseModel):
+class WorkspaceMemberRecord(RowRecord):
     id: int
     workspace_id: str
     user_id: str
@@ -340,22 +399,22 @@ class WorkspaceMemberRecord(BaseModel):
     status: Optional[str] = None
 
 
-class WorkspaceMemberInviteRequest(BaseModel):
+class WorkspaceMemberInviteRequest(Schema):
     email: str
     role: str = "member"
 
 
-class WorkspaceMemberUpdateRequest(BaseModel):
+class WorkspaceMemberUpdateRequest(Schema):
     role: str
 
 
-class WorkspaceSwitchResponse(BaseModel):
+class WorkspaceSwitchResponse(Schema):
     access_token: str
     token_type: str = "bearer"
     workspace: WorkspaceRecord
 
 
-class JobRecord(BaseModel):
+class JobRecord(RowRecord):
     id: str
     workspace_id: Optional[str] = None
     job_type: str
@@ -372,14 +431,16 @@ class JobRecord(BaseModel):
     finished_at: Optional[str] = None
 
 
-class JobListResponse(BaseModel):
+class JobListResponse(Schema):
     items: list[JobRecord] = Field(default_factory=list)
 
 
 # --- Notifications ---
 
 
-class NotificationRecord(BaseModel):
+class NotificationRecord(RowRecord):
+    model_config = ConfigDict(defer_build=False)
+
     id: int
     workspace_id: Optional[str] = None
     user_id: Optional[str] = None
@@ -392,7 +453,7 @@ class NotificationRecord(BaseModel):
     read_at: Optional[str] = None
 
 
-class NotificationListResponse(BaseModel):
+class NotificationListResponse(Schema):
     items: list[NotificationRecord] = Field(default_factory=list)
     unread_count: int = 0
 
@@ -400,7 +461,7 @@ class NotificationListResponse(BaseModel):
 # --- Workflow Automations ---
 
 
-class WorkflowRuleRecord(BaseModel):
+class WorkflowRuleRecord(RowRecord):
     id: int
     workspace_id: Optional[str] = None
     name: str
@@ -412,7 +473,7 @@ class WorkflowRuleRecord(BaseModel):
     updated_at: str
 
 
-class WorkflowRuleCreateRequest(BaseModel):
+class WorkflowRuleCreateRequest(Schema):
     name: str
     enabled: bool = True
     trigger_event: str
@@ -420,7 +481,7 @@ class WorkflowRuleCreateRequest(BaseModel):
     actions: list[dict[str, Any]] = Field(default_factory=list)
 
 
-class WorkflowRuleUpdateRequest(BaseModel):
+class WorkflowRuleUpdateRequest(Schema):
     name: Optional[str] = None
     enabled: Optional[bool] = None
     trigger_event: Optional[str] = None
@@ -428,11 +489,11 @@ class WorkflowRuleUpdateRequest(BaseModel):
     actions: Optional[list[dict[str, Any]]] = None
 
 
-class WorkflowRuleListResponse(BaseModel):
+class WorkflowRuleListResponse(Schema):
     items: list[WorkflowRuleRecord] = Field(default_factory=list)
 
 
-class WorkflowPresetRecord(BaseModel):
+class WorkflowPresetRecord(Schema):
     id: str
     name: str
     category: str
@@ -441,11 +502,11 @@ class WorkflowPresetRecord(BaseModel):
     templates_count: int = 0
 
 
-class WorkflowPresetListResponse(BaseModel):
+class WorkflowPresetListResponse(Schema):
     items: list[WorkflowPresetRecord] = Field(default_factory=list)
 
 
-class WorkflowPresetApplyResponse(BaseModel):
+class WorkflowPresetApplyResponse(Schema):
     preset_id: str
     created_rules: list[WorkflowRuleRecord] = Field(default_factory=list)
     created_templates: list[TemplateRecord] = Field(default_factory=list)
@@ -456,7 +517,7 @@ class WorkflowPresetApplyResponse(BaseModel):
 # --- Workflow Transitions ---
 
 
-class TransitionRequest(BaseModel):
+class TransitionRequest(Schema):
     status: str
     notes: Optional[str] = None
     actor: str = "dashboard_reviewer"
@@ -465,7 +526,7 @@ class TransitionRequest(BaseModel):
 # --- Assignment ---
 
 
-class AssignRequest(BaseModel):
+class AssignRequest(Schema):
     user_id: str
     actor: str = "dashboard_reviewer"
 
@@ -473,7 +534,7 @@ class AssignRequest(BaseModel):
 # --- Response Templates ---
 
 
-class TemplateRecord(BaseModel):
+class TemplateRecord(RowRecord):
     id: int
     workspace_id: Optional[str] = None
     name: str
@@ -483,29 +544,29 @@ class TemplateRecord(BaseModel):
     updated_at: str
 
 
-class TemplateCreateRequest(BaseModel):
+class TemplateCreateRequest(Schema):
     name: str
     doc_type: Optional[str] = None
     template_body: str
 
 
-class TemplateUpdateRequest(BaseModel):
+class TemplateUpdateRequest(Schema):
     name: Optional[str] = None
     doc_type: Optional[str] = None
     template_body: Optional[str] = None
 
 
-class TemplateListResponse(BaseModel):
+class TemplateListResponse(Schema):
     items: list[TemplateRecord] = Field(default_factory=list)
 
 
-class TemplateRenderResponse(BaseModel):
+class TemplateRenderResponse(Schema):
     rendered: str
     template_name: str
     document_id: str
 
 
-class TemplateComposeResponse(BaseModel):
+class TemplateComposeResponse(Schema):
     template_id: int
     template_name: str
     document_id: str
@@ -514,14 +575,14 @@ class TemplateComposeResponse(BaseModel):
     body: str
 
 
-class ResponseEmailSendRequest(BaseModel):
+class ResponseEmailSendRequest(Schema):
     to_email: str
     subject: str
     body: str
     actor: str = "dashboard_reviewer"
 
 
-class ResponseEmailSendResponse(BaseModel):
+class ResponseEmailSendResponse(Schema):
     id: int
     document_id: str
     to_email: str
@@ -532,26 +593,26 @@ class ResponseEmailSendResponse(BaseModel):
     created_at: str
 
 
-class AutomationAutoAssignRequest(BaseModel):
+class AutomationAutoAssignRequest(Schema):
     user_id: Optional[str] = None
     actor: str = "automation_assistant"
     limit: int = Field(default=200, ge=1, le=1000)
 
 
-class AutomationAutoAssignResponse(BaseModel):
+class AutomationAutoAssignResponse(Schema):
     assignee: str
     assigned_count: int
     remaining_unassigned: int
     processed_document_ids: list[str] = Field(default_factory=list)
 
 
-class AutomationAnthropicSweepRequest(BaseModel):
+class AutomationAnthropicSweepRequest(Schema):
     limit: int = Field(default=50, ge=1, le=500)
     include_failed: bool = True
     actor: str = "anthropic_automation"
 
 
-class AutomationAnthropicSweepResponse(BaseModel):
+class AutomationAnthropicSweepResponse(Schema):
     processed_count: int
     auto_cleared_count: int
     still_manual_count: int
@@ -561,14 +622,14 @@ class AutomationAnthropicSweepResponse(BaseModel):
 # --- Bulk Operations ---
 
 
-class BulkActionRequest(BaseModel):
+class BulkActionRequest(Schema):
     action: str
     document_ids: list[str]
     params: dict[str, Any] = Field(default_factory=dict)
     actor: str = "dashboard_reviewer"
 
 
-class BulkActionResponse(BaseModel):
+class BulkActionResponse(Schema):
     success_count: int
     error_count: int
     errors: list[str] = Field(default_factory=list)
@@ -577,11 +638,11 @@ class BulkActionResponse(BaseModel):
 # --- Connector Import ---
 
 
-class ConnectorConfigSaveRequest(BaseModel):
+class ConnectorConfigSaveRequest(Schema):
     config: dict[str, Any] = Field(default_factory=dict)
 
 
-class ConnectorConfigResponse(BaseModel):
+class ConnectorConfigResponse(Schema):
     connector_type: str
     config: dict[str, Any] = Field(default_factory=dict)
     enabled: bool = True
@@ -589,20 +650,20 @@ class ConnectorConfigResponse(BaseModel):
     total_imported: int = 0
 
 
-class ConnectorImportRequest(BaseModel):
+class ConnectorImportRequest(Schema):
     config: dict[str, Any] = Field(default_factory=dict)
     limit: int = Field(default=50, ge=1, le=500)
     process_async: bool = True
     actor: str = "connector_import"
 
 
-class ConnectorImportDocument(BaseModel):
+class ConnectorImportDocument(Schema):
     id: str
     filename: str
     status: str
 
 
-class ConnectorImportResponse(BaseModel):
+class ConnectorImportResponse(Schema):
     connector_type: str
     imported_count: int
     skipped_count: int
@@ -614,7 +675,7 @@ class ConnectorImportResponse(BaseModel):
 # --- Auth Signup ---
 
 
-class AuthSignupRequest(BaseModel):
+class AuthSignupRequest(Schema):
     email: str
     password: str = Field(..., min_length=8, max_length=128)
     full_name: Optional[str] = None
@@ -624,20 +685,20 @@ class AuthSignupRequest(BaseModel):
 # --- Billing / Stripe ---
 
 
-class CheckoutRequest(BaseModel):
+class CheckoutRequest(Schema):
     plan_tier: str  # pro | enterprise
     billing_type: str  # monthly | lifetime
 
 
-class CheckoutResponse(BaseModel):
+class CheckoutResponse(Schema):
     checkout_url: str
 
 
-class PortalResponse(BaseModel):
+class PortalResponse(Schema):
     portal_url: str
 
 
-class SubscriptionRecord(BaseModel):
+class SubscriptionRecord(Schema):
     id: int
     user_id: str
     plan_tier: str
@@ -651,7 +712,7 @@ class SubscriptionRecord(BaseModel):
     updated_at: str
 
 
-class SubscriptionResponse(BaseModel):
+class SubscriptionResponse(Schema):
     plan_tier: str
     billing_type: Optional[str] = None
     status: str
@@ -659,7 +720,7 @@ class SubscriptionResponse(BaseModel):
     stripe_enabled: bool = False
 
 
-class PlanInfo(BaseModel):
+class PlanInfo(Schema):
     name: str
     monthly_price_cents: int
     lifetime_price_cents: int
@@ -667,14 +728,14 @@ class PlanInfo(BaseModel):
     features: list[str] = Field(default_factory=list)
 
 
-class PlansResponse(BaseModel):
+class PlansResponse(Schema):
     plans: list[PlanInfo] = Field(default_factory=list)
 
 
 # ── Email Preferences ────────────────────────────────────────────────
 
 
-class EmailPreferencesResponse(BaseModel):
+class EmailPreferencesResponse(Schema):
     account_welcome: bool = True
     account_plan_change: bool = True
     account_payment_receipt: bool = True
@@ -684,7 +745,7 @@ class EmailPreferencesResponse(BaseModel):
     doc_digest: bool = True
 
 
-class EmailPreferencesUpdateRequest(BaseModel):
+class EmailPreferencesUpdateRequest(Schema):
     account_welcome: Optional[bool] = None
     account_plan_change: Optional[bool] = None
     account_payment_receipt: Optional[bool] = None
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
+import mmap
+import os
 import socket
 import struct
 import threading
 import time
-from collections import deque
+from array import array
 from dataclasses import dataclass
-from pathlib import Path
-from typing import Deque, Optional
+from typing import BinaryIO, Optional, Union
 
 from fastapi import Request
 from starlette.responses import Response
@@ -39,12 +40,94 @@ class RateLimitDecision:
     reset_seconds: int
 
 
+# Power of two, so a stripe is picked with a mask.
+_RATE_LIMIT_STRIPES = 64
+# Rings start this small and double up to the limit as requests arrive.
+_RING_INITIAL_CAPACITY = 8
+# How often a stripe drops buckets whose newest request left the window.
+_RATE_LIMIT_SWEEP_SECONDS = 60.0
+
+
+class _TimestampRing:
+    """FIFO of admitted request times, stored as C doubles in a ring.
+
+    A bucket never holds more than ``limit`` entries (denied requests are
+    not recorded), so an array replaces a deque of float objects: 8 bytes per
+    timestamp and no per-request allocations. The array grows on demand, so
+    a client that sends a handful of requests under a large limit stays
+    small.
+    """
+
+    __slots__ = ("times", "start", "size", "limit", "expires")
+
+    def __init__(self, limit: int) -> None:
+        self.times = array("d", bytes(8 * min(limit, _RING_INITIAL_CAPACITY)))
+        self.start = 0
+        self.size = 0
+        self.limit = limit
+        # When the newest timestamp leaves its window; sweeps drop the bucket.
+        self.expires = 0.0
+
+    def _ordered(self) -> array:
+        end = self.start + self.size
+        if end <= len(self.times):
+            return self.times[self.start : end]
+        return self.times[self.start :] + self.times[: end - len(self.times)]
+
+    def resized(self, limit: int) -> _TimestampRing:
+        ring = _TimestampRing(limit)
+        for timestamp in self._ordered()[-limit:]:
+            ring.push(timestamp)
+        ring.expires = self.expires
+        return ring
+
+    def prune(self, window_start: float) -> None:
+        times = self.times
+        while self.size and times[self.start] < window_start:
+            self.start = (self.start + 1) % len(times)
+            self.size -= 1
+
+    def oldest(self) -> float:
+        return self.times[self.start]
+
+    def push(self, now: float) -> None:
+        capacity = len(self.times)
+        if self.size == capacity:
+            # Callers never push past the limit, so this stays within it.
+            grown = self._ordered()
+            grown.frombytes(bytes(8 * (min(capacity * 2, self.limit) - capacity)))
+            self.times = grown
+            self.start = 0
+        self.times[(self.start + self.size) % len(self.times)] = now
+        self.size += 1
+
+
+class _RateLimitStripe:
+    __slots__ = ("lock", "buckets", "next_sweep")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.buckets: dict[str, _TimestampRing] = {}
+        self.next_sweep = 0.0
+
+    def sweep(self, now: float) -> None:
+        buckets = self.buckets
+        for key in [key for key, ring in buckets.items() if ring.expires < now]:
+            del buckets[key]
+        self.next_sweep = now + _RATE_LIMIT_SWEEP_SECONDS
+
+
 class SlidingWindowRateLimiter:
-    """In-process rate limiter keyed by (client, scope)."""
+    """In-process rate limiter keyed by (client, scope).
+
+    Buckets are spread over lock stripes by key hash, so checks for different
+    clients rarely wait on one another. The lock stays: prune, compare and
+    record must be one step or concurrent requests can overshoot the limit.
+    Each stripe periodically forgets clients that have gone quiet.
+    """
 
     def __init__(self) -> None:
-        self._buckets: dict[str, Deque[float]] = {}
-        self._lock = threading.Lock()
+        self._stripes = [_RateLimitStripe() for _ in range(_RATE_LIMIT_STRIPES)]
 
     def check(self, key: str, *, limit: int, window_seconds: int) -> RateLimitDecision:
         if limit <= 0:
@@ -53,28 +136,30 @@ class SlidingWindowRateLimiter:
             )
         now = time.monotonic()
         window_start = now - window_seconds
-        with self._lock:
-            bucket = self._buckets.setdefault(key, deque())
-            while bucket and bucket[0] < window_start:
-                bucket.popleft()
-            used = len(bucket)
-            if used >= limit:
-                reset_seconds = (
-                    max(1, int(window_seconds - (now - bucket[0])))
-                    if bucket
-                    else window_seconds
-                )
+        stripe = self._stripes[hash(key) & (_RATE_LIMIT_STRIPES - 1)]
+        with stripe.lock:
+            if now >= stripe.next_sweep:
+                stripe.sweep(now)
+            buckets = stripe.buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _TimestampRing(limit)
+            elif bucket.limit != limit:
+                bucket = buckets[key] = bucket.resized(limit)
+            bucket.prune(window_start)
+            if bucket.size >= limit:
                 return RateLimitDecision(
                     allowed=False,
                     limit=limit,
                     remaining=0,
-                    reset_seconds=reset_seconds,
+                    reset_seconds=max(1, int(window_seconds - (now - bucket.oldest()))),
                 )
-            bucket.append(now)
+            bucket.push(now)
+            bucket.expires = now + window_seconds
             return RateLimitDecision(
                 allowed=True,
                 limit=limit,
-                remaining=max(limit - len(bucket), 0),
+                remaining=limit - bucket.size,
                 reset_seconds=window_seconds,
             )
 
@@ -121,31 +206,79 @@ def apply_security_headers(response: Response) -> None:
         response.headers["Content-Security-Policy"] = CONTENT_SECURITY_POLICY
 
 
+def _extension(filename: str) -> str:
+    # Same rule as Path(filename).suffix, without building a path object:
+    # last component only, and no extension for dotfiles or a trailing dot.
+    name = filename.rstrip("/").rpartition("/")[2]
+    stem, _, extension = name.rpartition(".")
+    return extension.lower() if stem else ""
+
+
 def _allowed_extension(filename: str) -> bool:
-    extension = Path(filename).suffix.lower().lstrip(".")
     if not UPLOAD_ALLOWED_EXTENSIONS:
         return True
-    return extension in UPLOAD_ALLOWED_EXTENSIONS
+    return _extension(filename) in UPLOAD_ALLOWED_EXTENSIONS
+
+
+# Leading magic bytes for binary formats. Text formats have none and are not
+# checked. PDF readers accept the header anywhere in the first KiB.
+_SIGNATURE_HEAD_BYTES = 1024
+_PDF_SIGNATURE = b"%PDF-"
+_CONTENT_SIGNATURES: dict[str, tuple[bytes, ...]] = {
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpg": (b"\xff\xd8\xff",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "tif": (b"II*\x00", b"MM\x00*"),
+    "tiff": (b"II*\x00", b"MM\x00*"),
+    "docx": (b"PK\x03\x04",),
+    "docm": (b"PK\x03\x04",),
+}
+
+
+def _matches_signature(filename: str, head: bytes) -> bool:
+    extension = _extension(filename)
+    if extension == "pdf":
+        return _PDF_SIGNATURE in head
+    signatures = _CONTENT_SIGNATURES.get(extension)
+    return signatures is None or head.startswith(signatures)
 
 
 def _allowed_content_type(content_type: Optional[str]) -> bool:
     if not content_type:
         return False
-    normalized = content_type.strip().lower()
-    return any(normalized.startswith(prefix) for prefix in UPLOAD_ALLOWED_MIME_PREFIXES)
+    return content_type.strip().lower().startswith(UPLOAD_ALLOWED_MIME_PREFIXES)
+
+
+# INSTREAM chunk size; well under clamd's default StreamMaxLength (25 MB).
+_CLAMAV_CHUNK_BYTES = 256 * 1024
+_CLAMAV_CHUNK_LENGTH = struct.Struct("!I")
+
+
+def _send_chunk(sock: socket.socket, chunk: memoryview) -> None:
+    """Send an INSTREAM length prefix and chunk, in one syscall where possible."""
+    header = _CLAMAV_CHUNK_LENGTH.pack(len(chunk))
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(header)
+        sock.sendall(chunk)
+        return
+    sent = sock.sendmsg((header, chunk))
+    if sent < len(header):
+        sock.sendall(header[sent:])
+        sock.sendall(chunk)
+    elif sent < len(header) + len(chunk):
+        sock.sendall(chunk[sent - len(header) :])
 
 
-def _clamav_scan(payload: bytes) -> tuple[bool, Optional[str]]:
+def _clamav_scan(payload: Union[bytes, mmap.mmap]) -> tuple[bool, Optional[str]]:
     """Return (is_clean, reason_if_blocked)."""
-    chunk_size = 1024 * 16
+    chunk_size = _CLAMAV_CHUNK_BYTES
     try:
         with socket.create_connection((CLAMAV_HOST, CLAMAV_PORT), timeout=5.0) as sock:
             sock.sendall(b"zINSTREAM\0")
-            for index in range(0, len(payload), chunk_size):
-                chunk = payload[index : index + chunk_size]
-                sock.sendall(struct.pack("!I", len(chunk)))
-                sock.sendall(chunk)
-            sock.sendall(struct.pack("!I", 0))
+            with memoryview(payload) as view:
+                for index in range(0, len(view), chunk_size):
+                    _send_chunk(sock, view[index : index + chunk_size])
+            sock.sendall(_CLAMAV_CHUNK_LENGTH.pack(0))
             result = sock.recv(4096).decode("utf-8", errors="replace").strip()
     except Exception as exc:
         if UPLOAD_VIRUS_SCAN_BLOCK_ON_ERROR:
@@ -157,17 +290,14 @@ def _clamav_scan(payload: bytes) -> tuple[bool, Optional[str]]:
     return True, None
 
 
-def validate_upload(
-    *,
-    filename: str,
-    content_type: Optional[str],
-    payload: bytes,
+def _check_upload(
+    *, filename: str, content_type: Optional[str], size: int, head: bytes
 ) -> None:
     if not filename.strip():
         raise UploadValidationError("File name is required.")
-    if not payload:
+    if not size:
         raise UploadValidationError("Uploaded file is empty.")
-    if len(payload) > UPLOAD_MAX_BYTES:
+    if size > UPLOAD_MAX_BYTES:
         raise UploadValidationError(
             f"File too large. Maximum allowed size is {UPLOAD_MAX_BYTES} bytes."
         )
@@ -178,9 +308,63 @@ def validate_upload(
         )
     if not _allowed_content_type(content_type):
         raise UploadValidationError("Unsupported content type.")
+    # Before the scanner round trip, so spoofed files never reach clamd.
+    if not _matches_signature(filename, head):
+        raise UploadValidationError("File content does not match its extension.")
+
+
+def _scan_upload(payload: Union[bytes, mmap.mmap]) -> None:
+    clean, reason = _clamav_scan(payload)
+    if not clean:
+        raise UploadValidationError(
+            f"Upload blocked by malware scanner: {reason or 'malicious content detected'}"
+        )
+
+
+def validate_upload(
+    *,
+    filename: str,
+    content_type: Optional[str],
+    payload: bytes,
+) -> None:
+    _check_upload(
+        filename=filename,
+        content_type=content_type,
+        size=len(payload),
+        head=payload[:_SIGNATURE_HEAD_BYTES],
+    )
     if UPLOAD_VIRUS_SCAN_ENABLED:
-        clean, reason = _clamav_scan(payload)
-        if not clean:
-            raise UploadValidationError(
-                f"Upload blocked by malware scanner: {reason or 'malicious content detected'}"
-            )
+        _scan_upload(payload)
+
+
+# Starlette keeps uploads up to 1 MiB in memory; asking a smaller spooled
+# file for its fileno() would force it out to disk just to map it.
+_MMAP_SCAN_MIN_BYTES = 1024 * 1024
+
+
+def validate_upload_file(
+    *,
+    filename: str,
+    content_type: Optional[str],
+    source: BinaryIO,
+) -> None:
+    """validate_upload for a spooled upload, without reading it into memory.
+
+    Large files are scanned through a read-only mmap of the spooled temp
+    file, so the scanner streams from the page cache. Leaves ``source``
+    positioned at the start.
+    """
+    size = source.seek(0, os.SEEK_END)
+    source.seek(0)
+    head = source.read(_SIGNATURE_HEAD_BYTES)
+    source.seek(0)
+    _check_upload(filename=filename, content_type=content_type, size=size, head=head)
+    if not UPLOAD_VIRUS_SCAN_ENABLED:
+        return
+    if size < _MMAP_SCAN_MIN_BYTES:
+        payload = source.read()
+        source.seek(0)
+        _scan_upload(payload)
+        return
+    with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        _scan_upload(view)
@@ -1,23 +1,41 @@
 from __future__ import annotations
 
+import base64
+import errno
+import os
+import shutil
+import struct
 import tempfile
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterator
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
 
 from .config import ENCRYPTION_AT_REST_ENABLED, ENCRYPTION_KEY
 
 MAGIC_HEADER = b"CSENC1\n"
-
-_FERNET = None
-_FERNET_READY = False
+STREAM_CHUNK_BYTES = 1024 * 1024
+_FRAME_LENGTH = struct.Struct("!I")
+# Current format: after the header, one (4-byte big-endian length, frame)
+# pair per STREAM_CHUNK_BYTES of plaintext, so neither side holds more than a
+# chunk of ciphertext. Each frame is sealed with AES-GCM as (12-byte nonce,
+# ciphertext + tag); the frame index and a last-frame flag are authenticated
+# as associated data, so reordered, dropped, spliced or truncated frames fail
+# to decrypt. Single-token CSENC1 files are still read. Both headers have the
+# same length.
+AEAD_MAGIC_HEADER = b"CSENC3\n"
+_AEAD_NONCE_BYTES = 12
+_AEAD_FRAME = struct.Struct("!Q?")
+# Decrypted copies up to this size go to RAM-backed tmpfs when it exists, so
+# plaintext never reaches persistent disk and does not survive a reboot.
+PLAINTEXT_TMPFS_DIR = Path("/dev/shm")
+PLAINTEXT_TMPFS_MAX_BYTES = 32 * 1024 * 1024
 
 
+@lru_cache(maxsize=1)
 def _get_fernet():
-    global _FERNET, _FERNET_READY
-    if _FERNET_READY:
-        return _FERNET
-    _FERNET_READY = True
+    # Failures are not cached: a bad key keeps raising instead of quietly
+    # turning encryption off after the first call.
     if not ENCRYPTION_AT_REST_ENABLED:
         return None
     try:
@@ -31,53 +49,230 @@ def _get_fernet():
             "Encryption at rest is enabled but CITYSORT_ENCRYPTION_KEY is missing."
         )
     try:
-        _FERNET = Fernet(ENCRYPTION_KEY.encode("utf-8"))
+        return Fernet(ENCRYPTION_KEY.encode("utf-8"))
     except Exception as exc:
         raise RuntimeError(
             "CITYSORT_ENCRYPTION_KEY is invalid. Must be a valid Fernet key."
         ) from exc
-    return _FERNET
 
 
-def validate_encryption_configuration() -> None:
-    _get_fernet()
+@lru_cache(maxsize=1)
+def _get_aead():
+    # The AES-256-GCM key is derived from the Fernet key, so existing
+    # deployments keep one CITYSORT_ENCRYPTION_KEY for old and new files.
+    if not _get_fernet():
+        return None
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
+    key = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"citysort-document-aes-gcm",
+    ).derive(base64.urlsafe_b64decode(ENCRYPTION_KEY.encode("utf-8")))
+    return AESGCM(key)
 
-def _encrypt(payload: bytes) -> bytes:
-    fernet = _get_fernet()
-    if not fernet:
-        return payload
-    return MAGIC_HEADER + fernet.encrypt(payload)
+
+def validate_encryption_configuration() -> None:
+    """Check the key at startup and warm the cipher before the first request."""
+    aead = _get_aead()
+    if aead:
+        _open_frame(aead, _seal_frame(aead, 0, b"", last=True), 0, last=True)
 
 
-def _decrypt(payload: bytes) -> bytes:
-    if not payload.startswith(MAGIC_HEADER):
-        return payload
+def _require_fernet():
     fernet = _get_fernet()
     if not fernet:
         raise RuntimeError("Encrypted payload found but encryption key is unavailable.")
-    return fernet.decrypt(payload[len(MAGIC_HEADER) :])
+    return fernet
+
+
+def _slices(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    size = STREAM_CHUNK_BYTES
+    for chunk in chunks:
+        if len(chunk) <= size:
+            yield chunk
+            continue
+        for start in range(0, len(chunk), size):
+            yield chunk[start : start + size]
+
+
+def _iter_file(source_path: Path) -> Iterator[bytes]:
+    with source_path.open("rb") as handle:
+        while chunk := handle.read(STREAM_CHUNK_BYTES):
+            yield chunk
+
+
+def _associated_data(index: int, last: bool) -> bytes:
+    return AEAD_MAGIC_HEADER + _AEAD_FRAME.pack(index, last)
+
+
+def _seal_frame(aead: Any, index: int, chunk: bytes, *, last: bool) -> bytes:
+    nonce = os.urandom(_AEAD_NONCE_BYTES)
+    return nonce + aead.encrypt(nonce, chunk, _associated_data(index, last))
+
+
+def _open_frame(aead: Any, frame: bytes, index: int, *, last: bool) -> bytes:
+    return aead.decrypt(
+        frame[:_AEAD_NONCE_BYTES],
+        frame[_AEAD_NONCE_BYTES:],
+        _associated_data(index, last),
+    )
+
+
+def _write_frame(handle: BinaryIO, frame: bytes) -> None:
+    handle.write(_FRAME_LENGTH.pack(len(frame)))
+    handle.write(frame)
+
+
+def write_document_stream(destination_path: Path, chunks: Iterable[bytes]) -> None:
+    """Write ``chunks`` to storage, sealing one frame per chunk when enabled.
+
+    Each chunk is held back until the next one arrives so the final frame
+    can be flagged; an empty document is a single empty final frame.
+    """
+    aead = _get_aead()
+    with destination_path.open("wb") as handle:
+        if not aead:
+            for chunk in chunks:
+                handle.write(chunk)
+            return
+        handle.write(AEAD_MAGIC_HEADER)
+        index = 0
+        pending = b""
+        for chunk in _slices(chunks):
+            if not chunk:
+                continue
+            if pending:
+                _write_frame(handle, _seal_frame(aead, index, pending, last=False))
+                index += 1
+            pending = chunk
+        _write_frame(handle, _seal_frame(aead, index, pending, last=True))
 
 
 def write_document_bytes(destination_path: Path, payload: bytes) -> None:
-    destination_path.write_bytes(_encrypt(payload))
+    write_document_stream(destination_path, (payload,))
+
+
+def _read_frames(handle: BinaryIO, source_path: Path) -> Iterator[tuple[bytes, bool]]:
+    """Yield ``(frame, is_last)``, peeking at the next prefix to spot the end."""
+    with handle:
+        prefix = handle.read(_FRAME_LENGTH.size)
+        while prefix:
+            frame = b""
+            if len(prefix) == _FRAME_LENGTH.size:
+                (length,) = _FRAME_LENGTH.unpack(prefix)
+                frame = handle.read(length)
+            if not frame or len(frame) < length:
+                raise RuntimeError(f"Encrypted document is truncated: {source_path}")
+            prefix = handle.read(_FRAME_LENGTH.size)
+            yield frame, not prefix
+
+
+def _iter_sealed(handle: BinaryIO, aead: Any, source_path: Path) -> Iterator[bytes]:
+    from cryptography.exceptions import InvalidTag
+
+    index = -1
+    for index, (frame, last) in enumerate(_read_frames(handle, source_path)):
+        try:
+            chunk = _open_frame(aead, frame, index, last=last)
+        except InvalidTag as exc:
+            raise RuntimeError(
+                f"Encrypted document failed authentication: {source_path}"
+            ) from exc
+        if chunk:
+            yield chunk
+    if index < 0:
+        raise RuntimeError(f"Encrypted document is truncated: {source_path}")
+
+
+def _iter_plain(handle: BinaryIO, head: bytes) -> Iterator[bytes]:
+    with handle:
+        if head:
+            yield head
+        while chunk := handle.read(STREAM_CHUNK_BYTES):
+            yield chunk
+
+
+def iter_document_bytes(source_path: Path) -> Iterator[bytes]:
+    """Return a stored document's plaintext as an iterator of chunks.
+
+    The header is read and the key checked up front, so a missing file or
+    key raises here rather than part-way through a streamed response.
+    Framed files are then decrypted one frame at a time.
+    """
+    handle = source_path.open("rb")
+    try:
+        header = handle.read(len(AEAD_MAGIC_HEADER))
+        if header == AEAD_MAGIC_HEADER:
+            _require_fernet()
+            return _iter_sealed(handle, _get_aead(), source_path)
+        if header == MAGIC_HEADER:
+            # The header is already consumed; the rest is one Fernet token.
+            with handle:
+                return iter((_require_fernet().decrypt(handle.read()),))
+    except BaseException:
+        handle.close()
+        raise
+    return _iter_plain(handle, header)
 
 
 def read_document_bytes(source_path: Path) -> bytes:
-    data = source_path.read_bytes()
-    return _decrypt(data)
+    return b"".join(iter_document_bytes(source_path))
 
 
 def copy_source_to_storage(source_path: Path, destination_path: Path) -> None:
-    write_document_bytes(destination_path, source_path.read_bytes())
+    write_document_stream(destination_path, _iter_file(source_path))
+
+
+def copy_upload_to_storage(source: BinaryIO, destination_path: Path) -> None:
+    """Stream an open upload (from its current position) into storage."""
+    write_document_stream(
+        destination_path, iter(lambda: source.read(STREAM_CHUNK_BYTES), b"")
+    )
 
 
 def is_encrypted_file(source_path: Path) -> bool:
     try:
-        prefix = source_path.read_bytes()[: len(MAGIC_HEADER)]
+        with source_path.open("rb") as handle:
+            prefix = handle.read(len(MAGIC_HEADER))
     except Exception:
         return False
-    return prefix == MAGIC_HEADER
+    return prefix in (MAGIC_HEADER, AEAD_MAGIC_HEADER)
+
+
+def _plaintext_temp_dir(source_path: Path) -> Optional[str]:
+    # The stored size (ciphertext) is a slight overestimate of the plaintext.
+    try:
+        size = source_path.stat().st_size
+        if size > PLAINTEXT_TMPFS_MAX_BYTES or not os.access(
+            PLAINTEXT_TMPFS_DIR, os.W_OK
+        ):
+            return None
+        if shutil.disk_usage(PLAINTEXT_TMPFS_DIR).free <= size:
+            return None
+    except OSError:
+        return None
+    return str(PLAINTEXT_TMPFS_DIR)
+
+
+def _write_plaintext_copy(
+    source_path: Path, *, suffix: str, temp_dir: Optional[str]
+) -> Path:
+    temp_file = tempfile.NamedTemporaryFile(
+        prefix="citysort_dec_", suffix=suffix, dir=temp_dir, delete=False
+    )
+    temp_path = Path(temp_file.name)
+    try:
+        with temp_file:
+            for chunk in iter_document_bytes(source_path):
+                temp_file.write(chunk)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return temp_path
 
 
 @contextmanager
@@ -90,15 +285,15 @@ def open_plaintext_path(source_path: Path, *, suffix: str = "") -> Iterator[Path
         yield source_path
         return
 
-    data = read_document_bytes(source_path)
-    temp_file = tempfile.NamedTemporaryFile(
-        prefix="citysort_dec_", suffix=suffix, delete=False
-    )
-    temp_path = Path(temp_file.name)
+    temp_dir = _plaintext_temp_dir(source_path)
+    try:
+        temp_path = _write_plaintext_copy(source_path, suffix=suffix, temp_dir=temp_dir)
+    except OSError as exc:
+        # tmpfs can still fill up between the free-space check and the write.
+        if temp_dir is None or exc.errno != errno.ENOSPC:
+            raise
+        temp_path = _write_plaintext_copy(source_path, suffix=suffix, temp_dir=None)
     try:
-        temp_file.write(data)
-        temp_file.flush()
-        temp_file.close()
         yield temp_path
     finally:
         try:
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
-import json
 import logging
-from typing import Any
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Optional, Union
 
+import orjson
 from fastapi import HTTPException
 
 from .config import (
@@ -18,17 +20,18 @@ from .config import (
     STRIPE_PRO_MONTHLY_PRICE_ID,
     STRIPE_SECRET_KEY,
     STRIPE_WEBHOOK_SECRET,
+    WORKER_ENABLED,
 )
+from .db import transaction
 from .repository import (
     count_workspace_documents_this_month,
     count_user_documents_this_month,
     create_payment_event,
     create_subscription,
-    get_default_workspace_for_user,
+    get_billing_principals_by_customer,
+    get_default_workspace_id_for_user,
     get_user_by_id,
-    get_user_by_stripe_customer,
     get_workspace,
-    get_workspace_by_stripe_customer,
     update_subscription_status,
     update_user_plan,
     update_workspace_plan,
@@ -36,23 +39,35 @@ from .repository import (
 
 logger = logging.getLogger("citysort.billing")
 
-_PRICE_MAP: dict[tuple[str, str], str] = {}
+_PRICE_MAP: dict[tuple[str, str], str] = {
+    ("pro", "monthly"): STRIPE_PRO_MONTHLY_PRICE_ID,
+    ("pro", "lifetime"): STRIPE_PRO_LIFETIME_PRICE_ID,
+    ("enterprise", "monthly"): STRIPE_ENTERPRISE_MONTHLY_PRICE_ID,
+    ("enterprise", "lifetime"): STRIPE_ENTERPRISE_LIFETIME_PRICE_ID,
+}
 
-
-def _init_price_map() -> None:
-    global _PRICE_MAP
-    _PRICE_MAP = {
-        ("pro", "monthly"): STRIPE_PRO_MONTHLY_PRICE_ID,
-        ("pro", "lifetime"): STRIPE_PRO_LIFETIME_PRICE_ID,
-        ("enterprise", "monthly"): STRIPE_ENTERPRISE_MONTHLY_PRICE_ID,
-        ("enterprise", "lifetime"): STRIPE_ENTERPRISE_LIFETIME_PRICE_ID,
-    }
+# Stripe subscription statuses, mapped onto ours; anything else is "active".
+_CANCELED_STATUSES = frozenset({"canceled", "incomplete_expired"})
+_PAST_DUE_STATUSES = frozenset({"past_due", "unpaid", "incomplete"})
 
 
-def _get_stripe():  # noqa: ANN202
-    """Lazy import stripe and set API key."""
+def _warn_missing_prices() -> None:
+    # Checkout still rejects these per request; this surfaces it at boot.
     if not STRIPE_ENABLED:
-        raise HTTPException(status_code=400, detail="Stripe billing is not enabled.")
+        return
+    for (plan_tier, billing_type), price_id in _PRICE_MAP.items():
+        if not price_id:
+            logger.warning(
+                "Stripe price not configured for %s/%s.", plan_tier, billing_type
+            )
+
+
+_warn_missing_prices()
+
+
+@lru_cache(maxsize=1)
+def _stripe_module():  # noqa: ANN202
+    """Import stripe and set the API key once. A failed import is not cached."""
     try:
         import stripe
     except ImportError:
@@ -64,6 +79,13 @@ def _get_stripe():  # noqa: ANN202
     return stripe
 
 
+def _get_stripe():  # noqa: ANN202
+    """Return the configured stripe module, or 400 when billing is off."""
+    if not STRIPE_ENABLED:
+        raise HTTPException(status_code=400, detail="Stripe billing is not enabled.")
+    return _stripe_module()
+
+
 def create_checkout_session(
     *,
     user_id: str,
@@ -76,7 +98,6 @@ def create_checkout_session(
 ) -> str:
     """Create a Stripe Checkout Session and return the checkout URL."""
     stripe = _get_stripe()
-    _init_price_map()
 
     if plan_tier not in ("pro", "enterprise"):
         raise HTTPException(status_code=400, detail="Invalid plan tier.")
@@ -138,43 +159,77 @@ def create_portal_session(*, stripe_customer_id: str, return_url: str) -> str:
 
 
 def handle_webhook_event(payload: bytes, sig_header: str) -> dict[str, Any]:
-    """Verify and process a Stripe webhook event. Returns summary dict."""
+    """Verify a Stripe webhook event and queue it. Returns summary dict.
+
+    The handlers run on the durable job worker, so Stripe is acknowledged
+    once the event is stored. The job id is derived from the event id, so
+    redelivered events are not queued twice. Without a worker the event is
+    processed inline.
+    """
     stripe = _get_stripe()
 
     if not STRIPE_WEBHOOK_SECRET:
         raise HTTPException(status_code=500, detail="Webhook secret not configured.")
 
+    # Only the signature check and the id/type lookup run here; building a
+    # stripe.Event is skipped, and the raw body is kept for the handlers.
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, STRIPE_WEBHOOK_SECRET
+        raw_event = payload.decode("utf-8")
+        stripe.WebhookSignature.verify_header(
+            raw_event,
+            sig_header,
+            STRIPE_WEBHOOK_SECRET,
+            tolerance=stripe.Webhook.DEFAULT_TOLERANCE,
         )
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid payload.")
+        event = orjson.loads(payload)
+        event_type = event["type"]
+        event_id = event["id"]
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid webhook signature.")
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid payload.")
+
+    logger.info("Stripe webhook: type=%s id=%s", event_type, event_id)
+
+    if WORKER_ENABLED:
+        from .jobs import enqueue_stripe_webhook
+
+        enqueue_stripe_webhook(
+            event_id=event_id, event_type=event_type, raw_event=raw_event
+        )
+    else:
+        process_webhook_event(raw_event)
+    return {"received": True, "type": event_type}
+
+
+def process_webhook_event(raw_event: Union[str, bytes]) -> None:
+    """Apply a verified Stripe event to plans, subscriptions and payments.
 
+    The body is parsed once here, and stored as received as each payment
+    event's raw payload.
+    """
+    raw_payload = raw_event if isinstance(raw_event, str) else raw_event.decode()
+    event = orjson.loads(raw_event)
     event_type = event["type"]
     event_id = event["id"]
     data_object = event["data"]["object"]
 
-    logger.info("Stripe webhook: type=%s id=%s", event_type, event_id)
-
     if event_type == "checkout.session.completed":
-        _handle_checkout_completed(event_id, data_object)
+        _handle_checkout_completed(event_id, data_object, raw_payload=raw_payload)
     elif event_type == "invoice.paid":
-        _handle_invoice_paid(event_id, data_object)
+        _handle_invoice_paid(event_id, data_object, raw_payload=raw_payload)
     elif event_type == "invoice.payment_failed":
-        _handle_invoice_failed(event_id, data_object)
+        _handle_invoice_failed(event_id, data_object, raw_payload=raw_payload)
     elif event_type in (
         "customer.subscription.updated",
         "customer.subscription.deleted",
     ):
-        _handle_subscription_change(event_id, event_type, data_object)
+        _handle_subscription_change(
+            event_id, event_type, data_object, raw_payload=raw_payload
+        )
     else:
         logger.debug("Ignoring unhandled Stripe event type: %s", event_type)
 
-    return {"received": True, "type": event_type}
-
 
 def _resolve_workspace_id(
     user_id: str | None, preferred_workspace_id: str | None = None
@@ -183,14 +238,42 @@ def _resolve_workspace_id(
         return str(preferred_workspace_id)
     if not user_id:
         return None
-    workspace = get_default_workspace_for_user(str(user_id))
-    if not workspace:
-        return None
-    workspace_id = workspace.get("id")
-    return str(workspace_id) if workspace_id else None
+    return get_default_workspace_id_for_user(str(user_id))
+
 
+def _queue_account_email(
+    kind: str, event_id: str, *, user_id: str, workspace_id: Optional[str]
+) -> None:
+    """Send a billing email without holding up webhook processing.
+
+    With the worker running this becomes an ``account_email`` job keyed on the
+    Stripe event, so a redelivered event does not send twice. Otherwise the
+    email is sent inline and failures are only logged.
+    """
+    if WORKER_ENABLED:
+        from .jobs import enqueue_account_email
+
+        enqueue_account_email(
+            kind=kind,
+            event_id=event_id,
+            user_id=user_id,
+            workspace_id=workspace_id,
+            job_id=f"email:{kind}:{event_id}",
+        )
+        return
+    try:
+        from .account_emails import send_queued_account_email
 
-def _handle_checkout_completed(event_id: str, session: dict[str, Any]) -> None:
+        send_queued_account_email(
+            kind, event_id=event_id, user_id=user_id, workspace_id=workspace_id
+        )
+    except Exception:
+        logger.debug("Account email %s failed (non-blocking)", kind, exc_info=True)
+
+
+def _handle_checkout_completed(
+    event_id: str, session: dict[str, Any], *, raw_payload: Optional[str] = None
+) -> None:
     metadata = session.get("metadata", {})
     user_id = metadata.get("user_id")
     workspace_id = _resolve_workspace_id(
@@ -207,30 +290,32 @@ def _handle_checkout_completed(event_id: str, session: dict[str, Any]) -> None:
         logger.warning("checkout.session.completed without user_id in metadata")
         return
 
-    # Workspace-scoped billing: workspace plan is the source of truth.
-    if workspace_id:
-        update_workspace_plan(
-            workspace_id,
+    # Plan, subscription and payment event commit together.
+    with transaction():
+        # Workspace-scoped billing: workspace plan is the source of truth.
+        if workspace_id:
+            update_workspace_plan(
+                workspace_id,
+                plan_tier=plan_tier,
+                stripe_customer_id=customer_id,
+            )
+        else:
+            # Backward compatibility for legacy single-workspace data.
+            update_user_plan(
+                user_id, plan_tier=plan_tier, stripe_customer_id=customer_id
+            )
+
+        create_subscription(
+            user_id=user_id,
+            workspace_id=workspace_id,
             plan_tier=plan_tier,
+            billing_type=billing_type,
+            stripe_subscription_id=subscription_id,
             stripe_customer_id=customer_id,
+            status="active",
         )
-    else:
-        # Backward compatibility for legacy single-workspace data.
-        update_user_plan(user_id, plan_tier=plan_tier, stripe_customer_id=customer_id)
-
-    # Create subscription record
-    create_subscription(
-        user_id=user_id,
-        workspace_id=workspace_id,
-        plan_tier=plan_tier,
-        billing_type=billing_type,
-        stripe_subscription_id=subscription_id,
-        stripe_customer_id=customer_id,
-        status="active",
-    )
 
-    # Log payment event
-    try:
+        # Idempotent on the Stripe event id.
         create_payment_event(
             user_id=user_id,
             workspace_id=workspace_id,
@@ -239,111 +324,90 @@ def _handle_checkout_completed(event_id: str, session: dict[str, Any]) -> None:
             amount_cents=amount,
             plan_tier=plan_tier,
             billing_type=billing_type,
-            raw_payload=json.dumps(session),
+            raw_payload=raw_payload or orjson.dumps(session).decode("utf-8"),
         )
-    except Exception:
-        logger.warning("Duplicate payment event: %s (idempotent)", event_id)
 
-    # Send plan upgrade email (fire-and-forget)
-    try:
-        from .account_emails import send_plan_upgrade_email
-
-        user = get_user_by_id(user_id)
-        if user:
-            send_plan_upgrade_email(
-                user["email"],
-                plan_tier,
-                user_id=user_id,
-                workspace_id=workspace_id,
-            )
-    except Exception:
-        logger.debug("Plan upgrade email failed (non-blocking)", exc_info=True)
+    if get_user_by_id(user_id):
+        _queue_account_email(
+            "plan_upgrade", event_id, user_id=user_id, workspace_id=workspace_id
+        )
 
 
-def _handle_invoice_paid(event_id: str, invoice: dict[str, Any]) -> None:
+def _handle_invoice_paid(
+    event_id: str, invoice: dict[str, Any], *, raw_payload: Optional[str] = None
+) -> None:
     customer_id = invoice.get("customer")
     subscription_id = invoice.get("subscription")
     amount = invoice.get("amount_paid", 0)
 
-    workspace = (
-        get_workspace_by_stripe_customer(str(customer_id)) if customer_id else None
+    workspace, user = (
+        get_billing_principals_by_customer(str(customer_id))
+        if customer_id
+        else (None, None)
     )
     workspace_id = str(workspace["id"]) if workspace else None
-    user = get_user_by_stripe_customer(customer_id) if customer_id else None
     user_id = user["id"] if user else None
 
-    try:
-        create_payment_event(
-            user_id=user_id,
-            workspace_id=workspace_id,
-            stripe_event_id=event_id,
-            event_type="invoice.paid",
-            amount_cents=amount,
-            raw_payload=json.dumps(invoice),
-        )
-    except Exception:
-        logger.warning("Duplicate payment event: %s", event_id)
-
-    # Update subscription period if we have a subscription_id
+    period_end_iso = None
     if subscription_id:
         period_end = (
             invoice.get("lines", {}).get("data", [{}])[0].get("period", {}).get("end")
         )
-        period_end_iso = None
         if period_end:
-            from datetime import datetime, timezone
-
             period_end_iso = datetime.fromtimestamp(
                 period_end, tz=timezone.utc
             ).isoformat()
-        update_subscription_status(
-            subscription_id,
-            status="active",
-            current_period_end=period_end_iso,
+
+    with transaction():
+        create_payment_event(
+            user_id=user_id,
+            workspace_id=workspace_id,
+            stripe_event_id=event_id,
+            event_type="invoice.paid",
+            amount_cents=amount,
+            raw_payload=raw_payload or orjson.dumps(invoice).decode("utf-8"),
         )
+        # Update subscription period if we have a subscription_id
+        if subscription_id:
+            update_subscription_status(
+                subscription_id,
+                status="active",
+                current_period_end=period_end_iso,
+            )
 
-    # Send payment receipt email (fire-and-forget).
     if user:
-        try:
-            from .account_emails import send_payment_receipt_email
-
-            send_payment_receipt_email(
-                user["email"],
-                amount_cents=int(amount or 0),
-                plan_tier=str(
-                    (workspace or {}).get("plan_tier") or user.get("plan_tier", "pro")
-                ),
-                user_id=user["id"],
-                workspace_id=workspace_id,
-            )
-        except Exception:
-            logger.debug("Payment receipt email failed (non-blocking)", exc_info=True)
+        _queue_account_email(
+            "payment_receipt",
+            event_id,
+            user_id=str(user["id"]),
+            workspace_id=workspace_id,
+        )
 
 
-def _handle_invoice_failed(event_id: str, invoice: dict[str, Any]) -> None:
+def _handle_invoice_failed(
+    event_id: str, invoice: dict[str, Any], *, raw_payload: Optional[str] = None
+) -> None:
     customer_id = invoice.get("customer")
     subscription_id = invoice.get("subscription")
 
-    workspace = (
-        get_workspace_by_stripe_customer(str(customer_id)) if customer_id else None
+    workspace, user = (
+        get_billing_principals_by_customer(str(customer_id))
+        if customer_id
+        else (None, None)
     )
     workspace_id = str(workspace["id"]) if workspace else None
-    user = get_user_by_stripe_customer(customer_id) if customer_id else None
     user_id = user["id"] if user else None
 
-    try:
+    with transaction():
         create_payment_event(
             user_id=user_id,
             workspace_id=workspace_id,
             stripe_event_id=event_id,
             event_type="invoice.payment_failed",
-            raw_payload=json.dumps(invoice),
+            raw_payload=raw_payload or orjson.dumps(invoice).decode("utf-8"),
         )
-    except Exception:
-        logger.warning("Duplicate payment event: %s", event_id)
-
-    if subscription_id:
-        update_subscription_status(subscription_id, status="past_due")
+        if subscription_id:
+            update_subscription_status(subscription_id, status="past_due")
 
     logger.warning(
         "Invoice payment failed: customer=%s subscription=%s",
@@ -353,61 +417,61 @@ def _handle_invoice_failed(event_id: str, invoice: dict[str, Any]) -> None:
 
 
 def _handle_subscription_change(
-    event_id: str, event_type: str, subscription: dict[str, Any]
+    event_id: str,
+    event_type: str,
+    subscription: dict[str, Any],
+    *,
+    raw_payload: Optional[str] = None,
 ) -> None:
     subscription_id = subscription.get("id")
     customer_id = subscription.get("customer")
     status = subscription.get("status", "active")
 
-    workspace = (
-        get_workspace_by_stripe_customer(str(customer_id)) if customer_id else None
+    workspace, user = (
+        get_billing_principals_by_customer(str(customer_id))
+        if customer_id
+        else (None, None)
     )
     workspace_id = str(workspace["id"]) if workspace else None
-    user = get_user_by_stripe_customer(customer_id) if customer_id else None
     user_id = user["id"] if user else None
 
-    # Map Stripe statuses to our statuses
-    status_map = {
-        "active": "active",
-        "past_due": "past_due",
-        "canceled": "canceled",
-        "unpaid": "past_due",
-        "incomplete": "past_due",
-        "incomplete_expired": "canceled",
-    }
-    mapped_status = status_map.get(status, "active")
+    if status in _CANCELED_STATUSES:
+        mapped_status = "canceled"
+    elif status in _PAST_DUE_STATUSES:
+        mapped_status = "past_due"
+    else:
+        mapped_status = "active"
 
     canceled_at = None
-    if event_type == "customer.subscription.deleted" or mapped_status == "canceled":
-        from datetime import datetime, timezone
-
+    canceled = (
+        event_type == "customer.subscription.deleted" or mapped_status == "canceled"
+    )
+    if canceled:
         canceled_at = datetime.now(timezone.utc).isoformat()
         mapped_status = "canceled"
 
+    with transaction():
         # Revert workspace to free tier when subscription is canceled.
-        if workspace_id:
+        if canceled and workspace_id:
             update_workspace_plan(workspace_id, plan_tier="free")
-        elif user_id:
+        elif canceled and user_id:
             # Backward compatibility for legacy single-workspace data.
             update_user_plan(user_id, plan_tier="free")
 
-    if subscription_id:
-        update_subscription_status(
-            subscription_id,
-            status=mapped_status,
-            canceled_at=canceled_at,
-        )
+        if subscription_id:
+            update_subscription_status(
+                subscription_id,
+                status=mapped_status,
+                canceled_at=canceled_at,
+            )
 
-    try:
         create_payment_event(
             user_id=user_id,
             workspace_id=workspace_id,
             stripe_event_id=event_id,
             event_type=event_type,
-            raw_payload=json.dumps(subscription),
+            raw_payload=raw_payload or orjson.dumps(subscription).decode("utf-8"),
         )
-    except Exception:
-        logger.warning("Duplicate payment event: %s", event_id)
 
 
 def enforce_plan_limits(
@@ -452,50 +516,54 @@ def enforce_plan_limits(
         )
 
 
+# Public pricing; get_plan_info() hands each caller its own copy.
+_PLAN_INFO: tuple[dict[str, Any], ...] = (
+    {
+        "name": "Free",
+        "monthly_price_cents": 0,
+        "lifetime_price_cents": 0,
+        "document_limit": PLAN_FREE_DOCUMENT_LIMIT,
+        "features": (
+            "50 documents/month",
+            "Rules-based classification",
+            "1 user",
+            "30-day audit retention",
+        ),
+    },
+    {
+        "name": "Pro",
+        "monthly_price_cents": 2900,
+        "lifetime_price_cents": 29900,
+        "document_limit": PLAN_PRO_DOCUMENT_LIMIT,
+        "features": (
+            "5,000 documents/month",
+            "AI classification (Claude & GPT)",
+            "All 10 connectors",
+            "5 users",
+            "Email notifications",
+            "API access",
+            "1-year audit retention",
+        ),
+    },
+    {
+        "name": "Enterprise",
+        "monthly_price_cents": 9900,
+        "lifetime_price_cents": 99900,
+        "document_limit": None,
+        "features": (
+            "Unlimited documents",
+            "AI classification (Claude & GPT)",
+            "All 10 connectors",
+            "Unlimited users",
+            "Email notifications",
+            "API access",
+            "7-year audit retention",
+            "Dedicated SLA support",
+        ),
+    },
+)
+
+
 def get_plan_info() -> list[dict[str, Any]]:
     """Return public plan information for the pricing page."""
-    return [
-        {
-            "name": "Free",
-            "monthly_price_cents": 0,
-            "lifetime_price_cents": 0,
-            "document_limit": PLAN_FREE_DOCUMENT_LIMIT,
-            "features": [
-                "50 documents/month",
-                "Rules-based classification",
-                "1 user",
-                "30-day audit retention",
-            ],
-        },
-        {
-            "name": "Pro",
-            "monthly_price_cents": 2900,
-            "lifetime_price_cents": 29900,
-            "document_limit": PLAN_PRO_DOCUMENT_LIMIT,
-            "features": [
-                "5,000 documents/month",
-                "AI classification (Claude & GPT)",
-                "All 10 connectors",
-                "5 users",
-                "Email notifications",
-                "API access",
-                "1-year audit retention",
-            ],
-        },
-        {
-            "name": "Enterprise",
-            "monthly_price_cents": 9900,
-            "lifetime_price_cents": 99900,
-            "document_limit": None,
-            "features": [
-                "Unlimited documents",
-                "AI classification (Claude & GPT)",
-                "All 10 connectors",
-                "Unlimited users",
-                "Email notifications",
-                "API access",
-                "7-year audit retention",
-                "Dedicated SLA support",
-            ],
-        },
-    ]
+    return [{**plan, "features": list(plan["features"])} for plan in _PLAN_INFO]
@@ -3,12 +3,14 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 from typing import Any, Optional
 
-from .db import get_connection
+from .db import SUPPORTS_RETURNING, get_connection
 from .repository import get_document, utcnow_iso
 
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+PLACEHOLDER_RE = re.compile(r"\{\{([^{}]*)\}\}")
 
 
 def create_template(
@@ -19,42 +21,124 @@ def create_template(
     template_body: str,
 ) -> dict[str, Any]:
     now = utcnow_iso()
+    query = """INSERT INTO templates (workspace_id, name, doc_type, template_body, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)"""
+    params = (workspace_id, name, doc_type, template_body, now, now)
     with get_connection() as conn:
-        cursor = conn.execute(
-            """INSERT INTO templates (workspace_id, name, doc_type, template_body, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (workspace_id, name, doc_type, template_body, now, now),
-        )
-        row = conn.execute(
-            "SELECT * FROM templates WHERE id = ?", (cursor.lastrowid,)
-        ).fetchone()
+        if SUPPORTS_RETURNING:
+            row = conn.execute(f"{query} RETURNING *", params).fetchone()
+        else:
+            cursor = conn.execute(query, params)
+            row = conn.execute(
+                "SELECT * FROM templates WHERE id = ?", (cursor.lastrowid,)
+            ).fetchone()
     return dict(row)
 
 
-def list_templates(
+def _scope_options(column: str, filtered: bool) -> tuple[tuple[str, bool], ...]:
+    # (condition, takes a parameter) for each UNION ALL arm of one filter.
+    if not filtered:
+        return (("", False),)
+    return ((f"{column} = ?", True), (f"{column} IS NULL", False))
+
+
+@lru_cache(maxsize=16)
+def _list_templates_sql(
+    columns: str, by_workspace: bool, by_doc_type: bool, after_cursor: bool
+) -> tuple[str, tuple[tuple[bool, bool], ...]]:
+    """Build the listing SQL once per filter shape.
+
+    Returns the query and, per arm, whether it binds the workspace and the
+    doc type, so callers can lay out parameters in the same order.
+    """
+    arms: list[str] = []
+    binds: list[tuple[bool, bool]] = []
+    for ws_condition, ws_bind in _scope_options("workspace_id", by_workspace):
+        for type_condition, type_bind in _scope_options("doc_type", by_doc_type):
+            conditions = [c for c in (ws_condition, type_condition) if c]
+            if after_cursor:
+                conditions.append("(name, id) > (?, ?)")
+            arm = f"SELECT {columns} FROM templates"
+            if conditions:
+                arm += " WHERE " + " AND ".join(conditions)
+            arms.append(arm)
+            binds.append((ws_bind, type_bind))
+    query = " UNION ALL ".join(arms) + " ORDER BY name ASC, id ASC LIMIT ?"
+    return query, tuple(binds)
+
+
+def _list_template_rows(
+    columns: str,
     *,
-    workspace_id: Optional[str] = None,
-    doc_type: Optional[str] = None,
-    limit: int = 50,
+    workspace_id: Optional[str],
+    doc_type: Optional[str],
+    limit: int,
+    cursor_name: Optional[str] = None,
+    cursor_id: Optional[int] = None,
 ) -> list[dict[str, Any]]:
-    query = "SELECT * FROM templates"
-    conditions: list[str] = []
+    if (cursor_name is None) != (cursor_id is None):
+        raise ValueError("cursor_name and cursor_id must be given together.")
+    doc_type = doc_type or None
+    after_cursor = cursor_id is not None
+    query, binds = _list_templates_sql(
+        columns, workspace_id is not None, doc_type is not None, after_cursor
+    )
     params: list[Any] = []
-    if workspace_id is not None:
-        conditions.append("(workspace_id = ? OR workspace_id IS NULL)")
-        params.append(workspace_id)
-    if doc_type:
-        conditions.append("(doc_type = ? OR doc_type IS NULL)")
-        params.append(doc_type)
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-    query += " ORDER BY name ASC LIMIT ?"
+    for ws_bind, type_bind in binds:
+        if ws_bind:
+            params.append(workspace_id)
+        if type_bind:
+            params.append(doc_type)
+        if after_cursor:
+            params.extend([cursor_name, cursor_id])
     params.append(limit)
     with get_connection() as conn:
         rows = conn.execute(query, params).fetchall()
     return [dict(row) for row in rows]
 
 
+def list_templates(
+    *,
+    workspace_id: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    limit: int = 50,
+    cursor_name: Optional[str] = None,
+    cursor_id: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """List templates by name, one keyset page at a time.
+
+    Each "value or shared (NULL)" filter is split into one UNION ALL arm
+    per case, so every arm is an equality search on
+    idx_templates_ws_type_name and the arms merge in (name, id) order
+    without a sort. Pass the ``name`` and ``id`` of the last row seen to
+    fetch the next page.
+    """
+    return _list_template_rows(
+        "*",
+        workspace_id=workspace_id,
+        doc_type=doc_type,
+        limit=limit,
+        cursor_name=cursor_name,
+        cursor_id=cursor_id,
+    )
+
+
+def list_template_names(
+    *,
+    workspace_id: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    limit: int = 50,
+) -> list[dict[str, Any]]:
+    """Like list_templates, but only ``id``, ``name`` and ``doc_type``.
+
+    Those columns are all in idx_templates_ws_type_name, so the listing is
+    answered from the index without reading any template bodies.
+    """
+    return _list_template_rows(
+        "id, name, doc_type", workspace_id=workspace_id, doc_type=doc_type, limit=limit
+    )
+
+
 def get_template(
     template_id: int, workspace_id: Optional[str] = None
 ) -> Optional[dict[str, Any]]:
@@ -70,6 +154,20 @@ def get_template(
     return dict(row) if row else None
 
 
+# One statement per scope: COALESCE keeps columns the caller left as None,
+# so partial updates reuse the same prepared SQL.
+_UPDATE_TEMPLATE_SQL = {
+    scoped: (
+        "UPDATE templates SET name = COALESCE(?, name), "
+        "doc_type = COALESCE(?, doc_type), "
+        "template_body = COALESCE(?, template_body), updated_at = ? "
+        "WHERE id = ?"
+        + (" AND (workspace_id = ? OR workspace_id IS NULL)" if scoped else "")
+    )
+    for scoped in (False, True)
+}
+
+
 def update_template(
     template_id: int,
     *,
@@ -78,31 +176,21 @@ def update_template(
     template_body: Optional[str] = None,
     workspace_id: Optional[str] = None,
 ) -> Optional[dict[str, Any]]:
-    updates: dict[str, Any] = {}
-    if name is not None:
-        updates["name"] = name
-    if doc_type is not None:
-        updates["doc_type"] = doc_type
-    if template_body is not None:
-        updates["template_body"] = template_body
-    updates["updated_at"] = utcnow_iso()
-    assignments = ", ".join(f"{k} = ?" for k in updates)
-    params = list(updates.values()) + [template_id]
-    where = "id = ?"
+    params: list[Any] = [name, doc_type, template_body, utcnow_iso(), template_id]
     if workspace_id is not None:
-        where += " AND (workspace_id = ? OR workspace_id IS NULL)"
         params.append(workspace_id)
+    query = _UPDATE_TEMPLATE_SQL[workspace_id is not None]
     with get_connection() as conn:
-        conn.execute(f"UPDATE templates SET {assignments} WHERE {where}", params)
-        select_conditions = ["id = ?"]
-        select_params: list[Any] = [template_id]
-        if workspace_id is not None:
-            select_conditions.append("(workspace_id = ? OR workspace_id IS NULL)")
-            select_params.append(workspace_id)
-        row = conn.execute(
-            f"SELECT * FROM templates WHERE {' AND '.join(select_conditions)}",
-            select_params,
-        ).fetchone()
+        if SUPPORTS_RETURNING:
+            row = conn.execute(f"{query} RETURNING *", params).fetchone()
+        else:
+            # The UPDATE already applied the workspace check.
+            cursor = conn.execute(query, params)
+            row = None
+            if cursor.rowcount > 0:
+                row = conn.execute(
+                    "SELECT * FROM templates WHERE id = ?", (template_id,)
+                ).fetchone()
     return dict(row) if row else None
 
 
@@ -117,20 +205,31 @@ def delete_template(template_id: int, workspace_id: Optional[str] = None) -> boo
     return cursor.rowcount > 0
 
 
-def _document_context(document: dict[str, Any]) -> dict[str, str]:
-    replacements: dict[str, str] = {
-        "id": str(document.get("id", "")),
-        "filename": str(document.get("filename", "")),
-        "doc_type": str(document.get("doc_type", "")),
-        "department": str(document.get("department", "")),
-        "status": str(document.get("status", "")),
-        "urgency": str(document.get("urgency", "")),
-    }
-    fields = document.get("extracted_fields", {})
-    if isinstance(fields, dict):
-        for key, value in fields.items():
-            replacements[key] = str(value) if value is not None else ""
-    return replacements
+_DOCUMENT_KEYS = frozenset(
+    {"id", "filename", "doc_type", "department", "status", "urgency"}
+)
+
+
+class _DocumentContext:
+    """Placeholder values for a document, stringified only when referenced.
+
+    Extracted fields take precedence over the document's own columns.
+    """
+
+    __slots__ = ("_document", "_fields")
+
+    def __init__(self, document: dict[str, Any]) -> None:
+        fields = document.get("extracted_fields", {})
+        self._document = document
+        self._fields = fields if isinstance(fields, dict) else {}
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        if key in self._fields:
+            value = self._fields[key]
+            return str(value) if value is not None else ""
+        if key in _DOCUMENT_KEYS:
+            return str(self._document.get(key, ""))
+        return default
 
 
 def _resolve_recipient_email(document: dict[str, Any]) -> Optional[str]:
@@ -142,16 +241,21 @@ def _resolve_recipient_email(document: dict[str, Any]) -> Optional[str]:
         if value is None:
             continue
         email = str(value).strip()
-        if EMAIL_RE.match(email):
+        # Most non-addresses (empty, names, phone numbers) lack an "@"; skip
+        # the regex for them.
+        if "@" in email and EMAIL_RE.match(email):
             return email
     return None
 
 
-def _render_body(template_body: str, context: dict[str, str]) -> str:
-    body = template_body
-    for key, value in context.items():
-        body = body.replace(f"{{{{{key}}}}}", value)
-    return body
+def _render_body(template_body: str, context: _DocumentContext | dict[str, str]) -> str:
+    # One scan of the template; unknown placeholders are left as written,
+    # and substituted values are never re-scanned for placeholders.
+    if "{{" not in template_body:
+        return template_body
+    return PLACEHOLDER_RE.sub(
+        lambda match: context.get(match.group(1), match.group(0)), template_body
+    )
 
 
 def render_template(
@@ -163,7 +267,7 @@ def render_template(
     document = get_document(document_id, workspace_id=workspace_id)
     if not document:
         raise ValueError("Document not found")
-    context = _document_context(document)
+    context = _DocumentContext(document)
     return _render_body(template["template_body"], context)
 
 
@@ -177,7 +281,7 @@ def compose_template_email(
     if not document:
         raise ValueError("Document not found")
 
-    context = _document_context(document)
+    context = _DocumentContext(document)
     body = _render_body(template["template_body"], context)
     recipient = _resolve_recipient_email(document)
     subject = f"{template['name']} - {context.get('filename', '').strip() or 'CitySort Update'}"
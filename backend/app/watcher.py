@@ -5,51 +5,130 @@ from __future__ import annotations
 import hashlib
 import logging
 import mimetypes
+import os
 import threading
-import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 from uuid import uuid4
 
-from .db import get_connection
+from .db import close_thread_connection, get_connection, transaction
 from .jobs import enqueue_document_processing
 from .repository import create_audit_event, create_document, utcnow_iso
-from .security import UploadValidationError, validate_upload
-from .storage import write_document_bytes
+from .security import UploadValidationError, validate_upload_file
+from .storage import copy_upload_to_storage
 
 logger = logging.getLogger(__name__)
 
 
-def _file_hash(path: Path) -> str:
+def _hash_identity(resolved_path: str, st: os.stat_result) -> str:
     h = hashlib.sha256()
-    h.update(str(path.resolve()).encode("utf-8"))
-    h.update(str(path.stat().st_size).encode("utf-8"))
-    h.update(str(path.stat().st_mtime).encode("utf-8"))
+    h.update(resolved_path.encode("utf-8"))
+    h.update(str(st.st_size).encode("utf-8"))
+    h.update(str(st.st_mtime).encode("utf-8"))
     return h.hexdigest()
 
 
-def _is_already_watched(file_hash: str) -> bool:
+def _file_hash(path: Path) -> str:
+    return _hash_identity(str(path.resolve()), path.stat())
+
+
+def _entry_hash(entry: os.DirEntry[str], resolved_dir: Path) -> str:
+    """Same hash as _file_hash, from one stat() of a scandir entry.
+
+    Only a symlink resolves somewhere other than its directory, so regular
+    files skip the per-entry resolve().
+    """
+    if entry.is_symlink():
+        resolved = str(Path(entry.path).resolve())
+    else:
+        resolved = str(resolved_dir / entry.name)
+    return _hash_identity(resolved, entry.stat())
+
+
+# Hashes per IN lookup; stays under the SQLite bound-parameter limit.
+_WATCHED_LOOKUP_CHUNK = 400
+
+
+def _watched_hashes(file_hashes: list[str]) -> set[str]:
+    """Return which of ``file_hashes`` were already ingested."""
+    found: set[str] = set()
     with get_connection() as conn:
-        row = conn.execute(
-            "SELECT id FROM watched_files WHERE file_hash = ?", (file_hash,)
-        ).fetchone()
-    return row is not None
+        for start in range(0, len(file_hashes), _WATCHED_LOOKUP_CHUNK):
+            chunk = file_hashes[start : start + _WATCHED_LOOKUP_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = conn.execute(
+                f"SELECT file_hash FROM watched_files WHERE file_hash IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            found.update(str(row["file_hash"]) for row in rows)
+    return found
 
 
-def _record_watched_file(
+def _claim_watched_file(
     *, filename: str, file_hash: str, source_path: str, document_id: str
-) -> None:
+) -> bool:
+    """Record a watched file; False if its hash was already recorded.
+
+    The UNIQUE file_hash makes this the atomic dedup gate, so two watcher
+    processes racing on the same file cannot both ingest it.
+    """
     with get_connection() as conn:
-        conn.execute(
+        cursor = conn.execute(
             """INSERT INTO watched_files (filename, file_hash, source_path, document_id, created_at)
-               VALUES (?, ?, ?, ?, ?)""",
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(file_hash) DO NOTHING""",
             (filename, file_hash, source_path, document_id, utcnow_iso()),
         )
+    return cursor.rowcount > 0
+
+
+# Quiet period after the last filesystem event before a scan runs.
+_EVENT_SETTLE_SECONDS = 1.0
+
+
+def _start_event_observer(watch_path: Path, wake: threading.Event) -> Optional[Any]:
+    """Start a watchdog observer that sets ``wake`` when files arrive.
+
+    Returns None when watchdog is not installed or cannot watch the path;
+    the caller then keeps plain interval polling.
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except Exception:
+        return None
+
+    class _WakeHandler(FileSystemEventHandler):
+        # Writes keep waking the loop so it waits for a copy to go quiet;
+        # reads (opened / closed_no_write) are ignored, since ingest reads files.
+        def on_created(self, event: Any) -> None:
+            wake.set()
+
+        def on_modified(self, event: Any) -> None:
+            wake.set()
+
+        def on_closed(self, event: Any) -> None:
+            wake.set()
+
+        def on_moved(self, event: Any) -> None:
+            wake.set()
+
+    try:
+        observer = Observer()
+        observer.schedule(_WakeHandler(), str(watch_path), recursive=False)
+        observer.start()
+    except Exception as exc:
+        logger.warning(
+            "Folder events unavailable for %s, polling instead: %s", watch_path, exc
+        )
+        return None
+    return observer
 
 
 class FolderWatcher:
     def __init__(self) -> None:
         self._stop_event = threading.Event()
+        self._wake = threading.Event()
         self._thread: Optional[threading.Thread] = None
 
     def start(self) -> None:
@@ -61,6 +140,7 @@ class FolderWatcher:
         if self._thread and self._thread.is_alive():
             return
         self._stop_event.clear()
+        self._wake.clear()
         self._thread = threading.Thread(
             target=self._run_loop, name="folder-watcher", daemon=True
         )
@@ -69,79 +149,136 @@ class FolderWatcher:
 
     def stop(self) -> None:
         self._stop_event.set()
+        self._wake.set()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=5)
         logger.info("Stopped folder watcher")
 
     def _run_loop(self) -> None:
-        from .config import UPLOAD_DIR, WATCH_DIR, WATCH_INTERVAL_SECONDS
+        from .config import (
+            UPLOAD_DIR,
+            WATCH_DIR,
+            WATCH_EVENT_RESCAN_FACTOR,
+            WATCH_INTERVAL_SECONDS,
+            WATCH_MODE,
+        )
 
         watch_path = Path(WATCH_DIR)
-        while not self._stop_event.is_set():
-            if watch_path.is_dir():
-                for file_path in sorted(watch_path.iterdir()):
-                    if self._stop_event.is_set():
-                        break
-                    if not file_path.is_file():
-                        continue
-                    # Skip hidden files.
-                    if file_path.name.startswith("."):
-                        continue
+        observer = None
+        if WATCH_MODE != "polling" and watch_path.is_dir():
+            observer = _start_event_observer(watch_path, self._wake)
+        interval = WATCH_INTERVAL_SECONDS
+        if observer is not None:
+            interval *= WATCH_EVENT_RESCAN_FACTOR
+            logger.info("Folder watcher using filesystem events on %s", watch_path)
+        try:
+            while not self._stop_event.is_set():
+                if watch_path.is_dir():
                     try:
-                        fhash = _file_hash(file_path)
-                        if _is_already_watched(fhash):
-                            continue
-                        self._ingest_file(file_path, fhash, UPLOAD_DIR)
+                        self._scan_once(watch_path, UPLOAD_DIR)
                     except Exception as exc:
-                        logger.exception("Watcher error for %s: %s", file_path, exc)
-            time.sleep(WATCH_INTERVAL_SECONDS)
+                        logger.exception(
+                            "Watcher scan of %s failed: %s", watch_path, exc
+                        )
+                # Sleep until the next interval, a filesystem event or stop(),
+                # then let a burst of events (a file still being copied) settle
+                # so the scan doesn't ingest a half-written file.
+                self._wake.wait(interval)
+                while self._wake.is_set() and not self._stop_event.is_set():
+                    self._wake.clear()
+                    self._wake.wait(_EVENT_SETTLE_SECONDS)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join(timeout=5)
+            # Every scan reused this thread's cached connection; release it
+            # with the thread.
+            close_thread_connection()
+
+    def _scan_once(self, watch_path: Path, upload_dir: Path) -> None:
+        candidates: list[tuple[Path, str]] = []
+        resolved_dir = watch_path.resolve()
+        with os.scandir(watch_path) as scan:
+            entries = sorted(scan, key=lambda entry: entry.name)
+        for entry in entries:
+            # Skip hidden files.
+            if entry.name.startswith("."):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                candidates.append((Path(entry.path), _entry_hash(entry, resolved_dir)))
+            except Exception as exc:
+                logger.exception("Watcher error for %s: %s", entry.path, exc)
+        if not candidates:
+            return
+
+        # One lookup per scan instead of one query per file.
+        seen = _watched_hashes([fhash for _, fhash in candidates])
+        for file_path, fhash in candidates:
+            if self._stop_event.is_set():
+                break
+            if fhash in seen:
+                continue
+            try:
+                self._ingest_file(file_path, fhash, upload_dir)
+            except Exception as exc:
+                logger.exception("Watcher error for %s: %s", file_path, exc)
 
     def _ingest_file(self, file_path: Path, fhash: str, upload_dir: Path) -> None:
         document_id = str(uuid4())
         safe_filename = f"{document_id}_{file_path.name}"
         dest = upload_dir / safe_filename
-        payload = file_path.read_bytes()
         content_type = (
             mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
         )
-        try:
-            validate_upload(
-                filename=file_path.name, content_type=content_type, payload=payload
+        # Validate and store straight from the open file, like HTTP uploads,
+        # so a large drop never has to fit in memory.
+        with file_path.open("rb") as source:
+            try:
+                validate_upload_file(
+                    filename=file_path.name, content_type=content_type, source=source
+                )
+            except UploadValidationError as exc:
+                logger.warning(
+                    "Watcher skipped %s due to validation failure: %s", file_path, exc
+                )
+                return
+            copy_upload_to_storage(source, dest)
+
+        with transaction():
+            # Claim first: if another process ingested this file since the
+            # scan, nothing else is written and the stored copy is dropped.
+            if not _claim_watched_file(
+                filename=file_path.name,
+                file_hash=fhash,
+                source_path=str(file_path),
+                document_id=document_id,
+            ):
+                dest.unlink(missing_ok=True)
+                logger.info("Watcher skipped %s: already ingested", file_path)
+                return
+            create_document(
+                document={
+                    "id": document_id,
+                    "filename": file_path.name,
+                    "storage_path": str(dest),
+                    "source_channel": "watched_folder",
+                    "content_type": content_type,
+                    "status": "ingested",
+                    "requires_review": False,
+                    "confidence": 0.0,
+                    "doc_type": None,
+                    "department": None,
+                    "urgency": "normal",
+                }
             )
-        except UploadValidationError as exc:
-            logger.warning(
-                "Watcher skipped %s due to validation failure: %s", file_path, exc
+            create_audit_event(
+                document_id=document_id,
+                action="watched_folder_ingested",
+                actor="folder_watcher",
+                details=f"source={file_path}",
             )
-            return
-        write_document_bytes(dest, payload)
-
-        create_document(
-            document={
-                "id": document_id,
-                "filename": file_path.name,
-                "storage_path": str(dest),
-                "source_channel": "watched_folder",
-                "content_type": content_type,
-                "status": "ingested",
-                "requires_review": False,
-                "confidence": 0.0,
-                "doc_type": None,
-                "department": None,
-                "urgency": "normal",
-            }
-        )
-        _record_watched_file(
-            filename=file_path.name,
-            file_hash=fhash,
-            source_path=str(file_path),
-            document_id=document_id,
-        )
-        create_audit_event(
-            document_id=document_id,
-            action="watched_folder_ingested",
-            actor="folder_watcher",
-            details=f"source={file_path}",
-        )
         try:
             from .workflows import run_workflows_for_document
 
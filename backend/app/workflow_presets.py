@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
+import copy
 from typing import Any, Optional
 
 from .repository import create_workflow_rule, list_workflow_rules
-from .templates import create_template, list_templates
+from .templates import create_template, list_template_names
 
 
-def _preset_catalog() -> list[dict[str, Any]]:
+def _build_preset_catalog() -> list[dict[str, Any]]:
     """Return the full preset catalog.
 
     Notes:
@@ -249,29 +250,32 @@ def _preset_catalog() -> list[dict[str, Any]]:
     ]
 
 
+# The catalog is static: build it, its summaries and its id index once.
+_PRESET_CATALOG: tuple[dict[str, Any], ...] = tuple(_build_preset_catalog())
+_PRESET_BY_ID: dict[str, dict[str, Any]] = {
+    str(preset.get("id") or "").strip().lower(): preset for preset in _PRESET_CATALOG
+}
+_PRESET_SUMMARIES: tuple[dict[str, Any], ...] = tuple(
+    {
+        "id": preset["id"],
+        "name": preset["name"],
+        "category": preset.get("category", "general"),
+        "description": preset.get("description", ""),
+        "rules_count": len(preset.get("rules") or []),
+        "templates_count": len(preset.get("templates") or []),
+    }
+    for preset in _PRESET_CATALOG
+)
+
+
 def list_workflow_presets() -> list[dict[str, Any]]:
-    presets = _preset_catalog()
-    items: list[dict[str, Any]] = []
-    for preset in presets:
-        items.append(
-            {
-                "id": preset["id"],
-                "name": preset["name"],
-                "category": preset.get("category", "general"),
-                "description": preset.get("description", ""),
-                "rules_count": len(preset.get("rules") or []),
-                "templates_count": len(preset.get("templates") or []),
-            }
-        )
-    return items
+    return [dict(summary) for summary in _PRESET_SUMMARIES]
 
 
 def get_workflow_preset(preset_id: str) -> Optional[dict[str, Any]]:
-    normalized = str(preset_id or "").strip().lower()
-    for preset in _preset_catalog():
-        if str(preset.get("id") or "").strip().lower() == normalized:
-            return preset
-    return None
+    preset = _PRESET_BY_ID.get(str(preset_id or "").strip().lower())
+    # Callers get their own copy so the shared catalog cannot be edited.
+    return copy.deepcopy(preset) if preset is not None else None
 
 
 def apply_workflow_preset(
@@ -284,7 +288,7 @@ def apply_workflow_preset(
     if not preset:
         raise ValueError("Workflow preset not found.")
 
-    existing_templates = list_templates(workspace_id=workspace_id, limit=400)
+    existing_templates = list_template_names(workspace_id=workspace_id, limit=400)
     existing_templates_by_name = {
         str(t.get("name") or "").strip().lower(): t for t in existing_templates
     }
@@ -296,11 +300,9 @@ def apply_workflow_preset(
         if not name:
             continue
         key = name.lower()
-        if key in existing_templates_by_name and not overwrite:
-            skipped_templates += 1
-            continue
-        if key in existing_templates_by_name and overwrite:
-            # We intentionally do not overwrite existing templates; teams usually customize copy.
+        if key in existing_templates_by_name:
+            # Even with overwrite=True existing templates are kept; teams
+            # usually customize copy.
             skipped_templates += 1
             continue
         created = create_template(
@@ -331,11 +333,9 @@ def apply_workflow_preset(
         if not name or not trigger_event:
             continue
         key = (name.lower(), trigger_event.lower())
-        if key in existing_rule_keys and not overwrite:
-            skipped_rules += 1
-            continue
-        if key in existing_rule_keys and overwrite:
-            # We intentionally do not overwrite rules automatically; edits are safer in the UI.
+        if key in existing_rule_keys:
+            # Even with overwrite=True existing rules are kept; edits are
+            # safer in the UI.
             skipped_rules += 1
             continue
         created = create_workflow_rule(
@@ -6,10 +6,10 @@ import json
 import logging
 import urllib.error
 import urllib.request
-from datetime import datetime, timezone
 from typing import Any, Optional
 
 from .auto_emails import send_assignment_notification
+from .db import transaction
 from .emailer import email_configured, send_email
 from .notifications import create_notification
 from .repository import (
@@ -147,21 +147,23 @@ def _action_assign(
         if current_status in {"needs_review", "acknowledged"}:
             updates["status"] = "assigned"
 
-    updated = update_document(
-        document_id,
-        updates=updates,
-        workspace_id=workspace_id,
-    )
+    with transaction():
+        updated = update_document(
+            document_id,
+            updates=updates,
+            workspace_id=workspace_id,
+        )
+        if updated:
+            create_audit_event(
+                document_id=document_id,
+                action="workflow_assigned",
+                actor=actor,
+                details=f"rule={rule_name} assigned_to={assignee_id}",
+                workspace_id=workspace_id,
+            )
     if not updated:
         return
 
-    create_audit_event(
-        document_id=document_id,
-        action="workflow_assigned",
-        actor=actor,
-        details=f"rule={rule_name} assigned_to={assignee_id}",
-        workspace_id=workspace_id,
-    )
     try:
         create_notification(
             type="assignment",
@@ -260,7 +262,7 @@ def _action_send_template_email(
         update_outbound_email(
             int(record["id"]),
             status="sent",
-            sent_at=datetime.now(timezone.utc).isoformat(),
+            sent_at=utcnow_iso(),
         )
         create_audit_event(
             document_id=document_id,
@@ -292,6 +294,9 @@ def _action_webhook_post(
     url = str(config.get("url") or "").strip()
     if not url:
         return
+    # audit_events.document_id references documents(id): without a stored
+    # document the webhook still fires, unaudited.
+    document_id = str(document.get("id") or "").strip()
 
     payload = {
         "event": trigger_event,
@@ -324,8 +329,10 @@ def _action_webhook_post(
     )
     try:
         urllib.request.urlopen(request, timeout=10).read()
+        if not document_id:
+            return
         create_audit_event(
-            document_id=str(document.get("id") or ""),
+            document_id=document_id,
             action="workflow_webhook_sent",
             actor=actor,
             details=f"rule={rule_name} event={trigger_event} url={url}",
@@ -333,9 +340,11 @@ def _action_webhook_post(
         )
     except (urllib.error.HTTPError, urllib.error.URLError, TimeoutError) as exc:
         logger.debug("Workflow webhook failed: %s", exc)
+        if not document_id:
+            return
         try:
             create_audit_event(
-                document_id=str(document.get("id") or ""),
+                document_id=document_id,
                 action="workflow_webhook_failed",
                 actor=actor,
                 details=f"rule={rule_name} event={trigger_event} url={url} error={exc}",
@@ -354,6 +363,7 @@ def _action_create_notification(
     trigger_event: str,
     config: dict[str, Any],
 ) -> None:
+    document_id = str(document.get("id") or "").strip()
     ctx = _document_context(document)
     notif_type = str(config.get("type") or "workflow").strip() or "workflow"
     title_tmpl = str(config.get("title") or "Workflow event").strip()
@@ -367,16 +377,17 @@ def _action_create_notification(
             title=title,
             message=message,
             user_id=user_id,
-            document_id=str(document.get("id") or ""),
-            workspace_id=workspace_id,
-        )
-        create_audit_event(
-            document_id=str(document.get("id") or ""),
-            action="workflow_notification_created",
-            actor=actor,
-            details=f"rule={rule_name} event={trigger_event} type={notif_type}",
+            document_id=document_id,
             workspace_id=workspace_id,
         )
+        if document_id:
+            create_audit_event(
+                document_id=document_id,
+                action="workflow_notification_created",
+                actor=actor,
+                details=f"rule={rule_name} event={trigger_event} type={notif_type}",
+                workspace_id=workspace_id,
+            )
     except Exception:
         logger.debug("Workflow notification failed (non-blocking)", exc_info=True)
 
@@ -407,21 +418,23 @@ def _action_transition(
     if notes is not None and str(notes).strip():
         updates["reviewer_notes"] = str(notes).strip()
 
-    updated = update_document(
-        document_id,
-        updates=updates,
-        workspace_id=workspace_id,
-    )
+    with transaction():
+        updated = update_document(
+            document_id,
+            updates=updates,
+            workspace_id=workspace_id,
+        )
+        if updated:
+            create_audit_event(
+                document_id=document_id,
+                action="workflow_transition",
+                actor=actor,
+                details=f"rule={rule_name} from={current} to={target}",
+                workspace_id=workspace_id,
+            )
     if not updated:
         return
 
-    create_audit_event(
-        document_id=document_id,
-        action="workflow_transition",
-        actor=actor,
-        details=f"rule={rule_name} from={current} to={target}",
-        workspace_id=workspace_id,
-    )
     try:
         create_notification(
             type="status_change",
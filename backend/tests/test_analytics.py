@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import pytest
+
+
+def _add_document(repository, doc_id: str, *, status: str, fields) -> None:
+    repository.create_document(
+        document={
+            "id": doc_id,
+            "filename": f"{doc_id}.txt",
+            "storage_path": f"/tmp/{doc_id}.txt",
+            "status": status,
+            "extracted_fields": fields,
+        }
+    )
+
+
+@pytest.fixture()
+def contact_documents(isolated_repo):
+    _add_document(
+        isolated_repo, "has-email", status="ingested", fields={"email": "a@b.org"}
+    )
+    _add_document(
+        isolated_repo,
+        "has-sender",
+        status="needs_review",
+        fields={"applicant_email": "  ", "sender_email": "s@b.org"},
+    )
+    _add_document(
+        isolated_repo, "blank", status="assigned", fields={"contact_email": " \t"}
+    )
+    _add_document(
+        isolated_repo, "null", status="failed", fields={"applicant_email": None}
+    )
+    _add_document(isolated_repo, "empty", status="in_progress", fields={})
+    _add_document(isolated_repo, "closed", status="approved", fields={})
+    with isolated_repo.get_connection() as connection:
+        connection.execute(
+            "UPDATE documents SET extracted_fields = 'not json' WHERE id = 'empty'"
+        )
+    return isolated_repo
+
+
+@pytest.mark.parametrize("use_json1", [True, False])
+def test_missing_contact_email_counts_open_documents(
+    contact_documents, monkeypatch, use_json1
+) -> None:
+    if use_json1 and not contact_documents.SUPPORTS_JSON1:
+        pytest.skip("SQLite build lacks JSON1")
+    monkeypatch.setattr(contact_documents, "SUPPORTS_JSON1", use_json1)
+
+    analytics = contact_documents.get_analytics_snapshot()
+
+    assert analytics["total_documents"] == 6
+    assert analytics["missing_contact_email"] == 3
+
+
+def test_analytics_snapshot_scalar_aggregates(isolated_repo) -> None:
+    _add_document(isolated_repo, "late", status="assigned", fields={})
+    _add_document(isolated_repo, "done", status="approved", fields={})
+    _add_document(isolated_repo, "fresh", status="ingested", fields={})
+    isolated_repo.update_document(
+        "late", updates={"due_date": "2000-01-01T00:00:00", "assigned_to": "clerk"}
+    )
+    isolated_repo.update_document("done", updates={"due_date": "2000-01-01T00:00:00"})
+
+    analytics = isolated_repo.get_analytics_snapshot()
+
+    assert analytics["total_documents"] == 3
+    assert analytics["overdue"] == 1
+    assert analytics["manual_unassigned"] == 1
+    assert analytics["automated_documents"] == 1
+    assert {row["label"]: row["count"] for row in analytics["by_status"]} == {
+        "approved": 1,
+        "assigned": 1,
+        "ingested": 1,
+    }
+    assert (
+        isolated_repo.get_analytics_snapshot(workspace_id="other")["total_documents"]
+        == 0
+    )
+
+
+def test_dashboard_snapshots_are_cached_until_a_document_write(
+    isolated_repo, monkeypatch
+) -> None:
+    monkeypatch.setattr(isolated_repo, "ANALYTICS_CACHE_TTL_SECONDS", 30)
+    _add_document(isolated_repo, "first", status="ingested", fields={})
+    assert isolated_repo.get_analytics_snapshot()["total_documents"] == 1
+    assert isolated_repo.get_queue_snapshot()[0]["total"] == 1
+
+    # A write that bypasses the repository is not seen until the cache drops.
+    with isolated_repo.get_connection() as connection:
+        connection.execute(
+            "UPDATE documents SET id = 'renamed', status = 'approved' WHERE id = 'first'"
+        )
+    assert isolated_repo.get_analytics_snapshot()["routed_or_approved"] == 0
+
+    _add_document(isolated_repo, "second", status="ingested", fields={})
+    analytics = isolated_repo.get_analytics_snapshot()
+    assert analytics["total_documents"] == 2
+    assert analytics["routed_or_approved"] == 1
+    assert isolated_repo.get_queue_snapshot()[0]["total"] == 2
+
+    monkeypatch.setattr(isolated_repo, "ANALYTICS_CACHE_TTL_SECONDS", 0)
+    with isolated_repo.get_connection() as connection:
+        connection.execute("UPDATE documents SET status = 'approved'")
+    assert isolated_repo.get_analytics_snapshot()["routed_or_approved"] == 2
+
+
+def test_snapshot_read_during_a_transaction_is_dropped_at_commit(
+    isolated_db, isolated_repo, monkeypatch
+) -> None:
+    import threading
+
+    monkeypatch.setattr(isolated_repo, "ANALYTICS_CACHE_TTL_SECONDS", 30)
+    _add_document(isolated_repo, "first", status="ingested", fields={})
+
+    def read_from_another_request() -> None:
+        try:
+            seen.append(isolated_repo.get_queue_snapshot()[0]["total"])
+        finally:
+            isolated_db.close_thread_connection()
+
+    seen: list[int] = []
+    with isolated_db.transaction():
+        _add_document(isolated_repo, "second", status="ingested", fields={})
+        reader = threading.Thread(target=read_from_another_request)
+        reader.start()
+        reader.join()
+    # The reader cached the pre-commit count; the commit must discard it.
+    assert seen == [1]
+    assert isolated_repo.get_queue_snapshot()[0]["total"] == 2
+
+
+@pytest.mark.parametrize(
+    ("fields", "expected"),
+    [
+        ({"applicant_email": "a@b.org"}, True),
+        ({"applicant_email": " \n", "email": "x@y.org"}, True),
+        ({"contact_email": None, "sender_email": ""}, False),
+        ({"email": 12345}, True),
+        ({}, False),
+        (["email"], False),
+    ],
+)
+def test_has_contact_email(isolated_repo, fields, expected) -> None:
+    assert isolated_repo._has_contact_email(fields) is expected
+
+
+def test_analytics_breakdowns_share_one_statement(isolated_repo) -> None:
+    for doc_id, status in (("a", "ingested"), ("b", "ingested"), ("c", "routed")):
+        _add_document(isolated_repo, doc_id, status=status, fields={})
+    isolated_repo.update_document("c", updates={"doc_type": "permit"})
+
+    analytics = isolated_repo.get_analytics_snapshot()
+
+    assert analytics["by_type"] == [
+        {"label": "unclassified", "count": 2},
+        {"label": "permit", "count": 1},
+    ]
+    assert analytics["by_status"] == [
+        {"label": "ingested", "count": 2},
+        {"label": "routed", "count": 1},
+    ]
+    assert isolated_repo.get_analytics_snapshot(workspace_id="other")["by_type"] == []
+
+
+def test_cached_snapshots_are_copied_for_each_caller(
+    isolated_repo, monkeypatch
+) -> None:
+    monkeypatch.setattr(isolated_repo, "ANALYTICS_CACHE_TTL_SECONDS", 30)
+    _add_document(isolated_repo, "only", status="ingested", fields={})
+
+    analytics = isolated_repo.get_analytics_snapshot()
+    analytics["by_status"][0]["count"] = 99
+    analytics["by_type"].clear()
+    queues = isolated_repo.get_queue_snapshot()
+    queues[0]["total"] = 99
+
+    again = isolated_repo.get_analytics_snapshot()
+    assert again["by_status"] == [{"label": "ingested", "count": 1}]
+    assert again["by_type"] == [{"label": "unclassified", "count": 1}]
+    assert isolated_repo.get_queue_snapshot()[0]["total"] == 1
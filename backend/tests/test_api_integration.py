@@ -220,6 +220,49 @@ def test_audit_trail_for_document(client):
     assert "items" in data
 
 
+def test_bulk_approve_and_assign_documents(client, tmp_path):
+    doc_ids = []
+    for name in ("one.txt", "two.txt"):
+        resp = client.post(
+            "/api/documents/upload",
+            files={"file": (name, b"Some test content", "text/plain")},
+            data={"source_channel": "test", "process_async": "false"},
+        )
+        doc_ids.append(resp.json()["id"])
+
+    resp = client.post(
+        "/api/documents/bulk",
+        json={"action": "approve", "document_ids": [*doc_ids, "missing"]},
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "success_count": 2,
+        "error_count": 1,
+        "errors": ["missing: not found"],
+    }
+    for doc_id in doc_ids:
+        doc = client.get(f"/api/documents/{doc_id}").json()
+        assert doc["status"] == "approved"
+        assert doc["requires_review"] is False
+        audit = client.get(f"/api/documents/{doc_id}/audit").json()["items"]
+        assert "bulk_approved" in {event["action"] for event in audit}
+        assert (tmp_path / "approved" / f"{doc_id}.meta.json").exists()
+
+    resp = client.post(
+        "/api/documents/bulk",
+        json={
+            "action": "assign",
+            "document_ids": doc_ids,
+            "params": {"user_id": "clerk"},
+        },
+    )
+    assert resp.json()["success_count"] == 2
+    assert {
+        client.get(f"/api/documents/{doc_id}").json()["assigned_to"]
+        for doc_id in doc_ids
+    } == {"clerk"}
+
+
 def test_request_id_header(client):
     resp = client.get("/health")
     assert "x-request-id" in resp.headers
@@ -327,3 +370,111 @@ def test_signup_failure_keeps_invitation_usable(client):
         },
     )
     assert retry_resp.status_code == 200
+
+
+def test_row_backed_list_responses_are_validated_on_output(client):
+    upload_resp = client.post(
+        "/api/documents/upload",
+        files={"file": ("doc.txt", b"Some test content", "text/plain")},
+        data={"source_channel": "test", "process_async": "false"},
+    )
+    doc_id = upload_resp.json()["id"]
+    client.post(
+        f"/api/documents/{doc_id}/assign",
+        json={"user_id": "clerk", "actor": "test_reviewer"},
+    )
+
+    [listed] = client.get("/api/documents").json()["items"]
+    assert listed["id"] == doc_id
+    assert listed["assigned_to"] == "clerk"
+    assert listed["extracted_text"] is None
+    assert listed["extracted_fields"] == upload_resp.json()["extracted_fields"]
+
+    notifications = client.get("/api/notifications").json()["items"]
+    assert notifications and all(n["is_read"] is False for n in notifications)
+    actions = [
+        e["action"]
+        for e in client.get(f"/api/documents/{doc_id}/audit").json()["items"]
+    ]
+    assert "assigned" in actions
+
+
+def test_row_records_share_fields_set_and_are_frozen():
+    import pydantic
+
+    from app.schemas import AuditEvent
+
+    base = {"document_id": "d", "action": "a", "actor": "t", "created_at": "now"}
+    first, second, third = AuditEvent.from_rows(
+        [{"id": 1, **base}, {"id": 2, **base}, {"id": 3, **base, "details": "x"}]
+    )
+
+    assert first.model_fields_set is second.model_fields_set
+    assert "details" not in first.model_fields_set
+    assert "details" in third.model_fields_set
+    assert first.model_dump(exclude_unset=True) == {"id": 1, **base}
+    with pytest.raises(pydantic.ValidationError):
+        first.action = "changed"
+
+
+def test_json_bodies_are_parsed_with_orjson(client):
+    from app import main
+
+    route = next(
+        r for r in main.app.routes if getattr(r, "path", "") == "/api/documents/bulk"
+    )
+    assert isinstance(route, main._OrjsonRoute)
+
+    resp = client.post(
+        "/api/documents/bulk",
+        content=b'{"action": "approve", "document_ids": [',
+        headers={"content-type": "application/json"},
+    )
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["type"] == "json_invalid"
+
+    resp = client.post(
+        "/api/documents/bulk",
+        json={"action": "approve", "document_ids": ["missing"]},
+    )
+    assert resp.status_code == 200
+
+
+def test_database_import_rolls_back_and_cleans_up_when_audit_fails(
+    client, tmp_path, monkeypatch
+):
+    import sqlite3
+
+    from app import main as main_module
+
+    source = tmp_path / "source.db"
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE files (filename TEXT, content TEXT)")
+        connection.executemany(
+            "INSERT INTO files VALUES (?, ?)",
+            [("a.txt", "Building Permit A"), ("b.txt", "Building Permit B")],
+        )
+    connection.close()
+
+    def failing_audit(**kwargs):
+        raise RuntimeError("audit store down")
+
+    monkeypatch.setattr(main_module, "create_audit_events_bulk", failing_audit)
+    resp = client.post(
+        "/api/documents/import/database",
+        json={
+            "database_url": str(source),
+            "query": "SELECT filename, content FROM files",
+            "content_type_column": None,
+        },
+    )
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["imported_count"] == 0
+    assert data["errors"] == [
+        "Row 1: audit store down",
+        "Row 2: audit store down",
+    ]
+    assert client.get("/api/documents").json()["items"] == []
+    assert list((tmp_path / "uploads").iterdir()) == []
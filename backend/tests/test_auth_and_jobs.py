@@ -3,6 +3,7 @@ from __future__ import annotations
 import time
 
 import pytest
+from fastapi import HTTPException
 from starlette.requests import Request
 
 
@@ -107,3 +108,79 @@ def test_durable_job_worker_processes_document(isolated_modules) -> None:
         assert updated_doc["status"] in {"routed", "needs_review"}
     finally:
         jobs.stop_job_worker()
+
+
+def test_job_claim_and_retry_lifecycle(isolated_modules) -> None:
+    repository = isolated_modules["repository"]
+
+    created = repository.create_job(
+        job_type="process_document", payload={"doc": "a"}, actor="t", max_attempts=2
+    )
+    assert created == repository.get_job(created["id"])
+
+    claimed = repository.claim_next_job(worker_id="w1")
+    assert claimed["id"] == created["id"]
+    assert claimed["status"] == "running" and claimed["attempts"] == 1
+    assert repository.claim_next_job(worker_id="w2") is None
+
+    retried = repository.fail_job(job_id=created["id"], error="boom")
+    assert retried["status"] == "queued"
+    assert retried["started_at"] is None and retried["finished_at"] is None
+
+    repository.claim_job_by_id(job_id=created["id"], worker_id="w1")
+    failed = repository.fail_job(job_id=created["id"], error="boom again")
+    assert failed["status"] == "failed" and failed["finished_at"]
+    assert repository.complete_job(job_id="missing", result={}) is None
+
+
+def test_concurrent_workers_never_claim_the_same_job(isolated_modules) -> None:
+    import threading
+
+    db = isolated_modules["db"]
+    repository = isolated_modules["repository"]
+    job_ids = {
+        repository.create_job(job_type="noop", payload={}, actor="t")["id"]
+        for _ in range(20)
+    }
+    claimed: list[str] = []
+    lock = threading.Lock()
+
+    def worker(name: str) -> None:
+        try:
+            while True:
+                job = repository.claim_next_job(worker_id=name)
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job["id"])
+        finally:
+            db.close_thread_connection()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_api_key_hash_format_is_stable(isolated_modules) -> None:
+    auth = isolated_modules["auth"]
+    repository = isolated_modules["repository"]
+
+    # Stored key hashes are plain SHA-256 hex; changing this locks out every key.
+    assert repository.hash_secret("cs_example") == (
+        "6185e4f07fecba825b5ab94c247e7900d38b81ce48f4185d2dffcc9455b96c93"
+    )
+
+    record, plain_key = repository.create_api_key(name="ci", actor="t")
+    identity = auth._authenticate_from_api_key(plain_key)
+    assert identity["actor"] == "ci"
+    revoked = repository.revoke_api_key(key_id=record["id"])
+    assert revoked["status"] == "revoked" and "key_hash" not in revoked
+    # Revoking again reports the stored row rather than None.
+    assert repository.revoke_api_key(key_id=record["id"]) == revoked
+    assert repository.revoke_api_key(key_id=10_000) is None
+    with pytest.raises(HTTPException):
+        auth._authenticate_from_api_key(plain_key)
@@ -2,9 +2,14 @@
 
 from __future__ import annotations
 
+import hashlib
+import hmac
+import json
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
 
@@ -40,6 +45,16 @@ def client(tmp_path, monkeypatch):
     return TestClient(app, raise_server_exceptions=False, headers={"host": "localhost"})
 
 
+@pytest.fixture(autouse=True)
+def _fresh_stripe_module():
+    """Some tests patch a fake stripe into sys.modules; don't let it stick."""
+    from app import stripe_billing
+
+    stripe_billing._stripe_module.cache_clear()
+    yield
+    stripe_billing._stripe_module.cache_clear()
+
+
 def _make_user(repo, email, role="operator", plan_tier="free"):
     """Helper: create a user and return the dict (including generated id)."""
     return repo.create_user(
@@ -356,7 +371,7 @@ def test_create_payment_event_idempotent(isolated_db, isolated_repo):
     user = _make_user(isolated_repo, "pay@example.com")
     uid = user["id"]
 
-    repository.create_payment_event(
+    first = repository.create_payment_event(
         user_id=uid,
         stripe_event_id="evt_unique_1",
         event_type="checkout.session.completed",
@@ -366,17 +381,15 @@ def test_create_payment_event_idempotent(isolated_db, isolated_repo):
         raw_payload='{"test": true}',
     )
 
-    # Second insert with same stripe_event_id should not raise
-    try:
-        repository.create_payment_event(
-            user_id=uid,
-            stripe_event_id="evt_unique_1",
-            event_type="checkout.session.completed",
-            amount_cents=2900,
-            raw_payload='{"test": true}',
-        )
-    except Exception:
-        pass  # Idempotent — expected to fail silently or raise
+    # Second insert with same stripe_event_id returns the stored row.
+    second = repository.create_payment_event(
+        user_id=uid,
+        stripe_event_id="evt_unique_1",
+        event_type="checkout.session.completed",
+        amount_cents=2900,
+        raw_payload='{"test": true}',
+    )
+    assert second == first
 
 
 def test_update_user_plan(isolated_db, isolated_repo):
@@ -410,6 +423,31 @@ def test_get_user_by_stripe_customer(isolated_db, isolated_repo):
     assert not_found is None
 
 
+def test_get_billing_principals_by_customer(isolated_db, isolated_repo):
+    """One call returns both the workspace and the user for a customer."""
+    from app import repository
+
+    user = _make_user(isolated_repo, "principals@example.com")
+    workspace = repository.create_workspace(name="Billed", owner_id=user["id"])
+    repository.update_user_plan(
+        user["id"], plan_tier="pro", stripe_customer_id="cus_both"
+    )
+    repository.update_workspace_plan(
+        workspace["id"], plan_tier="pro", stripe_customer_id="cus_both"
+    )
+
+    found_workspace, found_user = repository.get_billing_principals_by_customer(
+        "cus_both"
+    )
+    assert found_workspace["id"] == workspace["id"]
+    assert found_user["id"] == user["id"]
+    assert "password_hash" not in found_user
+    assert repository.get_billing_principals_by_customer("cus_missing") == (
+        None,
+        None,
+    )
+
+
 def test_count_user_documents_this_month(isolated_db, isolated_repo):
     """Document count should reflect current month's documents."""
     from app import repository
@@ -453,6 +491,17 @@ def test_get_plan_info_structure():
         assert isinstance(plan["features"], list)
 
 
+def test_get_plan_info_returns_independent_copies():
+    from app.stripe_billing import get_plan_info
+
+    plans = get_plan_info()
+    plans[0]["features"].append("mutated")
+    plans[1]["name"] = "mutated"
+
+    assert get_plan_info()[0]["features"][-1] != "mutated"
+    assert get_plan_info()[1]["name"] == "Pro"
+
+
 def test_stripe_not_enabled_raises(monkeypatch):
     """_get_stripe should raise 400 when Stripe is disabled."""
     from app import stripe_billing
@@ -622,6 +671,185 @@ def test_handle_invoice_failed_sets_past_due(isolated_db, isolated_repo, monkeyp
     assert sub["status"] == "past_due"
 
 
+def _signed_webhook(event: dict, secret: str) -> tuple[bytes, str]:
+    payload = json.dumps(event).encode("utf-8")
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode("utf-8"), f"{timestamp}.".encode() + payload, hashlib.sha256
+    ).hexdigest()
+    return payload, f"t={timestamp},v1={signature}"
+
+
+def test_webhook_is_queued_once_and_applied_by_the_worker(
+    isolated_db, isolated_repo, monkeypatch
+):
+    """Webhooks are acknowledged after queueing; the job applies the event."""
+    from app import account_emails, jobs, repository, stripe_billing
+
+    monkeypatch.setattr(stripe_billing, "STRIPE_ENABLED", True)
+    monkeypatch.setattr(stripe_billing, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    monkeypatch.setattr(stripe_billing, "WORKER_ENABLED", True)
+    user = _make_user(isolated_repo, "queued@example.com", plan_tier="free")
+    event = {
+        "id": "evt_queued",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {
+            "object": {
+                "object": "checkout.session",
+                "metadata": {"user_id": user["id"], "plan_tier": "pro"},
+                "customer": "cus_queued",
+                "amount_total": 2900,
+            }
+        },
+    }
+    payload, signature = _signed_webhook(event, "whsec_test")
+
+    for _ in range(2):
+        assert stripe_billing.handle_webhook_event(payload, signature) == {
+            "received": True,
+            "type": "checkout.session.completed",
+        }
+
+    [job] = repository.list_jobs(status="queued")
+    assert job["id"] == "stripe:evt_queued"
+    # The jobs API serves payloads; the billing body is kept elsewhere.
+    assert job["payload"] == {
+        "event_id": "evt_queued",
+        "event_type": "checkout.session.completed",
+    }
+    assert repository.get_user_by_id(user["id"])["plan_tier"] == "free"
+
+    jobs._handle_stripe_webhook_job(job["payload"])
+    assert repository.get_user_by_id(user["id"])["plan_tier"] == "pro"
+    assert repository.get_stripe_webhook_payload("evt_queued") is None
+    with isolated_db.get_connection() as connection:
+        stored = connection.execute(
+            "SELECT raw_payload FROM payment_events WHERE stripe_event_id = ?",
+            ("evt_queued",),
+        ).fetchone()
+    assert stored["raw_payload"] == payload.decode("utf-8")
+
+    # The upgrade email is its own job, and reprocessing the event reuses it.
+    stripe_billing.process_webhook_event(payload.decode("utf-8"))
+    [email_job] = [
+        queued
+        for queued in repository.list_jobs(status="queued")
+        if queued["job_type"] == "account_email"
+    ]
+    assert email_job["id"] == "email:plan_upgrade:evt_queued"
+    # Only ids are queued; the address is looked up when the job runs.
+    assert email_job["payload"] == {
+        "kind": "plan_upgrade",
+        "event_id": "evt_queued",
+        "user_id": user["id"],
+        "workspace_id": email_job["workspace_id"],
+    }
+
+    sent = []
+    monkeypatch.setitem(
+        account_emails._QUEUED_EMAIL_SENDERS,
+        "plan_upgrade",
+        lambda **fields: sent.append(fields) or True,
+    )
+    assert jobs._handle_account_email_job(email_job["payload"]) == {
+        "kind": "plan_upgrade",
+        "sent": True,
+    }
+    assert sent[0]["plan_tier"] == "pro"
+    assert sent[0]["user_email"] == "queued@example.com"
+
+    with pytest.raises(HTTPException, match="signature"):
+        stripe_billing.handle_webhook_event(payload, signature.replace("v1=", "v1=0"))
+
+
+def test_redelivered_webhook_requeues_a_dead_job(
+    isolated_db, isolated_repo, monkeypatch
+):
+    """A job that used up its attempts is retried when Stripe redelivers."""
+    from app import jobs, repository, stripe_billing
+
+    monkeypatch.setattr(stripe_billing, "STRIPE_ENABLED", True)
+    monkeypatch.setattr(stripe_billing, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    monkeypatch.setattr(stripe_billing, "WORKER_ENABLED", True)
+    published: list[str] = []
+    monkeypatch.setattr(jobs, "_publish_job", lambda job: published.append(job["id"]))
+    event = {"id": "evt_dead", "object": "event", "type": "invoice.paid"}
+    payload, signature = _signed_webhook(event, "whsec_test")
+
+    stripe_billing.handle_webhook_event(payload, signature)
+    job = repository.claim_next_job(worker_id="w1")
+    assert job["id"] == "stripe:evt_dead"
+    repository.fail_job(job_id=job["id"], error="boom")
+    for _ in range(job["max_attempts"] - 1):
+        repository.claim_job_by_id(job_id=job["id"], worker_id="w1")
+        repository.fail_job(job_id=job["id"], error="boom")
+    assert repository.get_job(job["id"])["status"] == "failed"
+
+    stripe_billing.handle_webhook_event(payload, signature)
+    revived = repository.get_job(job["id"])
+    assert (revived["status"], revived["attempts"], revived["error"]) == (
+        "queued",
+        0,
+        None,
+    )
+    assert published == ["stripe:evt_dead", "stripe:evt_dead"]
+    assert repository.get_stripe_webhook_payload("evt_dead") == payload.decode()
+
+
+def test_redelivered_webhook_after_completion_stores_no_body(
+    isolated_db, isolated_repo, monkeypatch
+):
+    """A redelivery of an applied event leaves nothing behind to clean up."""
+    from app import jobs, repository, stripe_billing
+
+    monkeypatch.setattr(stripe_billing, "STRIPE_ENABLED", True)
+    monkeypatch.setattr(stripe_billing, "STRIPE_WEBHOOK_SECRET", "whsec_test")
+    monkeypatch.setattr(stripe_billing, "WORKER_ENABLED", True)
+    published: list[str] = []
+    monkeypatch.setattr(jobs, "_publish_job", lambda job: published.append(job["id"]))
+    event = {
+        "id": "evt_done",
+        "object": "event",
+        "type": "invoice.paid",
+        "data": {"object": {"object": "invoice", "customer": "cus_none"}},
+    }
+    payload, signature = _signed_webhook(event, "whsec_test")
+
+    stripe_billing.handle_webhook_event(payload, signature)
+    job = repository.claim_next_job(worker_id="w1")
+    result = jobs._handle_stripe_webhook_job(job["payload"])
+    repository.complete_job(job_id=job["id"], result=result)
+    assert repository.get_stripe_webhook_payload("evt_done") is None
+
+    stripe_billing.handle_webhook_event(payload, signature)
+    assert repository.get_job(job["id"])["status"] == "completed"
+    assert repository.get_stripe_webhook_payload("evt_done") is None
+    assert published == ["stripe:evt_done"]
+
+
+def test_webhook_handler_writes_commit_together(
+    isolated_db, isolated_repo, monkeypatch
+):
+    """A failed payment-event write rolls back the plan and subscription."""
+    from app import repository, stripe_billing
+
+    user = _make_user(isolated_repo, "atomic@example.com", plan_tier="free")
+
+    def fail(**kwargs):
+        raise RuntimeError("payment_events unavailable")
+
+    monkeypatch.setattr(stripe_billing, "create_payment_event", fail)
+    with pytest.raises(RuntimeError):
+        stripe_billing._handle_checkout_completed(
+            "evt_atomic",
+            {"metadata": {"user_id": user["id"]}, "customer": "cus_atomic"},
+        )
+
+    assert repository.get_user_by_id(user["id"])["plan_tier"] == "free"
+    assert repository.get_active_subscription(user["id"]) is None
+
+
 # ─── Billing API endpoints ───────────────────────────────────────────
 
 
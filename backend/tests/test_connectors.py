@@ -181,6 +181,46 @@ def test_import_handles_download_failure(isolated_connector_env, monkeypatch):
     assert "Network timeout" in result["errors"][0]
 
 
+def test_import_rolls_back_document_when_audit_fails(
+    isolated_connector_env, monkeypatch
+):
+    """A failed audit write must not leave a half-imported document behind."""
+    from app import repository
+    from app.connectors import importer as importer_mod
+    from app.connectors.base import ExternalDocument
+
+    doc = ExternalDocument(
+        external_id="ext-atomic-001",
+        filename="atomic.txt",
+        content_type="text/plain",
+        download_url="https://example.com/atomic.txt",
+        size_bytes=5,
+        metadata={},
+    )
+
+    class MockConnector:
+        def list_documents(self, config, limit=50):
+            return [doc]
+
+        def download_document(self, config, doc):
+            return doc.filename, b"hello", doc.content_type
+
+    def failing_audit(**kwargs):
+        raise RuntimeError("audit store down")
+
+    monkeypatch.setattr(importer_mod, "get_connector", lambda name: MockConnector())
+    monkeypatch.setattr(repository, "create_audit_event", failing_audit)
+
+    result = importer_mod.import_from_connector(
+        connector_type="mock_atomic", config={}, process_async=False, actor="test"
+    )
+
+    assert result["imported_count"] == 0
+    assert result["failed_count"] == 1
+    assert repository.list_documents() == []
+    assert importer_mod.get_sync_count("mock_atomic") == 0
+
+
 def test_connector_config_api(isolated_connector_env, monkeypatch):
     """Test saving and retrieving connector config via API."""
     from fastapi.testclient import TestClient
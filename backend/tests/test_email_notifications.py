@@ -271,3 +271,43 @@ def test_assignment_opt_out_preference_suppresses_email(auth_client, monkeypatch
         ).fetchone()
 
     assert row is None
+
+
+def test_queued_account_email_raises_when_send_fails(auth_client, monkeypatch):
+    from app import account_emails, repository
+    from app.db import get_connection
+
+    user = repository.create_user(
+        email="retry@example.com", full_name=None, password_hash="x", role="viewer"
+    )
+    repository.create_payment_event(
+        user_id=user["id"],
+        stripe_event_id="evt_retry",
+        event_type="invoice.paid",
+        amount_cents=2900,
+    )
+    ids = {"event_id": "evt_retry", "user_id": user["id"]}
+    monkeypatch.setattr(account_emails, "EMAIL_ENABLED", False)
+    assert account_emails.send_queued_account_email("payment_receipt", **ids) is False
+
+    monkeypatch.setattr(account_emails, "EMAIL_ENABLED", True)
+    monkeypatch.setattr(account_emails, "email_configured", lambda: True)
+    monkeypatch.setattr(
+        account_emails, "send_email", MagicMock(side_effect=OSError("smtp down"))
+    )
+
+    # Direct callers keep the best-effort behaviour; the job is retried.
+    assert account_emails.send_plan_upgrade_email("retry@example.com", "pro") is False
+    with pytest.raises(OSError, match="smtp down"):
+        account_emails.send_queued_account_email("payment_receipt", **ids)
+
+    with get_connection() as connection:
+        rows = connection.execute(
+            "SELECT status, error FROM outbound_emails WHERE to_email = ?",
+            ("retry@example.com",),
+        ).fetchall()
+
+    assert [(row["status"], row["error"]) for row in rows] == [
+        ("failed", "smtp down"),
+        ("failed", "smtp down"),
+    ]
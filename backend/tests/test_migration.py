@@ -186,3 +186,290 @@ def test_connector_sync_log_compound_unique(sqlite_db):
             "VALUES ('jira', 'ext-1', 'file2.txt', 'doc-2', '2026-01-02')"
         )
     conn.close()
+
+
+def test_sqlite_connection_reused_within_thread(sqlite_db):
+    """Repository calls on one thread share a cached SQLite connection."""
+    from app import db
+
+    with db.get_connection() as first:
+        with db.get_connection() as nested:
+            assert nested is first
+    with db.get_connection() as again:
+        assert again is first
+        row = again.execute("PRAGMA synchronous").fetchone()
+    # 1 == NORMAL
+    assert row[0] == 1
+
+
+def test_nested_connection_rolls_back_with_outer_block(sqlite_db):
+    """A nested block must not commit work the outer block later rolls back."""
+    from app import db
+
+    with pytest.raises(RuntimeError):
+        with db.get_connection():
+            with db.get_connection() as inner:
+                inner.execute(
+                    "INSERT INTO connector_sync_log (connector_type, external_id, created_at) "
+                    "VALUES ('jira', 'nested-1', '2026-01-01')"
+                )
+            raise RuntimeError("abort outer")
+
+    conn = sqlite3.connect(str(sqlite_db))
+    row = conn.execute(
+        "SELECT COUNT(*) FROM connector_sync_log WHERE external_id = 'nested-1'"
+    ).fetchone()
+    conn.close()
+    assert row[0] == 0
+
+
+def test_bulk_document_and_audit_inserts(sqlite_db):
+    """Bulk helpers insert every row and resolve audit workspaces from documents."""
+    from app import repository
+
+    owner = repository.create_user(
+        email="bulk@example.com", full_name=None, password_hash="x", role="admin"
+    )
+    workspace = repository.create_workspace(name="Bulk", owner_id=owner["id"])
+    created = repository.create_documents_bulk(
+        documents=[
+            {
+                "id": f"bulk-{i}",
+                "workspace_id": workspace["id"],
+                "filename": f"bulk-{i}.txt",
+                "storage_path": f"/tmp/bulk-{i}.txt",
+                "source_channel": "database_import",
+                "content_type": "text/plain",
+                "status": "ingested",
+            }
+            for i in range(3)
+        ]
+    )
+    assert [doc["id"] for doc in created] == ["bulk-0", "bulk-1", "bulk-2"]
+    assert created[0]["requires_review"] is False
+
+    repository.create_audit_events_bulk(
+        events=[
+            {"document_id": "bulk-1", "action": "database_imported", "actor": "t"},
+            {"document_id": "bulk-2", "action": "database_imported", "actor": "t"},
+        ]
+    )
+
+    stored = repository.get_document("bulk-1")
+    assert stored is not None and stored["filename"] == "bulk-1.txt"
+    conn = sqlite3.connect(str(sqlite_db))
+    rows = conn.execute(
+        "SELECT document_id, workspace_id FROM audit_events ORDER BY document_id"
+    ).fetchall()
+    conn.close()
+    assert rows == [("bulk-1", workspace["id"]), ("bulk-2", workspace["id"])]
+
+
+def test_document_listings_use_ordered_indexes(sqlite_db):
+    """list_documents filters are served by index seeks, not scan + sort."""
+    conn = sqlite3.connect(str(sqlite_db))
+    plans = {
+        query: " ".join(
+            row[3]
+            for row in conn.execute(
+                f"EXPLAIN QUERY PLAN {query}", (1,) * query.count("?")
+            )
+        )
+        for query in (
+            "SELECT * FROM documents WHERE assigned_to = ? ORDER BY updated_at DESC LIMIT ?",
+            "SELECT * FROM documents ORDER BY updated_at DESC LIMIT ?",
+        )
+    }
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone()
+    conn.close()
+
+    for plan in plans.values():
+        assert "USING INDEX" in plan
+        assert "TEMP B-TREE" not in plan
+    assert has_stats is not None
+
+
+def test_queue_and_purge_queries_use_indexes(sqlite_db):
+    """Manual queue, queue snapshot and retention purges avoid table scans."""
+    from app import repository
+
+    conn = sqlite3.connect(str(sqlite_db))
+
+    def plan(query: str) -> str:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", (1,) * query.count("?"))
+        return " ".join(row[3] for row in rows)
+
+    try:
+        assert "idx_documents_unassigned_status" in plan(
+            repository._COUNT_UNASSIGNED_MANUAL_SQL[False]
+        )
+        assert "COVERING INDEX idx_documents_department_status" in plan(
+            "SELECT COALESCE(department, 'Unassigned'), COUNT(*), "
+            "SUM(CASE WHEN status = 'needs_review' THEN 1 ELSE 0 END) "
+            "FROM documents GROUP BY COALESCE(department, 'Unassigned')"
+        )
+        for table in ("audit_events", "notifications", "outbound_emails"):
+            assert "USING" in plan(f"DELETE FROM {table} WHERE created_at < ?")
+    finally:
+        conn.close()
+
+
+def test_plan_limit_counts_use_covering_indexes(sqlite_db):
+    """Monthly document counts for plan limits are index-only range scans."""
+    conn = sqlite3.connect(str(sqlite_db))
+    try:
+        for query, index in (
+            (
+                "SELECT COUNT(*) FROM documents WHERE workspace_id = ? AND created_at >= ?",
+                "idx_documents_workspace_created",
+            ),
+            (
+                "SELECT COUNT(*) FROM documents WHERE created_at >= ?",
+                "idx_documents_created",
+            ),
+        ):
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", (1,) * query.count("?"))
+            assert f"COVERING INDEX {index}" in " ".join(row[3] for row in rows)
+    finally:
+        conn.close()
+
+
+def test_unfiltered_template_listing_uses_name_index(sqlite_db):
+    """Listing every template is an ordered index walk, not a sort."""
+    from app import templates
+
+    query, _ = templates._list_templates_sql("*", False, False, False)
+    conn = sqlite3.connect(str(sqlite_db))
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", (5,))
+        details = " ".join(row[3] for row in rows)
+    finally:
+        conn.close()
+    assert "idx_templates_name" in details
+    assert "TEMP B-TREE" not in details
+
+
+def test_transaction_groups_repository_writes(sqlite_db):
+    """Writes inside transaction() commit together or not at all."""
+    from app import db, repository
+
+    with pytest.raises(RuntimeError):
+        with db.transaction() as connection:
+            assert connection.in_transaction
+            repository.create_documents_bulk(
+                documents=[
+                    {"id": "tx-1", "filename": "a.txt", "storage_path": "/tmp/a.txt"}
+                ]
+            )
+            repository.create_audit_event(
+                document_id="tx-1", action="uploaded", actor="t"
+            )
+            raise RuntimeError("abort ingest")
+    assert repository.get_document("tx-1") is None
+
+    with db.transaction():
+        repository.create_document(
+            document={"id": "tx-2", "filename": "b.txt", "storage_path": "/tmp/b.txt"}
+        )
+        repository.create_audit_event(document_id="tx-2", action="uploaded", actor="t")
+
+    conn = sqlite3.connect(str(sqlite_db))
+    rows = conn.execute("SELECT document_id FROM audit_events").fetchall()
+    conn.close()
+    assert rows == [("tx-2",)]
+
+
+def test_case_insensitive_email_lookup_uses_index(sqlite_db):
+    conn = sqlite3.connect(str(sqlite_db))
+    plan = " ".join(
+        row[3]
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM users WHERE lower(email) = lower(?)",
+            ("Admin@Example.com",),
+        )
+    )
+    conn.close()
+    assert "idx_users_email_lower" in plan
+
+
+def test_every_thread_connection_enforces_foreign_keys(sqlite_db):
+    """Connections opened off the init_db thread still enforce REFERENCES."""
+    import threading
+
+    from app import db
+
+    outcome: dict[str, object] = {}
+
+    def worker() -> None:
+        try:
+            with db.get_connection() as connection:
+                outcome["fk"] = connection.execute("PRAGMA foreign_keys").fetchone()[0]
+                outcome["mmap"] = connection.execute("PRAGMA mmap_size").fetchone()[0]
+                connection.execute(
+                    "INSERT INTO audit_events (document_id, action, actor, created_at) "
+                    "VALUES ('missing', 'noted', 'test', 'now')"
+                )
+        except sqlite3.IntegrityError as exc:
+            outcome["error"] = exc
+        finally:
+            db.close_thread_connection()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert outcome["fk"] == 1
+    assert outcome["mmap"] > 0
+    assert isinstance(outcome.get("error"), sqlite3.IntegrityError)
+
+
+def test_postgres_connection_is_reused_per_thread(monkeypatch):
+    """Repository calls on one thread share a PostgreSQL connection."""
+    import sys
+    import types
+
+    from app import db
+
+    opened: list[object] = []
+
+    class FakeConnection:
+        def __init__(self) -> None:
+            self.closed = 0
+            self.commits = 0
+            self.rollbacks = 0
+
+        def commit(self) -> None:
+            self.commits += 1
+
+        def rollback(self) -> None:
+            self.rollbacks += 1
+
+        def close(self) -> None:
+            self.closed = 1
+
+    def connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setitem(sys.modules, "psycopg2", types.SimpleNamespace(connect=connect))
+    monkeypatch.setattr(db, "DATABASE_BACKEND", "postgresql")
+    monkeypatch.setattr(db, "ensure_directories", lambda: None)
+    db.close_thread_connection()
+    try:
+        with db.get_connection():
+            pass
+        with pytest.raises(RuntimeError):
+            with db.get_connection():
+                raise RuntimeError("boom")
+        assert len(opened) == 1
+        assert (opened[0].commits, opened[0].rollbacks) == (1, 1)
+
+        opened[0].closed = 2  # Server dropped the connection.
+        with db.get_connection():
+            pass
+        assert len(opened) == 2
+    finally:
+        db.close_thread_connection()
+    assert opened[1].closed
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from unittest.mock import MagicMock
+
 from app.config import DOCUMENT_TYPE_RULES
 from app.pipeline import (
     classify_document,
@@ -28,6 +30,22 @@ def test_classifies_building_permit_with_high_confidence() -> None:
     assert meta["matched_keywords"]
 
 
+def test_classify_counts_overlapping_and_shared_keywords() -> None:
+    rules = {
+        "building_permit": {"keywords": ["building permit", "permit", "site plan"]},
+        "business_license": {"keywords": ["license", "permit"]},
+        "other": {"keywords": []},
+    }
+
+    doc_type, _, meta = classify_document(
+        "Building Permit request with a site plan", active_rules=rules
+    )
+
+    assert doc_type == "building_permit"
+    assert meta["matched_keywords"] == ["building permit", "permit", "site plan"]
+    assert classify_document("nothing relevant", active_rules=rules)[0] == "other"
+
+
 def test_validate_missing_fields() -> None:
     fields = {"applicant_name": "Jane Smith", "date": "02/03/2026"}
     missing_fields, errors = validate_document(
@@ -78,3 +96,123 @@ def test_process_document_uses_external_classification_when_available(
     assert result["department"] == "Code Enforcement"
     assert result["urgency"] == "high"
     assert result["pipeline_meta"]["classification_meta"]["provider"] == "openai"
+
+
+def test_watcher_scan_skips_already_ingested_files(isolated_db, tmp_path, monkeypatch):
+    from app import watcher
+
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    (watch_dir / "old.txt").write_text("old", encoding="utf-8")
+    (watch_dir / "new.txt").write_text("new", encoding="utf-8")
+    (watch_dir / ".hidden").write_text("skip", encoding="utf-8")
+    watcher._claim_watched_file(
+        filename="old.txt",
+        file_hash=watcher._file_hash(watch_dir / "old.txt"),
+        source_path=str(watch_dir / "old.txt"),
+        document_id="doc-old",
+    )
+
+    ingested: list[str] = []
+    folder = watcher.FolderWatcher()
+    monkeypatch.setattr(
+        folder,
+        "_ingest_file",
+        lambda path, fhash, upload_dir: ingested.append(path.name),
+    )
+    folder._scan_once(watch_dir, tmp_path / "uploads")
+
+    assert ingested == ["new.txt"]
+
+
+def test_watcher_entry_hash_matches_path_hash(tmp_path) -> None:
+    import os
+
+    from app import watcher
+
+    target = tmp_path / "real.txt"
+    target.write_text("payload", encoding="utf-8")
+    (tmp_path / "link.txt").symlink_to(target)
+
+    with os.scandir(tmp_path) as scan:
+        entries = {entry.name: entry for entry in scan}
+    for name in ("real.txt", "link.txt"):
+        assert watcher._entry_hash(entries[name], tmp_path.resolve()) == (
+            watcher._file_hash(tmp_path / name)
+        )
+
+
+def test_watcher_wakes_on_filesystem_events(isolated_db, tmp_path, monkeypatch):
+    import threading
+
+    from app import config, watcher
+
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    monkeypatch.setattr(config, "WATCH_ENABLED", True)
+    monkeypatch.setattr(config, "WATCH_DIR", str(watch_dir))
+    monkeypatch.setattr(config, "WATCH_MODE", "auto")
+    # Far longer than the test waits: only an event can trigger the scan.
+    monkeypatch.setattr(config, "WATCH_INTERVAL_SECONDS", 300)
+    monkeypatch.setattr(watcher, "_EVENT_SETTLE_SECONDS", 0.01)
+
+    # Stand in for the watchdog observer; the test fires its wake-up itself.
+    wakes: list[threading.Event] = []
+    observer = MagicMock()
+
+    def _fake_observer(watch_path, wake):
+        wakes.append(wake)
+        return observer
+
+    monkeypatch.setattr(watcher, "_start_event_observer", _fake_observer)
+
+    scanned = threading.Event()
+    ingested = threading.Event()
+    folder = watcher.FolderWatcher()
+    real_scan = folder._scan_once
+
+    def _scan(watch_path, upload_dir):
+        real_scan(watch_path, upload_dir)
+        scanned.set()
+
+    monkeypatch.setattr(folder, "_scan_once", _scan)
+    monkeypatch.setattr(
+        folder, "_ingest_file", lambda path, fhash, upload_dir: ingested.set()
+    )
+    folder.start()
+    try:
+        # The first scan of the empty folder runs before the wait.
+        assert scanned.wait(5)
+        (watch_dir / "arrived.txt").write_text("hello", encoding="utf-8")
+        assert not ingested.is_set()
+        [wake] = wakes
+        wake.set()
+        assert ingested.wait(5)
+    finally:
+        folder.stop()
+    observer.stop.assert_called_once()
+
+
+def test_watcher_ingest_streams_file_into_storage(isolated_db, tmp_path, monkeypatch):
+    from app import watcher
+    from app.storage import read_document_bytes
+
+    monkeypatch.setattr(watcher, "enqueue_document_processing", lambda **_: None)
+    source = tmp_path / "drop.txt"
+    source.write_bytes(b"Building Permit\n" * 5000)
+    upload_dir = isolated_db.UPLOAD_DIR
+    upload_dir.mkdir(parents=True, exist_ok=True)
+
+    watcher.FolderWatcher()._ingest_file(source, watcher._file_hash(source), upload_dir)
+
+    [stored] = list(upload_dir.iterdir())
+    assert read_document_bytes(stored) == source.read_bytes()
+    assert watcher._watched_hashes([watcher._file_hash(source)])
+
+    # A second ingest of the same file (another process losing the race)
+    # writes nothing and removes its stored copy.
+    watcher.FolderWatcher()._ingest_file(source, watcher._file_hash(source), upload_dir)
+    assert list(upload_dir.iterdir()) == [stored]
+    with isolated_db.get_connection() as conn:
+        count = conn.execute("SELECT COUNT(*) AS c FROM documents").fetchone()["c"]
+    assert count == 1
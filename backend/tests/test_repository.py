@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+
+def _add_document(repository, doc_id: str, **fields) -> None:
+    repository.create_document(
+        document={
+            "id": doc_id,
+            "filename": f"{doc_id}.txt",
+            "storage_path": f"/tmp/{doc_id}.txt",
+            **fields,
+        }
+    )
+
+
+def test_list_documents_filter_combinations(isolated_repo) -> None:
+    _add_document(isolated_repo, "a", status="ingested", department="Planning")
+    _add_document(isolated_repo, "b", status="routed", department="Planning")
+    _add_document(isolated_repo, "c", status="ingested", department="Clerk")
+    isolated_repo.update_document(
+        "c", updates={"assigned_to": "pat", "due_date": "2000-01-01T00:00:00"}
+    )
+
+    def ids(**filters) -> set[str]:
+        return {doc["id"] for doc in isolated_repo.list_documents(**filters)}
+
+    assert ids() == {"a", "b", "c"}
+    assert ids(status="ingested") == {"a", "c"}
+    assert ids(status="ingested", department="Planning") == {"a"}
+    assert ids(department="Clerk", assigned_to="pat") == {"c"}
+    assert ids(status="overdue") == {"c"}
+    assert ids(status="overdue", department="Planning") == set()
+    assert ids(workspace_id="elsewhere") == set()
+    assert len(isolated_repo.list_documents(limit=2)) == 2
+
+
+def test_get_document_and_job_respect_workspace_scope(isolated_repo) -> None:
+    _add_document(isolated_repo, "doc-1")
+    job = isolated_repo.create_job(job_type="noop", payload={}, actor="t")
+
+    assert isolated_repo.get_document("doc-1")["id"] == "doc-1"
+    assert isolated_repo.get_document("doc-1", workspace_id="elsewhere") is None
+    assert isolated_repo.get_job(job["id"])["id"] == job["id"]
+    assert isolated_repo.get_job(job["id"], workspace_id="elsewhere") is None
+    assert [row["id"] for row in isolated_repo.list_jobs(status="queued")] == [
+        job["id"]
+    ]
+    assert isolated_repo.list_jobs(status="queued", workspace_id="elsewhere") == []
+
+
+def test_utcnow_iso_matches_datetime_isoformat(isolated_repo) -> None:
+    from datetime import datetime, timedelta, timezone
+
+    before = datetime.now(timezone.utc)
+    stamps = [isolated_repo.utcnow_iso() for _ in range(3)]
+    after = datetime.now(timezone.utc)
+
+    for stamp in stamps:
+        parsed = datetime.fromisoformat(stamp)
+        assert len(stamp) == len("2026-01-01T00:00:00.000000+00:00")
+        assert parsed.utcoffset() == timedelta(0)
+        assert before - timedelta(seconds=1) <= parsed <= after
+    assert stamps == sorted(stamps)
+
+
+def test_batch_row_deserialization_matches_single_row(isolated_repo) -> None:
+    _add_document(
+        isolated_repo,
+        "json-doc",
+        requires_review=True,
+        extracted_fields={"email": "a@b.org"},
+        missing_fields=["address"],
+    )
+    _add_document(isolated_repo, "plain-doc")
+
+    with isolated_repo.get_connection() as connection:
+        rows = connection.execute("SELECT * FROM documents ORDER BY id").fetchall()
+
+    batched = isolated_repo._deserialize_rows(rows)
+    assert batched == [isolated_repo._deserialize_row(row) for row in rows]
+    assert batched[0]["extracted_fields"] == {"email": "a@b.org"}
+    assert batched[0]["requires_review"] is True
+    assert batched[1]["validation_errors"] == []
+    assert isolated_repo._deserialize_rows([]) == []
+
+
+def test_precomputed_document_queries_with_and_without_workspace(
+    isolated_repo,
+) -> None:
+    _add_document(isolated_repo, "late", status="needs_review")
+    _add_document(isolated_repo, "mine", status="assigned")
+    isolated_repo.update_document("late", updates={"due_date": "2000-01-01T00:00:00"})
+    isolated_repo.update_document("mine", updates={"assigned_to": "pat"})
+    isolated_repo.create_audit_event(document_id="late", action="noted", actor="t")
+
+    repo = isolated_repo
+    assert [d["id"] for d in repo.list_overdue_documents()] == ["late"]
+    assert repo.count_overdue_documents() == 1
+    assert [d["id"] for d in repo.list_assigned_to("pat")] == ["mine"]
+    assert [d["id"] for d in repo.list_unassigned_manual_documents()] == ["late"]
+    assert repo.count_unassigned_manual_documents() == 1
+    assert [e["action"] for e in repo.list_audit_events("late")] == ["noted"]
+    for listed in (repo.list_overdue_documents(), repo.list_assigned_to("pat")):
+        assert "extracted_text" not in listed[0]
+        assert "storage_path" not in listed[0]
+
+    other = "elsewhere"
+    assert repo.list_overdue_documents(workspace_id=other) == []
+    assert repo.count_overdue_documents(workspace_id=other) == 0
+    assert repo.list_assigned_to("pat", workspace_id=other) == []
+    assert repo.list_unassigned_manual_documents(workspace_id=other) == []
+    assert repo.count_unassigned_manual_documents(workspace_id=other) == 0
+    assert repo.list_audit_events("late", workspace_id=other) == []
+
+
+def test_serialize_value_dispatch(isolated_repo) -> None:
+    serialize = isolated_repo._serialize_value
+    assert serialize("extracted_fields", {"a": 1, 2: "b"}) == '{"a":1,"2":"b"}'
+    assert serialize("missing_fields", ["x"]) == '["x"]'
+    assert serialize("validation_errors", None) is None
+    assert serialize("requires_review", "yes") == 1
+    assert serialize("requires_review", None) is None
+    assert serialize("status", "ingested") == "ingested"
+    assert serialize("confidence", 0.0) == 0.0
+
+
+def test_json_settings_columns_round_trip(isolated_repo) -> None:
+    repo = isolated_repo
+    user = repo.create_user(
+        email="prefs@example.com", full_name=None, password_hash="x", role="admin"
+    )
+    assert (
+        repo.update_user_email_preferences(user["id"], {"doc_digest": False})[
+            "doc_digest"
+        ]
+        is False
+    )
+    assert repo.get_user_email_preferences(user["id"])["doc_digest"] is False
+
+    rule = repo.create_workflow_rule(
+        workspace_id=None,
+        name="Café routing",
+        trigger_event="document_ingested",
+        filters={"department": "Café Licensing"},
+        actions=[{"type": "assign", "to": "zoë"}],
+    )
+    assert rule["filters"] == {"department": "Café Licensing"}
+    updated = repo.update_workflow_rule(
+        rule["id"], workspace_id=None, actions=[{"type": "notify"}]
+    )
+    assert updated["actions"] == [{"type": "notify"}]
+    assert updated["filters"] == {"department": "Café Licensing"}
+
+
+def test_job_payloads_and_results_accept_non_string_keys(isolated_repo) -> None:
+    job = isolated_repo.create_job(
+        job_type="noop", payload={"pages": {1: "cover"}}, actor="t"
+    )
+    assert isolated_repo.get_job(job["id"])["payload"] == {"pages": {"1": "cover"}}
+    isolated_repo.complete_job(job_id=job["id"], result={2: "ok"})
+    assert isolated_repo.get_job(job["id"])["result"] == {"2": "ok"}
+
+
+def test_rows_to_dicts_matches_dict_row(isolated_repo) -> None:
+    _add_document(isolated_repo, "doc-1")
+    isolated_repo.create_audit_event(document_id="doc-1", action="a", actor="t")
+    isolated_repo.create_audit_event(document_id="doc-1", action="b", actor="t")
+    with isolated_repo.get_connection() as connection:
+        rows = connection.execute("SELECT * FROM audit_events ORDER BY id").fetchall()
+
+    assert isolated_repo._rows_to_dicts(rows) == [dict(row) for row in rows]
+    assert isolated_repo._rows_to_dicts([{"id": 1}]) == [{"id": 1}]
+    assert isolated_repo._rows_to_dicts([]) == []
+
+
+def test_outbound_email_writes_return_stored_row(isolated_repo) -> None:
+    _add_document(isolated_repo, "doc-1")
+    created = isolated_repo.create_outbound_email(
+        document_id="doc-1", to_email="a@b.org", subject="Hi", body="Body"
+    )
+    with isolated_repo.get_connection() as connection:
+        stored = connection.execute(
+            "SELECT * FROM outbound_emails WHERE id = ?", (created["id"],)
+        ).fetchone()
+    assert created == dict(stored)
+
+    updated = isolated_repo.update_outbound_email(
+        created["id"], status="sent", sent_at="2026-01-01T00:00:00+00:00"
+    )
+    assert updated == {
+        **created,
+        "status": "sent",
+        "sent_at": "2026-01-01T00:00:00+00:00",
+    }
+    assert isolated_repo.update_outbound_email(10_000, status="failed") is None
+
+
+def test_list_documents_paged_walks_keyset_pages(isolated_repo) -> None:
+    for index in range(5):
+        _add_document(
+            isolated_repo,
+            f"doc-{index}",
+            status="ingested",
+            extracted_text="long body",
+            missing_fields=["address"],
+        )
+    # Two rows share an updated_at; the id tiebreak keeps pages disjoint.
+    with isolated_repo.get_connection() as connection:
+        connection.execute(
+            "UPDATE documents SET updated_at = '2026-01-01T00:00:00+00:00' "
+            "WHERE id IN ('doc-1', 'doc-2')"
+        )
+
+    seen: list[str] = []
+    cursor: dict[str, str] = {}
+    while True:
+        page = isolated_repo.list_documents_paged(status="ingested", limit=2, **cursor)
+        if not page:
+            break
+        seen.extend(row["id"] for row in page)
+        cursor = {
+            "cursor_updated_at": page[-1]["updated_at"],
+            "cursor_id": page[-1]["id"],
+        }
+    assert sorted(seen) == [f"doc-{index}" for index in range(5)]
+    assert len(seen) == 5
+
+    summary = isolated_repo.list_documents_paged(limit=1)[0]
+    assert set(summary) == set(isolated_repo.DOCUMENT_SUMMARY_COLUMNS)
+    listed = isolated_repo.list_documents_paged(
+        limit=1, columns=isolated_repo.DOCUMENT_LIST_COLUMNS
+    )[0]
+    assert "extracted_text" not in listed
+    assert listed["missing_fields"] == ["address"]
+    assert listed["requires_review"] is False
+
+
+def test_list_documents_paged_rejects_bad_arguments(isolated_repo) -> None:
+    with pytest.raises(ValueError):
+        isolated_repo.list_documents_paged(columns=("id", "1; DROP TABLE documents"))
+    with pytest.raises(ValueError):
+        isolated_repo.list_documents_paged(cursor_id="doc-1")
+
+
+def test_json_columns_are_stored_as_compact_json_text(isolated_repo) -> None:
+    _add_document(
+        isolated_repo,
+        "doc-1",
+        extracted_fields={"email": "a@b.org", "note": "café"},
+        missing_fields=["address"],
+    )
+    with isolated_repo.get_connection() as connection:
+        row = connection.execute(
+            "SELECT extracted_fields, missing_fields, validation_errors, "
+            "typeof(extracted_fields) AS storage FROM documents"
+        ).fetchone()
+
+    assert row["storage"] == "text"
+    assert row["extracted_fields"] == '{"email":"a@b.org","note":"café"}'
+    assert row["missing_fields"] == '["address"]'
+    assert row["validation_errors"] == "[]"
+
+
+@pytest.mark.parametrize("use_returning", [True, False])
+def test_update_documents_bulk_groups_by_columns(
+    isolated_repo, monkeypatch, use_returning
+) -> None:
+    monkeypatch.setattr(isolated_repo, "SUPPORTS_RETURNING", use_returning)
+    for doc_id in ("a", "b", "c"):
+        _add_document(isolated_repo, doc_id, status="needs_review")
+
+    updated = isolated_repo.update_documents_bulk(
+        updates=[
+            ("a", {"status": "approved", "missing_fields": []}),
+            ("b", {"status": "routed", "missing_fields": []}),
+            ("c", {"assigned_to": "pat"}),
+            ("ghost", {"status": "approved"}),
+        ]
+    )
+
+    assert set(updated) == {"a", "b", "c"}
+    assert updated["a"]["status"] == "approved"
+    assert updated["b"]["status"] == "routed"
+    assert updated["b"]["missing_fields"] == []
+    assert updated["c"]["status"] == "needs_review"
+    assert updated["c"]["assigned_to"] == "pat"
+    assert isolated_repo.get_document("a") == updated["a"]
+    assert (
+        isolated_repo.update_documents_bulk(
+            updates=[("a", {"status": "failed"})], workspace_id="elsewhere"
+        )
+        == {}
+    )
+    assert isolated_repo.get_document("a")["status"] == "approved"
+
+
+def test_bulk_audit_events_resolve_workspaces_in_chunks(
+    isolated_repo, monkeypatch
+) -> None:
+    monkeypatch.setattr(isolated_repo, "_BULK_UPDATE_CHUNK", 2)
+    owner = isolated_repo.create_user(
+        email="audit-owner@example.com", full_name=None, password_hash="x", role="admin"
+    )
+    workspace = isolated_repo.create_workspace(name="Audit", owner_id=owner["id"])
+    doc_ids = [f"doc-{index}" for index in range(5)]
+    for doc_id in doc_ids:
+        _add_document(isolated_repo, doc_id, workspace_id=workspace["id"])
+
+    isolated_repo.create_audit_events_bulk(
+        events=[
+            {"document_id": doc_id, "action": "bulk", "actor": "t"}
+            for doc_id in doc_ids
+        ]
+    )
+
+    for doc_id in doc_ids:
+        [event] = isolated_repo.list_audit_events(doc_id)
+        assert event["workspace_id"] == workspace["id"]
+
+
+def test_purge_deletes_in_bounded_chunks(isolated_repo, monkeypatch) -> None:
+    monkeypatch.setattr(isolated_repo, "_PURGE_CHUNK_ROWS", 2)
+    _add_document(isolated_repo, "doc-1")
+    for index in range(6):
+        isolated_repo.create_audit_event(
+            document_id="doc-1", action=f"event-{index}", actor="t"
+        )
+    with isolated_repo.get_connection() as connection:
+        connection.execute(
+            "UPDATE audit_events SET created_at = '2000-01-01T00:00:00+00:00' "
+            "WHERE action != 'event-5'"
+        )
+
+    assert isolated_repo.purge_audit_events_before("2001-01-01T00:00:00+00:00") == 5
+    assert [e["action"] for e in isolated_repo.list_audit_events("doc-1")] == [
+        "event-5"
+    ]
+    assert isolated_repo.purge_audit_events_before("2001-01-01T00:00:00+00:00") == 0
+
+
+def test_document_write_templates_are_precomputed(isolated_repo) -> None:
+    payload = isolated_repo._build_document_payload(
+        {
+            "id": "doc-1",
+            "filename": "a.txt",
+            "storage_path": "/tmp/a.txt",
+            "requires_review": True,
+            "extracted_fields": {"a": 1},
+        },
+        now="2026-01-01T00:00:00+00:00",
+    )
+    assert isolated_repo._document_insert_values(payload) == [
+        isolated_repo._serialize_value(column, payload[column])
+        for column in isolated_repo._DOCUMENT_INSERT_COLUMNS
+    ]
+
+    sql = isolated_repo._update_document_sql(("status", "updated_at"), True)
+    assert sql == (
+        "UPDATE documents SET status = ?, updated_at = ? "
+        "WHERE id = ? AND workspace_id = ?"
+    )
+    assert isolated_repo._update_document_sql(("status", "updated_at"), True) is sql
+
+
+def test_update_document_with_audit_commits_both_or_neither(isolated_repo) -> None:
+    isolated_repo.create_document(
+        document={
+            "id": "doc-1",
+            "filename": "a.txt",
+            "storage_path": "/tmp/a.txt",
+        }
+    )
+
+    updated = isolated_repo.update_document_with_audit(
+        "doc-1", updates={"status": "approved"}, action="reviewed", actor="clerk"
+    )
+    assert updated["status"] == "approved"
+    [event] = isolated_repo.list_audit_events("doc-1")
+    assert (event["action"], event["actor"]) == ("reviewed", "clerk")
+    assert (
+        isolated_repo.update_document_with_audit(
+            "missing", updates={"status": "approved"}, action="reviewed", actor="clerk"
+        )
+        is None
+    )
+
+    with isolated_repo.get_connection() as connection:
+        connection.execute(
+            "CREATE TRIGGER no_audit BEFORE INSERT ON audit_events "
+            "BEGIN SELECT RAISE(ABORT, 'audit unavailable'); END"
+        )
+    with pytest.raises(sqlite3.IntegrityError):
+        isolated_repo.update_document_with_audit(
+            "doc-1", updates={"status": "routed"}, action="reviewed", actor="clerk"
+        )
+    assert isolated_repo.get_document("doc-1")["status"] == "approved"
+    assert len(isolated_repo.list_audit_events("doc-1")) == 1
+
+
+def test_postgres_nested_blocks_commit_only_at_the_outermost(
+    isolated_db, monkeypatch
+) -> None:
+    calls: list[str] = []
+
+    class FakeConnection:
+        closed = False
+
+        def commit(self) -> None:
+            calls.append("commit")
+
+        def rollback(self) -> None:
+            calls.append("rollback")
+
+    fake = FakeConnection()
+    monkeypatch.setattr(isolated_db, "DATABASE_BACKEND", "postgresql")
+    monkeypatch.setattr(isolated_db, "_thread_postgres_connection", lambda: fake)
+
+    with isolated_db.get_connection() as outer:
+        with isolated_db.get_connection() as inner:
+            assert inner is outer
+        assert calls == []
+    assert calls == ["commit"]
+
+    calls.clear()
+    with pytest.raises(RuntimeError):
+        with isolated_db.transaction():
+            with isolated_db.get_connection():
+                pass
+            raise RuntimeError("boom")
+    assert calls == ["rollback"]
+
+
+def test_close_all_thread_connections_reaches_pool_threads(isolated_db) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pooled = executor.submit(isolated_db._thread_sqlite_connection).result()
+        assert not pooled.closed
+
+        isolated_db.close_all_thread_connections()
+        assert pooled.closed
+
+        def count_documents() -> int:
+            with isolated_db.get_connection() as connection:
+                return connection.execute("SELECT COUNT(*) FROM documents").fetchone()[
+                    0
+                ]
+
+        # The pool thread reopens instead of reusing the closed connection.
+        assert executor.submit(count_documents).result() == 0
@@ -1,8 +1,11 @@
+import copy
 from pathlib import Path
 
+from app.config import DOCUMENT_TYPE_RULES
 from app.pipeline import process_document
 from app.rules import (
     get_active_rules,
+    get_default_rules,
     normalize_rules,
     reset_rules_to_default,
     save_rules,
@@ -77,3 +80,49 @@ def test_process_document_uses_custom_rules(monkeypatch, tmp_path) -> None:
     assert result["department"] == "Public Works"
 
     reset_rules_to_default()
+
+
+def test_active_rules_cached_until_file_changes(monkeypatch, tmp_path) -> None:
+    rules_path = tmp_path / "rules.json"
+    monkeypatch.setattr("app.rules.RULES_CONFIG_PATH", rules_path)
+    save_rules({"permit": {"keywords": ["permit"], "department": "Planning"}})
+
+    first, _ = get_active_rules()
+    assert get_active_rules()[0] is first
+
+    # An out-of-band edit is picked up without calling save_rules().
+    rules_path.write_text(
+        '{"permit": {"keywords": ["permit"], "department": "Building Services"}}',
+        encoding="utf-8",
+    )
+    reloaded, source = get_active_rules()
+    assert source == "custom"
+    assert reloaded["permit"]["department"] == "Building Services"
+
+    reset_rules_to_default()
+    assert get_active_rules() == (get_default_rules(), "default")
+
+
+def test_normalize_rules_cleans_and_dedupes_lists() -> None:
+    rules = normalize_rules(
+        {
+            "permit": {
+                "keywords": [" Permit", "permit ", "", "  ", "Site Plan", 42],
+                "required_fields": ["date", " date", "address", None],
+            }
+        }
+    )
+
+    assert rules["permit"]["keywords"] == ["permit", "site plan", "42"]
+    assert rules["permit"]["required_fields"] == ["date", "address", "None"]
+
+
+def test_default_rules_built_once_without_touching_config() -> None:
+    original = copy.deepcopy(DOCUMENT_TYPE_RULES)
+    defaults = get_default_rules()
+
+    assert get_default_rules() is defaults
+    assert DOCUMENT_TYPE_RULES == original
+    for doc_type, rule in defaults.items():
+        if doc_type in DOCUMENT_TYPE_RULES:
+            assert rule["keywords"] is not DOCUMENT_TYPE_RULES[doc_type]["keywords"]
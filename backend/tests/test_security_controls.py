@@ -1,5 +1,13 @@
 from __future__ import annotations
 
+import io
+import mmap
+import socket
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
 import pytest
 
 from app.security import (
@@ -17,6 +25,57 @@ def test_rate_limiter_blocks_after_limit() -> None:
     assert first.allowed is True
     assert second.allowed is True
     assert third.allowed is False
+    assert limiter.check("127.0.0.2:upload", limit=2, window_seconds=60).allowed
+
+
+def test_rate_limiter_holds_limit_under_concurrent_checks() -> None:
+    limiter = SlidingWindowRateLimiter()
+    keys = [f"10.0.0.{n}:api" for n in range(8)]
+    allowed: list[str] = []
+
+    def hammer(key: str) -> None:
+        for _ in range(50):
+            if limiter.check(key, limit=20, window_seconds=60).allowed:
+                allowed.append(key)
+
+    workers = [threading.Thread(target=hammer, args=(key,)) for key in keys * 4]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(allowed) == sorted(keys * 20)
+
+
+def test_rate_limiter_ring_expires_wraps_and_resizes(monkeypatch) -> None:
+    from app import security
+
+    clock = [100.0]
+    monkeypatch.setattr(security.time, "monotonic", lambda: clock[0])
+    limiter = SlidingWindowRateLimiter()
+
+    def check(limit: int = 3):
+        return limiter.check("ip:scope", limit=limit, window_seconds=10)
+
+    remaining = []
+    for _ in range(3):
+        remaining.append(check().remaining)
+        clock[0] += 4
+    assert remaining == [2, 1, 0]
+    clock[0] -= 4
+    denied = check()
+    assert not denied.allowed and denied.reset_seconds == 2
+
+    # Past the start, one slot frees up every 4 seconds as the ring wraps.
+    for _ in range(6):
+        clock[0] += 4
+        assert check().allowed
+        assert not check().allowed
+
+    # A smaller limit keeps the newest timestamps.
+    assert not check(limit=2).allowed
+    clock[0] += 10.5
+    assert check(limit=2).remaining == 1
 
 
 def test_upload_validation_rejects_disallowed_extension(monkeypatch) -> None:
@@ -35,5 +94,174 @@ def test_upload_validation_allows_expected_text(monkeypatch) -> None:
     from app import security
 
     monkeypatch.setattr(security, "UPLOAD_ALLOWED_EXTENSIONS", {"txt"})
-    monkeypatch.setattr(security, "UPLOAD_ALLOWED_MIME_PREFIXES", {"text/"})
-    validate_upload(filename="safe.txt", content_type="text/plain", payload=b"hello")
+    monkeypatch.setattr(security, "UPLOAD_ALLOWED_MIME_PREFIXES", ("text/",))
+    validate_upload(filename="safe.txt", content_type=" Text/Plain", payload=b"hello")
+    with pytest.raises(UploadValidationError, match="content type"):
+        validate_upload(
+            filename="safe.txt", content_type="application/pdf", payload=b"hello"
+        )
+
+
+@pytest.fixture()
+def fake_clamd(monkeypatch):
+    """Answer one INSTREAM scan on a socketpair; yields the received chunks."""
+    from app import security
+
+    client, server = socket.socketpair()
+    received: list[bytes] = []
+
+    def serve() -> None:
+        with server, server.makefile("rb") as stream:
+            assert stream.read(10) == b"zINSTREAM\0"
+            while length := struct.unpack("!I", stream.read(4))[0]:
+                received.append(stream.read(length))
+            server.sendall(b"stream: OK\0")
+
+    monkeypatch.setattr(security, "_CLAMAV_CHUNK_BYTES", 4096)
+    monkeypatch.setattr(
+        security.socket, "create_connection", lambda *args, **kwargs: client
+    )
+    worker = threading.Thread(target=serve)
+    worker.start()
+    yield received
+    worker.join(timeout=5)
+
+
+def test_clamav_scan_streams_length_prefixed_chunks(fake_clamd) -> None:
+    from app import security
+
+    payload = bytes(range(256)) * 64 + b"tail"
+
+    assert security._clamav_scan(payload) == (True, None)
+    assert b"".join(fake_clamd) == payload
+    assert [len(chunk) for chunk in fake_clamd] == [4096] * 4 + [4]
+
+
+def test_validate_upload_file_scans_large_uploads_through_mmap(
+    fake_clamd, monkeypatch, tmp_path
+) -> None:
+    from app import security
+
+    monkeypatch.setattr(security, "UPLOAD_VIRUS_SCAN_ENABLED", True)
+    monkeypatch.setattr(security, "_MMAP_SCAN_MIN_BYTES", 1024)
+    scanned: list[type] = []
+    scan = security._clamav_scan
+    monkeypatch.setattr(
+        security,
+        "_clamav_scan",
+        lambda payload: scanned.append(type(payload)) or scan(payload),
+    )
+    payload = b"%PDF-1.4 " * 1000
+
+    with (tmp_path / "big.pdf").open("w+b") as source:
+        source.write(payload)
+        security.validate_upload_file(
+            filename="big.pdf", content_type="application/pdf", source=source
+        )
+        assert source.tell() == 0
+
+    assert scanned == [mmap.mmap]
+    assert b"".join(fake_clamd) == payload
+
+
+def test_validate_upload_file_checks_size_without_reading(monkeypatch) -> None:
+    from app import security
+
+    monkeypatch.setattr(security, "UPLOAD_MAX_BYTES", 8)
+    source = tempfile.SpooledTemporaryFile(max_size=1024)
+    with pytest.raises(UploadValidationError, match="empty"):
+        security.validate_upload_file(
+            filename="a.txt", content_type="text/plain", source=source
+        )
+    source.write(b"123456789")
+    with pytest.raises(UploadValidationError, match="too large"):
+        security.validate_upload_file(
+            filename="a.txt", content_type="text/plain", source=source
+        )
+    assert not source._rolled
+
+
+@pytest.mark.parametrize(
+    ("filename", "payload", "allowed"),
+    [
+        ("scan.pdf", b"%PDF-1.7\n", True),
+        ("scan.PDF", b"\xef\xbb\xbf%PDF-1.4", True),
+        ("scan.pdf", b"MZ\x90\x00", False),
+        ("photo.png", b"\x89PNG\r\n\x1a\n....", True),
+        ("photo.jpeg", b"GIF89a", False),
+        ("page.tif", b"MM\x00*....", True),
+        ("letter.docx", b"PK\x03\x04....", True),
+        ("letter.docx", b"<html>", False),
+        ("notes.txt", b"anything", True),
+    ],
+)
+def test_upload_validation_checks_binary_signatures(
+    monkeypatch, filename, payload, allowed
+) -> None:
+    from app import security
+
+    monkeypatch.setattr(security, "UPLOAD_VIRUS_SCAN_ENABLED", True)
+    monkeypatch.setattr(security, "_clamav_scan", lambda payload: (True, None))
+    kwargs = {"filename": filename, "content_type": "application/octet-stream"}
+    if allowed:
+        validate_upload(payload=payload, **kwargs)
+        return
+    with pytest.raises(UploadValidationError, match="does not match"):
+        validate_upload(payload=payload, **kwargs)
+    with pytest.raises(UploadValidationError, match="does not match"):
+        security.validate_upload_file(source=io.BytesIO(payload), **kwargs)
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "scan.PDF",
+        "archive.tar.gz",
+        "notes",
+        ".txt",
+        "trailing.",
+        "..txt",
+        "dir.v2/letter",
+    ],
+)
+def test_allowed_extension_matches_path_suffix(monkeypatch, filename) -> None:
+    from app import security
+
+    allowed = {"pdf", "gz", "txt", "v2/letter"}
+    monkeypatch.setattr(security, "UPLOAD_ALLOWED_EXTENSIONS", allowed)
+    expected = Path(filename).suffix.lower().lstrip(".") in allowed
+    assert security._allowed_extension(filename) is expected
+
+
+def test_rate_limiter_rings_grow_lazily_and_idle_buckets_expire(monkeypatch) -> None:
+    from app import security
+
+    clock = [100.0]
+    monkeypatch.setattr(security.time, "monotonic", lambda: clock[0])
+    limiter = SlidingWindowRateLimiter()
+
+    def bucket(key: str):
+        return limiter._stripes[hash(key) & (security._RATE_LIMIT_STRIPES - 1)].buckets
+
+    limiter.check("busy:api", limit=1000, window_seconds=10)
+    ring = bucket("busy:api")["busy:api"]
+    assert len(ring.times) == security._RING_INITIAL_CAPACITY
+
+    for _ in range(20):
+        clock[0] += 0.1
+        assert limiter.check("busy:api", limit=1000, window_seconds=10).allowed
+    ring = bucket("busy:api")["busy:api"]
+    assert ring.size == 21
+    assert len(ring.times) == 32
+    assert list(ring._ordered()) == sorted(ring._ordered())
+
+    # A later check on the same stripe sweeps out the quiet client.
+    limiter.check("idle:api", limit=5, window_seconds=10)
+    neighbour = next(
+        key
+        for key in (f"other{n}:api" for n in range(10_000))
+        if bucket(key) is bucket("idle:api")
+    )
+    clock[0] += security._RATE_LIMIT_SWEEP_SECONDS + 11
+    limiter.check(neighbour, limit=5, window_seconds=10)
+    assert set(bucket("idle:api")) == {neighbour}
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import errno
+
+import pytest
+from cryptography.fernet import Fernet
+
+from app import storage
+
+
+@pytest.fixture()
+def encryption(monkeypatch):
+    def configure(*, enabled: bool, key: str = "") -> None:
+        monkeypatch.setattr(storage, "ENCRYPTION_AT_REST_ENABLED", enabled)
+        monkeypatch.setattr(storage, "ENCRYPTION_KEY", key)
+        storage._get_fernet.cache_clear()
+        storage._get_aead.cache_clear()
+
+    yield configure
+    storage._get_fernet.cache_clear()
+    storage._get_aead.cache_clear()
+
+
+def test_encrypted_round_trip_reuses_one_fernet(encryption, tmp_path) -> None:
+    encryption(enabled=True, key=Fernet.generate_key().decode())
+    target = tmp_path / "doc.bin"
+
+    storage.write_document_bytes(target, b"permit application")
+
+    assert storage.is_encrypted_file(target)
+    assert storage.read_document_bytes(target) == b"permit application"
+    assert target.read_bytes().startswith(storage.AEAD_MAGIC_HEADER)
+    assert storage._get_aead() is storage._get_aead()
+
+
+def test_plaintext_when_encryption_is_disabled(encryption, tmp_path) -> None:
+    encryption(enabled=False)
+    target = tmp_path / "doc.bin"
+
+    storage.write_document_bytes(target, b"plain")
+
+    assert target.read_bytes() == b"plain"
+    assert storage.read_document_bytes(target) == b"plain"
+
+
+def test_startup_validation_warms_the_cipher(encryption) -> None:
+    encryption(enabled=True, key=Fernet.generate_key().decode())
+
+    storage.validate_encryption_configuration()
+
+    assert storage._get_aead.cache_info().currsize == 1
+
+
+def test_missing_key_keeps_failing(encryption) -> None:
+    encryption(enabled=True)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="CITYSORT_ENCRYPTION_KEY"):
+            storage.validate_encryption_configuration()
+
+
+def test_large_payloads_are_written_as_frames(
+    encryption, tmp_path, monkeypatch
+) -> None:
+    encryption(enabled=True, key=Fernet.generate_key().decode())
+    monkeypatch.setattr(storage, "STREAM_CHUNK_BYTES", 4)
+    target = tmp_path / "doc.bin"
+
+    storage.write_document_stream(target, [b"abcdefghij", b"", b"kl"])
+
+    assert target.read_bytes().startswith(storage.AEAD_MAGIC_HEADER)
+    assert list(storage.iter_document_bytes(target)) == [b"abcd", b"efgh", b"ij", b"kl"]
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"copied in frames")
+    copied = tmp_path / "copied.bin"
+    storage.copy_source_to_storage(source, copied)
+    with storage.open_plaintext_path(copied, suffix=".txt") as plain:
+        assert plain.read_bytes() == b"copied in frames"
+
+    sealed = target.read_bytes()
+    target.write_bytes(sealed[:-3])
+    with pytest.raises(RuntimeError, match="truncated"):
+        storage.read_document_bytes(target)
+
+
+def test_sealed_frames_reject_dropped_or_tampered_frames(
+    encryption, tmp_path, monkeypatch
+) -> None:
+    encryption(enabled=True, key=Fernet.generate_key().decode())
+    monkeypatch.setattr(storage, "STREAM_CHUNK_BYTES", 4)
+    target = tmp_path / "doc.bin"
+    storage.write_document_bytes(target, b"abcdefgh")
+    sealed = target.read_bytes()
+    header = len(storage.AEAD_MAGIC_HEADER)
+    (length,) = storage._FRAME_LENGTH.unpack_from(sealed, header)
+    first_frame_end = header + storage._FRAME_LENGTH.size + length
+
+    # Cutting the file at a frame boundary makes a non-final frame the last.
+    target.write_bytes(sealed[:first_frame_end])
+    with pytest.raises(RuntimeError, match="authentication"):
+        storage.read_document_bytes(target)
+
+    tampered = bytearray(sealed)
+    tampered[-1] ^= 1
+    target.write_bytes(bytes(tampered))
+    with pytest.raises(RuntimeError, match="authentication"):
+        storage.read_document_bytes(target)
+
+    storage.write_document_bytes(target, b"")
+    assert storage.read_document_bytes(target) == b""
+    target.write_bytes(storage.AEAD_MAGIC_HEADER)
+    with pytest.raises(RuntimeError, match="truncated"):
+        storage.read_document_bytes(target)
+
+
+def test_single_token_files_still_decrypt(encryption, tmp_path) -> None:
+    key = Fernet.generate_key()
+    encryption(enabled=True, key=key.decode())
+    legacy = tmp_path / "legacy.bin"
+    legacy.write_bytes(storage.MAGIC_HEADER + Fernet(key).encrypt(b"old format"))
+
+    assert storage.is_encrypted_file(legacy)
+    assert storage.read_document_bytes(legacy) == b"old format"
+
+    encryption(enabled=False)
+    with pytest.raises(RuntimeError, match="key is unavailable"):
+        storage.iter_document_bytes(legacy)
+
+
+def test_small_plaintext_copies_go_to_tmpfs(encryption, tmp_path, monkeypatch) -> None:
+    encryption(enabled=True, key=Fernet.generate_key().decode())
+    shm = tmp_path / "shm"
+    shm.mkdir()
+    monkeypatch.setattr(storage, "PLAINTEXT_TMPFS_DIR", shm)
+    stored = tmp_path / "doc.bin"
+    storage.write_document_bytes(stored, b"plaintext")
+
+    with storage.open_plaintext_path(stored, suffix=".txt") as plain:
+        assert plain.parent == shm
+        assert plain.suffix == ".txt"
+        assert plain.read_bytes() == b"plaintext"
+    assert not plain.exists()
+
+    monkeypatch.setattr(storage, "PLAINTEXT_TMPFS_MAX_BYTES", 0)
+    with storage.open_plaintext_path(stored) as plain:
+        assert plain.parent != shm
+
+
+def test_full_tmpfs_falls_back_to_the_default_temp_dir(
+    encryption, tmp_path, monkeypatch
+) -> None:
+    encryption(enabled=True, key=Fernet.generate_key().decode())
+    shm = tmp_path / "shm"
+    shm.mkdir()
+    monkeypatch.setattr(storage, "PLAINTEXT_TMPFS_DIR", shm)
+    stored = tmp_path / "doc.bin"
+    storage.write_document_bytes(stored, b"plaintext")
+
+    real_disk_usage = storage.shutil.disk_usage
+    monkeypatch.setattr(
+        storage.shutil,
+        "disk_usage",
+        lambda path: real_disk_usage(path)._replace(free=0),
+    )
+    with storage.open_plaintext_path(stored) as plain:
+        assert plain.parent != shm
+    monkeypatch.setattr(storage.shutil, "disk_usage", real_disk_usage)
+
+    # tmpfs filling up mid-write is retried in the default temp dir.
+    real_write = storage._write_plaintext_copy
+
+    def _full_tmpfs(source_path, *, suffix, temp_dir):
+        if temp_dir == str(shm):
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return real_write(source_path, suffix=suffix, temp_dir=temp_dir)
+
+    monkeypatch.setattr(storage, "_write_plaintext_copy", _full_tmpfs)
+    with storage.open_plaintext_path(stored) as plain:
+        assert plain.parent != shm
+        assert plain.read_bytes() == b"plaintext"
+    assert not plain.exists()
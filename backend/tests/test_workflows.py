@@ -328,3 +328,204 @@ def test_workflow_transition_action_updates_status(workflow_client):
     doc = upload_response.json()
     assert doc["doc_type"] == "building_permit"
     assert doc["status"] == "acknowledged"
+
+
+def test_workflow_transition_rolls_back_when_audit_fails(isolated_repo, monkeypatch):
+    from app import workflows
+
+    isolated_repo.create_document(
+        document={
+            "id": "doc-1",
+            "filename": "a.txt",
+            "storage_path": "/tmp/a.txt",
+            "status": "needs_review",
+        }
+    )
+
+    def failing_audit(**kwargs):
+        raise RuntimeError("audit store down")
+
+    monkeypatch.setattr(workflows, "create_audit_event", failing_audit)
+
+    with pytest.raises(RuntimeError):
+        workflows._action_transition(
+            rule_name="auto",
+            document=isolated_repo.get_document("doc-1"),
+            actor="test",
+            workspace_id=None,
+            config={"status": "acknowledged"},
+        )
+
+    assert isolated_repo.get_document("doc-1")["status"] == "needs_review"
+
+
+def test_audit_events_for_unknown_documents_are_rejected(isolated_repo, monkeypatch):
+    import sqlite3
+
+    from app import workflows
+
+    # Intentional: audit_events.document_id is a foreign key to documents.
+    with pytest.raises(sqlite3.IntegrityError):
+        isolated_repo.create_audit_event(
+            document_id="no-such-doc", action="orphan", actor="test"
+        )
+
+    # So workflow actions skip the audit when the document has no id.
+    posted = []
+    monkeypatch.setattr(
+        workflows.urllib.request,
+        "urlopen",
+        lambda request, timeout: posted.append(request.full_url) or MagicMock(),
+    )
+    workflows._action_webhook_post(
+        rule_name="hook",
+        document={"filename": "unsaved.txt"},
+        actor="test",
+        workspace_id=None,
+        trigger_event="document_ingested",
+        config={"url": "https://hooks.example.com/in"},
+    )
+    assert posted == ["https://hooks.example.com/in"]
+
+
+def test_template_placeholders_render_in_one_pass() -> None:
+    from app.templates import _render_body
+
+    context = {"name": "{{secret}}", "secret": "s3cr3t", "case": "C-1"}
+
+    assert (
+        _render_body("Dear {{name}}, case {{{case}}} {{missing}} {{}}", context)
+        == "Dear {{secret}}, case {C-1} {{missing}} {{}}"
+    )
+
+
+@pytest.mark.parametrize("use_returning", [True, False])
+def test_template_writes_return_the_stored_row(
+    isolated_repo, monkeypatch, use_returning
+) -> None:
+    from app import templates
+
+    if use_returning and not isolated_repo.SUPPORTS_RETURNING:
+        pytest.skip("SQLite build lacks RETURNING")
+    monkeypatch.setattr(templates, "SUPPORTS_RETURNING", use_returning)
+
+    created = templates.create_template(name="Notice", template_body="Hi {{id}}")
+    assert created == templates.get_template(created["id"])
+
+    # Shared templates (no workspace) are visible to every workspace.
+    updated = templates.update_template(
+        created["id"], template_body="Bye", workspace_id="any-ws"
+    )
+    assert updated["template_body"] == "Bye"
+    assert updated == templates.get_template(created["id"])
+
+    assert templates.update_template(created["id"] + 1, name="none") is None
+
+
+def test_list_templates_merges_scopes_in_keyset_pages(isolated_repo) -> None:
+    from app import templates
+    from app.db import get_connection
+
+    owner = isolated_repo.create_user(
+        email="owner@example.com", full_name=None, password_hash="x", role="admin"
+    )
+    ws = isolated_repo.create_workspace(name="Clerks", owner_id=owner["id"])["id"]
+    other = isolated_repo.create_workspace(name="Other", owner_id=owner["id"])["id"]
+    with get_connection() as conn:
+        conn.execute("DELETE FROM templates")
+    for name, workspace_id, doc_type in [
+        ("b-ws-permit", ws, "permit"),
+        ("a-shared-any", None, None),
+        ("c-shared-permit", None, "permit"),
+        ("a-ws-any", ws, None),
+        ("z-ws-invoice", ws, "invoice"),
+        ("a-other-permit", other, "permit"),
+    ]:
+        templates.create_template(
+            workspace_id=workspace_id,
+            name=name,
+            doc_type=doc_type,
+            template_body="x",
+        )
+
+    def names(**kwargs) -> list[str]:
+        return [row["name"] for row in templates.list_templates(**kwargs)]
+
+    assert names(workspace_id=ws, doc_type="permit") == [
+        "a-shared-any",
+        "a-ws-any",
+        "b-ws-permit",
+        "c-shared-permit",
+    ]
+    assert names(workspace_id=ws) == [
+        "a-shared-any",
+        "a-ws-any",
+        "b-ws-permit",
+        "c-shared-permit",
+        "z-ws-invoice",
+    ]
+    assert len(names()) == 6
+
+    first = templates.list_templates(workspace_id=ws, doc_type="permit", limit=2)
+    rest = names(
+        workspace_id=ws,
+        doc_type="permit",
+        cursor_name=first[-1]["name"],
+        cursor_id=first[-1]["id"],
+    )
+    assert rest == ["b-ws-permit", "c-shared-permit"]
+    with pytest.raises(ValueError):
+        templates.list_templates(cursor_name="a")
+
+    names_only = templates.list_template_names(workspace_id=ws, doc_type="permit")
+    assert [row["name"] for row in names_only] == names(
+        workspace_id=ws, doc_type="permit"
+    )
+    assert set(names_only[0]) == {"id", "name", "doc_type"}
+    query, _ = templates._list_templates_sql("id, name, doc_type", True, True, False)
+    with get_connection() as conn:
+        plan = conn.execute(
+            f"EXPLAIN QUERY PLAN {query}", (ws, "permit", ws, "permit", 5)
+        )
+        details = " ".join(row["detail"] for row in plan)
+    assert "COVERING INDEX idx_templates_ws_type_name" in details
+
+
+def test_template_context_resolves_only_referenced_fields() -> None:
+    from app.templates import _DocumentContext, _render_body
+
+    class Unprintable:
+        def __str__(self) -> str:
+            raise AssertionError("unreferenced field was stringified")
+
+    document = {
+        "id": "doc-1",
+        "filename": "permit.pdf",
+        "doc_type": None,
+        "status": "routed",
+        "extracted_fields": {"status": "override", "note": None, "x": Unprintable()},
+    }
+    context = _DocumentContext(document)
+
+    assert (
+        _render_body(
+            "{{filename}} {{status}} [{{note}}] {{doc_type}} {{nope}}", context
+        )
+        == "permit.pdf override [] None {{nope}}"
+    )
+    assert _render_body("No placeholders here.", context) == "No placeholders here."
+
+
+def test_workflow_preset_lookups_return_independent_copies() -> None:
+    from app.workflow_presets import get_workflow_preset, list_workflow_presets
+
+    listed = list_workflow_presets()
+    listed[0]["name"] = "changed"
+    assert list_workflow_presets()[0]["name"] != "changed"
+
+    preset_id = listed[0]["id"]
+    preset = get_workflow_preset(f"  {preset_id.upper()} ")
+    assert preset is not None and preset["id"] == preset_id
+    preset["rules"].clear()
+    assert get_workflow_preset(preset_id)["rules"]
+    assert get_workflow_preset("no-such-preset") is None
@@ -506,3 +506,69 @@ def test_workspace_bootstrap_backfills_existing_records(isolated_db, isolated_re
     document = isolated_repo.get_document("legacy-doc")
     assert document
     assert document.get("workspace_id")
+
+
+def test_default_workspace_id_is_cached_until_membership_changes(
+    isolated_repo, monkeypatch
+):
+    monkeypatch.setattr(isolated_repo, "DEFAULT_WORKSPACE_CACHE_TTL_SECONDS", 60)
+    user = isolated_repo.create_user(
+        email="cached-ws@example.com",
+        full_name=None,
+        password_hash="hash",
+        role="member",
+    )
+    assert isolated_repo.get_default_workspace_id_for_user(user["id"]) is None
+
+    workspace = isolated_repo.create_workspace(name="Cached", owner_id=user["id"])
+    assert (
+        isolated_repo.get_default_workspace_id_for_user(user["id"]) == (workspace["id"])
+    )
+
+    lookups = []
+    original = isolated_repo.get_default_workspace_for_user
+
+    def _counting(user_id: str):
+        lookups.append(user_id)
+        return original(user_id)
+
+    monkeypatch.setattr(isolated_repo, "get_default_workspace_for_user", _counting)
+    for _ in range(3):
+        assert (
+            isolated_repo.get_default_workspace_id_for_user(user["id"])
+            == (workspace["id"])
+        )
+    assert lookups == []
+
+    isolated_repo.remove_workspace_member(
+        workspace_id=workspace["id"], user_id=user["id"]
+    )
+    assert isolated_repo.get_default_workspace_id_for_user(user["id"]) is None
+    assert lookups == [user["id"]]
+
+
+def test_default_workspace_cache_is_dropped_after_the_commit(
+    isolated_db, isolated_repo, monkeypatch
+):
+    monkeypatch.setattr(isolated_repo, "DEFAULT_WORKSPACE_CACHE_TTL_SECONDS", 60)
+    user = isolated_repo.create_user(
+        email="commit-ws@example.com",
+        full_name=None,
+        password_hash="hash",
+        role="member",
+    )
+    assert isolated_repo.get_default_workspace_id_for_user(user["id"]) is None
+
+    def cached() -> bool:
+        return any(
+            key[1] == user["id"] for key in isolated_repo._default_workspace_cache
+        )
+
+    with isolated_db.transaction():
+        workspace = isolated_repo.create_workspace(name="Later", owner_id=user["id"])
+        # Not committed yet: the cached answer is still the old one.
+        assert cached()
+    assert not cached()
+    assert (
+        isolated_repo.get_default_workspace_id_for_user(user["id"]) == (workspace["id"])
+    )